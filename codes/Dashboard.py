@@ -1,12 +1,25 @@
 # Dashboard.py 
+from functools import partial
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 
+from utils.charts import affordability_figure, is_binned
 from utils.data_loader import load_affordability_data
-from utils.prediction_engine import calculate_monthly_payment, get_best_locations
-from utils.session import init_session_state
-from utils.user_profile import get_user_profile
+from utils.exports import EXPORT_FORMATS, export_file_name, export_mime, export_ranking
+from utils.geo_index import locations_near
+from utils.hierarchy import get_hierarchy
+from utils.panels import panel_output
+from utils.prediction_engine import (
+    amortization_schedule,
+    break_even_summary,
+    break_even_table,
+    calculate_monthly_payment,
+    rank_locations,
+)
+from utils.tracing import traced
 
 # ---------------------------------------------------
 # Utility converters
@@ -23,35 +36,72 @@ def to_int(x, default=5):
     except:
         return default
 
-# Initialize states + user profile
-init_session_state()
-get_user_profile()
-
 
 # ===================================================
 # ================  NATIONAL VIEW  ==================
 # ===================================================
+MAJOR_METROS = [
+    "New York-Newark-Jersey City, NY-NJ-PA",
+    "Los Angeles-Long Beach-Anaheim, CA",
+    "Chicago-Naperville-Elgin, IL-IN-WI",
+    "Dallas-Fort Worth-Arlington, TX",
+    "Houston-The Woodlands-Sugar Land, TX",
+    "Washington-Arlington-Alexandria, DC-VA-MD-WV",
+    "Miami-Fort Lauderdale-Pompano Beach, FL",
+    "Philadelphia-Camden-Wilmington, PA-NJ-DE-MD",
+    "Atlanta-Sandy Springs-Alpharetta, GA",
+    "Boston-Cambridge-Newton, MA-NH",
+    "San Francisco-Oakland-Berkeley, CA",
+    "Phoenix-Mesa-Chandler, AZ",
+    "Seattle-Tacoma-Bellevue, WA"
+]
+
+
+@traced()
 def run_national():
-
-    # Load data INSIDE function (important!)
+    # Aucun panneau ne lit le profil : un changement de la barre latérale
+    # relance la page, mais chaque panneau réutilise son contenu déjà construit.
     df_raw = load_affordability_data()
 
-    st.header("1. Top 10 Most Expensive vs Cheapest Areas")
+    for i, (title, panel, needs_data) in enumerate(national_panels()):
+        if i:
+            st.markdown("---")
+        st.header(title)
+        if needs_data:
+            panel(df_raw)
+        else:
+            panel()
+
+
+def national_panels():
+    """(titre, fragment, reçoit le jeu de données) de chaque section de la vue nationale."""
+    return [
+        ("1. Top 10 Most Expensive vs Cheapest Areas", rent_extremes_panel, True),
+        ("2. Affordability by State", state_map_panel, False),
+        ("3. Major Metropolitan Areas – 2025 Outlook", metro_bars_panel, False),
+        ("4. Who Can Still Afford to Buy? (National View)", affordability_panel, True),
+        ("5. Drill Down: State → Metro → City", drilldown_panel, False),
+    ]
+
+
+# -------- Top 10 expensive / cheapest rent --------
+def _rent_extremes(df_raw):
+    columns = ['ZIP', 'Metro', 'StateName', 'ZORI', 'Income_Needed_Rent']
+    top_rent = df_raw.nlargest(10, 'ZORI')[columns].round(0)
+    bottom_rent = df_raw.nsmallest(10, 'ZORI')[columns].round(0)
+    return top_rent, bottom_rent
 
-    # 📌 Sliders — Only if useful here
-    salary           = to_float(st.session_state.user_salary, 80000)
-    goal             = str(st.session_state.goal or "Buy")
-    horizon          = to_int(st.session_state.horizon)
-    mortgage_rate    = to_float(st.session_state.mortgage_rate, 0.07)
-    down_payment_pct = to_float(st.session_state.down_payment_pct, 0.20)
 
-    # -------- Top 10 expensive / cheapest rent --------
+@st.fragment
+@traced()
+def rent_extremes_panel(df_raw):
+    top_rent_display, bottom_rent_display = panel_output(
+        "national.rent_extremes", lambda: _rent_extremes(df_raw)
+    )
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("Highest Rents (ZORI)")
-        top_rent = df_raw.nlargest(10, 'ZORI')[['ZIP', 'Metro', 'StateName', 'ZORI', 'Income_Needed_Rent']]
-        top_rent_display = top_rent.copy().round(0)
         st.dataframe(
             top_rent_display.style.format({
                 'ZORI': '${:,.0f}',
@@ -62,8 +112,6 @@ def run_national():
 
     with col2:
         st.subheader("Lowest Rents (ZORI)")
-        bottom_rent = df_raw.nsmallest(10, 'ZORI')[['ZIP', 'Metro', 'StateName', 'ZORI', 'Income_Needed_Rent']]
-        bottom_rent_display = bottom_rent.copy().round(0)
         st.dataframe(
             bottom_rent_display.style.format({
                 'ZORI': '${:,.0f}',
@@ -72,22 +120,19 @@ def run_national():
             use_container_width=True
         )
 
-    # -------- State Affordability --------
-    st.markdown("---")
-    st.header("2. Affordability by State")
 
-    state_data = df_raw.groupby('StateName').agg({
-        'ZORI': 'median',
-        'ZHVI': 'median',
-        'Avg_AGI': 'median',
-        'Income_Needed_Rent': 'median',
-        'Income_Needed_Buy': 'median'
-    }).round(0).reset_index()
+# -------- State Affordability --------
+def _state_map_figure():
+    # Médianes par état lues dans la hiérarchie (précalculées par version des données)
+    state_data = get_hierarchy().table(
+        'StateName',
+        ['ZORI', 'ZHVI', 'Avg_AGI', 'Income_Needed_Rent', 'Income_Needed_Buy']
+    ).drop(columns='Count').round(0).reset_index()
 
     state_data['Rent_Affordability_Ratio'] = (state_data['Avg_AGI'] / state_data['Income_Needed_Rent']).round(2)
     state_data['Buy_Affordability_Ratio']  = (state_data['Avg_AGI'] / state_data['Income_Needed_Buy']).round(2)
 
-    fig = px.choropleth(
+    return px.choropleth(
         state_data,
         locations='StateName',
         locationmode='USA-states',
@@ -97,35 +142,21 @@ def run_national():
         range_color=(0.5, 2.5),
         title="Rent Affordability Ratio by State (Higher = Better)"
     )
-    st.plotly_chart(fig, use_container_width=True)
 
-    # -------- Major Metros Comparison --------
-    st.markdown("---")
-    st.header("3. Major Metropolitan Areas – 2025 Outlook")
-
-    major_metros = [
-        "New York-Newark-Jersey City, NY-NJ-PA",
-        "Los Angeles-Long Beach-Anaheim, CA",
-        "Chicago-Naperville-Elgin, IL-IN-WI",
-        "Dallas-Fort Worth-Arlington, TX",
-        "Houston-The Woodlands-Sugar Land, TX",
-        "Washington-Arlington-Alexandria, DC-VA-MD-WV",
-        "Miami-Fort Lauderdale-Pompano Beach, FL",
-        "Philadelphia-Camden-Wilmington, PA-NJ-DE-MD",
-        "Atlanta-Sandy Springs-Alpharetta, GA",
-        "Boston-Cambridge-Newton, MA-NH",
-        "San Francisco-Oakland-Berkeley, CA",
-        "Phoenix-Mesa-Chandler, AZ",
-        "Seattle-Tacoma-Bellevue, WA"
-    ]
 
-    metro_summary = df_raw[df_raw['Metro'].isin(major_metros)].groupby('Metro').agg({
-        'ZHVI': 'median',
-        'ZORI': 'median',
-        'Income_Needed_Buy': 'median',
-        'Income_Needed_Rent': 'median',
-        'Avg_AGI': 'median'
-    }).round(0)
+@st.fragment
+@traced()
+def state_map_panel():
+    st.plotly_chart(panel_output("national.state_map", _state_map_figure), use_container_width=True)
+
+
+# -------- Major Metros Comparison --------
+def _metro_bars_figure():
+    metro_summary = get_hierarchy().table(
+        'Metro',
+        ['ZHVI', 'ZORI', 'Income_Needed_Buy', 'Income_Needed_Rent', 'Avg_AGI'],
+        names=MAJOR_METROS
+    ).drop(columns='Count').round(0)
 
     # 2025 projection
     metro_summary['ZHVI_2025'] = (metro_summary['ZHVI'] * 1.04).round(0)
@@ -141,32 +172,39 @@ def run_national():
     )
     fig.update_traces(texttemplate='$%{text:,.0f}', textposition='outside')
     fig.update_layout(xaxis_tickangle=30, height=600)
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-    # -------- Scatter Affordability --------
-    st.markdown("---")
-    st.header("4. Who Can Still Afford to Buy? (National View)")
 
-    df_sample = df_raw.sample(6000, random_state=42).copy()
+@st.fragment
+@traced()
+def metro_bars_panel():
+    st.plotly_chart(panel_output("national.metro_bars", _metro_bars_figure), use_container_width=True)
 
-    fig = px.scatter(
-        df_sample,
-        x='Avg_AGI',
-        y='Income_Needed_Buy',
-        size='ZHVI',
-        color='StateName',
-        hover_name='Metro',
+
+# -------- Scatter Affordability --------
+def _affordability_content(df_raw):
+    # Un point par ZIP sur un petit jeu, sinon cellules agrégées (payload constant)
+    fig = affordability_figure(
+        df_raw,
+        'Income_Needed_Buy',
         labels={
             'Avg_AGI': 'Household Income (IRS)',
             'Income_Needed_Buy': 'Income Required to Buy',
             'ZHVI': 'Home Price'
         },
+        size='ZHVI',
+        color='StateName',
+        hover_name='Metro',
         opacity=0.7
     )
+    affordable = int((df_raw['Avg_AGI'] >= df_raw['Income_Needed_Buy']).sum())
+    return fig, affordable, len(df_raw)
 
-    # 45° affordability line
-    max_val = max(df_sample['Avg_AGI'].max(), df_sample['Income_Needed_Buy'].max()) * 1.15
-    fig.add_scatter(x=[0, max_val], y=[0, max_val], mode='lines', line=dict(color='green', width=2))
+
+@st.fragment
+@traced()
+def affordability_panel(df_raw):
+    fig, affordable, total = panel_output("national.affordability", lambda: _affordability_content(df_raw))
 
     st.plotly_chart(fig, use_container_width=True)
 
@@ -174,12 +212,20 @@ def run_national():
 
     with col1:
         st.markdown("### What each bubble shows")
-        st.caption("""
-        • **X-axis** = Actual household income (IRS)  
-        • **Y-axis** = Income needed to buy a home  
-        • **Size** = Zillow home price (ZHVI)  
-        • **Color** = State  
-        """)
+        if is_binned(df_raw):
+            st.caption("""
+            • **X-axis** = Actual household income (IRS)  
+            • **Y-axis** = Income needed to buy a home  
+            • **Size** = Number of ZIP codes in the cell  
+            • **Color** = Median Zillow home price (ZHVI)  
+            """)
+        else:
+            st.caption("""
+            • **X-axis** = Actual household income (IRS)  
+            • **Y-axis** = Income needed to buy a home  
+            • **Size** = Zillow home price (ZHVI)  
+            • **Color** = State  
+            """)
 
     with col2:
         st.markdown("### The green line = affordability frontier")
@@ -190,21 +236,49 @@ def run_national():
         """)
 
     with col3:
-        affordable = len(df_raw[df_raw['Avg_AGI'] >= df_raw['Income_Needed_Buy']])
-        total = len(df_raw)
         pct = 100 * affordable / total
         st.markdown("### Key national insight")
         st.caption(f"""
         Only **{affordable:,} ZIP codes** out of **{total:,}**  
         are affordable to the average household.  
-        → That's **{pct:.1f}%** of the country.  
+        → That's **{pct:.1f}%** of the country.
         """)
 
 
+# -------- Drill down --------
+DRILLDOWN_COLUMNS = ['Count', 'ZHVI', 'ZORI', 'Avg_AGI', 'Income_Needed_Buy', 'Income_Needed_Rent']
+
+
+@st.fragment
+@traced()
+def drilldown_panel():
+    # Lecture des nœuds précalculés : aucun regroupement sur les lignes
+    hierarchy = get_hierarchy()
+    states = hierarchy.table('StateName', q=0.5).sort_index()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        state = st.selectbox("State", states.index.tolist(), key="drill_state")
+    metros = hierarchy.children('StateName', state)
+    with col2:
+        metro = st.selectbox("Metro area", metros.index.tolist())
+
+    st.caption(
+        f"**{state}** – {int(states.loc[state, 'Count']):,} ZIP codes, "
+        f"median home price ${states.loc[state, 'ZHVI']:,.0f}"
+    )
+    st.markdown("**Metro areas (medians)**")
+    st.dataframe(metros[DRILLDOWN_COLUMNS].round(0), use_container_width=True)
+    if metro is not None:
+        st.markdown(f"**Cities in {metro} (medians)**")
+        st.dataframe(hierarchy.children('Metro', metro)[DRILLDOWN_COLUMNS].round(0), use_container_width=True)
+
+
 
 # ===================================================
 # ===============  PERSONAL VIEW  ===================
 # ===================================================
+@traced()
 def run_personal():
 
     # ---------------------------------------------------
@@ -221,16 +295,17 @@ def run_personal():
     # ---------------------------------------------------
     # Compute personalized ranking
     # ---------------------------------------------------
-    df = get_best_locations(
+    ranking = panel_output("personal.ranking", lambda: rank_locations(
         salary=salary,
         goal=goal,
         horizon=horizon,
         inflation_rate=0.04,
         down_payment_pct=down_payment_pct,
-        mortgage_rate=mortgage_rate
-    )
+        mortgage_rate=mortgage_rate,
+        top_k=100
+    ))
 
-    eligible = df[df["Eligible_Future"]]
+    eligible = ranking.top
 
     if eligible.empty:
         st.error("No locations are affordable with your current income and goal.")
@@ -275,15 +350,164 @@ def run_personal():
             c3.metric("Loan Amount", f"${loan:,.0f}")
             c4.metric("Monthly Payment", f"${monthly:,.0f}")
 
+        break_even_panel(best, horizon, down_payment_pct, mortgage_rate)
+
     # ---------------------------------------------------
     # Top 20 table
     # ---------------------------------------------------
     top20 = eligible.head(20).copy()
     top20.insert(0, "Rank", range(1, len(top20) + 1))
+    if goal == "Buy":
+        summary = break_even_summary(
+            top20['ZHVI'], top20['ZORI'], horizon,
+            down_payment_pct=down_payment_pct, rate=mortgage_rate
+        )
+        top20['Break_Even_Year'] = summary['Break_Even_Year']
+        top20[f'Equity_After_{horizon}y'] = summary['Equity_Horizon'].round(0)
 
     st.subheader("Top 20 Best Locations for You")
     st.dataframe(top20, use_container_width=True)
 
-    # CSV export
-    csv = eligible.head(100).to_csv(index=False).encode()
-    st.download_button("Download My Top 100 Locations", csv, "best_places.csv")
+    export_panel(ranking.n_eligible, salary, goal, horizon, down_payment_pct, mortgage_rate)
+
+    nearby_panel(salary, goal, horizon, down_payment_pct, mortgage_rate)
+
+
+# ---------------------------------------------------
+# Acheter ou louer : point mort (achat au prix actuel, loyer actuel,
+# prix et loyers +4 %/an) et échéancier du meilleur emplacement.
+# ---------------------------------------------------
+def _break_even_content(best, horizon, down_payment_pct, mortgage_rate):
+    table = break_even_table(horizon, 0.04, down_payment_pct, mortgage_rate)
+    years = table['Break_Even_Year']
+    # ZIP comparables : prix et loyer connus (sans ZORI, pas de point mort possible)
+    priced = ~np.isnan(table['Buy_Cost_Horizon']) & ~np.isnan(table['Rent_Paid_Horizon'])
+    within = int((years[priced] <= horizon).sum())
+
+    schedule = amortization_schedule(
+        [best['ZHVI']], [best['ZORI']], down_payment_pct=down_payment_pct, rate=mortgage_rate
+    )
+    yearly = pd.DataFrame({
+        "Year": np.arange(1, schedule['buy_cost'].shape[1] // 12 + 1),
+        "Net cost of buying": schedule['buy_cost'][0, 11::12],
+        "Rent paid": schedule['rent_cost'][0, 11::12],
+        "Home equity": schedule['equity'][0, 11::12],
+    })
+    fig = px.line(
+        yearly, x="Year", y=["Net cost of buying", "Rent paid", "Home equity"],
+        title=f"Buy vs Rent over 30 years – ZIP {best['ZIP']}"
+    )
+    fig.update_layout(yaxis_title="Cumulative $", legend_title=None)
+
+    summary = break_even_summary([best['ZHVI']], [best['ZORI']], horizon,
+                                 down_payment_pct=down_payment_pct, rate=mortgage_rate)
+    best_summary = {name: values[0] for name, values in summary.items()}
+    return fig, best_summary, within, int(priced.sum())
+
+
+@traced()
+def break_even_panel(best, horizon, down_payment_pct, mortgage_rate):
+    st.subheader("Buy vs Rent Break-even")
+    fig, summary, within, total = panel_output(
+        "personal.break_even",
+        lambda: _break_even_content(best, horizon, down_payment_pct, mortgage_rate)
+    )
+    year = summary['Break_Even_Year']
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Break-even", "Never (30 yrs)" if np.isnan(year) else f"Year {year:.0f}")
+    c2.metric(f"Equity after {horizon} yrs", f"${summary['Equity_Horizon']:,.0f}")
+    c3.metric(f"Interest paid ({horizon} yrs)", f"${summary['Interest_Paid_Horizon']:,.0f}")
+    c4.metric(f"Rent avoided ({horizon} yrs)", f"${summary['Rent_Paid_Horizon']:,.0f}")
+
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(
+        f"Buying today beats renting within **{horizon} years** in **{within:,}** "
+        f"of **{total:,}** ZIP codes ({100 * within / max(total, 1):.1f}%). "
+        "Net cost of buying = down payment + closing costs + all payments "
+        "(mortgage, tax, insurance, HOA) − resale value after 6% selling costs."
+    )
+
+
+# ---------------------------------------------------
+# Export : fichier construit uniquement au clic (puis mis en cache).
+# data appelable : Streamlit >= 1.52 (voir requirements.txt).
+# Fragment : changer le format ou l'étendue ne relance que ce panneau.
+# ---------------------------------------------------
+@st.fragment
+@traced()
+def export_panel(n_eligible, salary, goal, horizon, down_payment_pct, mortgage_rate):
+    scope_col, format_col, button_col = st.columns([2, 1, 1])
+    scope = scope_col.radio(
+        "Export",
+        ["Top 100", f"All {n_eligible:,} affordable locations"],
+        horizontal=True,
+        key="export_scope"
+    )
+    fmt = format_col.selectbox(
+        "Format", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0], key="export_format"
+    )
+    limit = 100 if scope == "Top 100" else None
+    button_col.download_button(
+        "Download My Locations",
+        data=partial(
+            export_ranking, salary, goal, horizon, 0.04, down_payment_pct, mortgage_rate,
+            fmt=fmt, limit=limit
+        ),
+        file_name=export_file_name("best_places" if limit else "all_affordable_places", fmt),
+        mime=export_mime(fmt),
+        on_click="ignore"
+    )
+
+
+# ---------------------------------------------------
+# Recherche autour du lieu de travail (index spatial des ZIP).
+# Fragment : changer le ZIP ou le rayon ne relance que ce panneau.
+# ---------------------------------------------------
+@st.fragment
+@traced()
+def nearby_panel(salary, goal, horizon, down_payment_pct, mortgage_rate):
+    st.subheader("Affordable Near My Job")
+    zip_col, radius_col = st.columns([1, 2])
+    work_zip = zip_col.text_input("Workplace ZIP code", max_chars=5, key="work_zip")
+    radius = radius_col.slider("Maximum distance (miles)", 5, 200, 30, 5, key="work_radius")
+    if not work_zip.strip():
+        st.caption("Enter the ZIP code of your workplace to see affordable places around it.")
+        return
+    work_zip = work_zip.strip().zfill(5)
+
+    try:
+        nearby = panel_output("personal.nearby", lambda: locations_near(
+            work_zip,
+            radius_miles=radius,
+            top_k=20,
+            salary=salary,
+            goal=goal,
+            horizon=horizon,
+            inflation_rate=0.04,
+            down_payment_pct=down_payment_pct,
+            mortgage_rate=mortgage_rate
+        ))
+    except KeyError:
+        st.warning(f"ZIP code {work_zip} was not found.")
+        return
+
+    if nearby.top.empty:
+        st.info(f"No affordable location within {radius} miles of {work_zip} "
+                f"({nearby.n_total:,} ZIP records in range).")
+        return
+
+    st.success(f"**{nearby.n_eligible:,}** affordable locations within **{radius} miles** of {work_zip}")
+    table = nearby.top[["ZIP", "Location", "StateName", "Distance_mi",
+                        "Asset_Price_Future", "Income_Needed_Future", "Score"]]
+    st.dataframe(
+        table.round(1).style.format({
+            "Distance_mi": "{:.1f} mi",
+            "Asset_Price_Future": "${:,.0f}",
+            "Income_Needed_Future": "${:,.0f}",
+            "Score": "{:,.0f}"
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+    st.map(nearby.top.rename(columns={"Lat": "lat", "Lng": "lon"})[["lat", "lon"]])
@@ -1,8 +1,10 @@
 # Home.py
 import streamlit as st
 from utils.user_profile import get_user_profile
+from utils.tracing import traced
 
 
+@traced()
 def run():
     st.title("US Housing Affordability Dashboard")
     st.markdown("### M2 MIASHS – Open Data Project | December 2025")
@@ -1,22 +1,30 @@
 # Prediction.py
+import numpy as np
+import plotly.express as px
 import streamlit as st
-from utils.data_loader import load_affordability_data
-from utils.prediction_engine import get_best_locations
+from utils.data_loader import load_trend_metrics
+from utils.forecasting import FORECAST_MODELS, forecast_available
+from utils.panels import panel_output
+from utils.prediction_engine import rank_locations, sweep_locations
 from utils.user_profile import get_user_profile
+from utils.tracing import traced
 
-df_raw = load_affordability_data()
-
+@traced()
 def run():
     if "user_salary" in st.session_state:
         if st.session_state.user_salary < 30000:
             st.session_state.user_salary = 30000
 
     get_user_profile()  
-    goal = st.session_state.goal
-
 
     st.title("Long-Term Forecast (2025–2035) – Where Will You Win?")
+    forecast_panel()
 
+
+# Fragment : l'inflation et le modèle de projection ne relancent que ce panneau
+@st.fragment
+@traced()
+def forecast_panel():
     salary = st.session_state.user_salary
     goal = st.session_state.goal
     horizon = st.session_state.horizon
@@ -28,27 +36,42 @@ def run():
         min_value=1.0,
         max_value=12.0,
         value=4.5,
-        step=0.5
+        step=0.5,
+        key="forecast_inflation"
     ) / 100
 
-    df = get_best_locations(
+    # Modèle de projection : tendance par ZIP si l'historique Zillow est fourni
+    models = list(FORECAST_MODELS) if forecast_available() else ["flat"]
+    forecast = st.radio(
+        "Projection model",
+        models,
+        format_func=FORECAST_MODELS.get,
+        horizontal=True,
+        key="forecast_model",
+        help="Per-ZIP models extrapolate each ZIP's last 5 years of Zillow history; "
+             "ZIPs without enough history use the inflation rate above."
+    )
+
+    ranking = panel_output("prediction.ranking", lambda: rank_locations(
         salary=st.session_state.user_salary,
         goal=st.session_state.goal,
         horizon=st.session_state.horizon,
         inflation_rate=inflation,
         down_payment_pct=st.session_state.down_payment_pct,
-        mortgage_rate=st.session_state.mortgage_rate  # ← C’EST ÇA QUI MANQUAIT !
-    )
+        mortgage_rate=st.session_state.mortgage_rate,  # ← C’EST ÇA QUI MANQUAIT !
+        top_k=15,
+        forecast=forecast
+    ))
 
     
-    eligible = df[df["Eligible_Future"]]
+    eligible = ranking.top
 
     if eligible.empty:
         st.error("No location is affordable under this scenario.")
         st.info("Try lowering inflation, increasing salary, or reducing down payment.")
-        st.stop()
+        return
 
-    st.success(f"**{len(eligible):,} locations** still affordable in **{2025 + horizon}**")
+    st.success(f"**{ranking.n_eligible:,} locations** still affordable in **{2025 + horizon}**")
 
     winner = eligible.iloc[0]
     st.markdown(f"""
@@ -65,6 +88,12 @@ def run():
     else:
         top15['ROI_5y_%'] = round(inflation * 100, 1)
 
+    # Appréciation réelle sur 5 ans (historique Zillow) quand le store est fourni
+    trend = load_trend_metrics("zhvi" if goal == "Buy" else "zori", years=5)
+    if trend is not None:
+        historical = (top15['ZIP'].map(trend['CAGR_5y']) * 100).round(1)
+        top15['ROI_5y_%'] = historical.fillna(top15['ROI_5y_%'])
+
     st.dataframe(
         top15[["Rank", "Location", "Metro", "StateName",
                "Asset_Price_Future", "Income_Needed_Future",
@@ -77,4 +106,49 @@ def run():
         use_container_width=True,
         hide_index=True
     )
-    st.caption("ROI 5y = average annual price/rent appreciation over 5 years • Data: Zillow Research • Author calculations")
\ No newline at end of file
+    if trend is not None:
+        st.caption("ROI 5y = historical average annual price/rent appreciation over the last 5 years "
+                   "(Zillow monthly history) • Data: Zillow Research • Author calculations")
+    else:
+        st.caption("ROI 5y = average annual price/rent appreciation over 5 years • Data: Zillow Research • Author calculations")
+
+    # --- Grille de sensibilité : salaire × taux (achat) ou salaire × horizon (location) ---
+    with st.expander("Sensitivity grid – how many locations stay affordable?", expanded=False):
+        # Indépendante du modèle de projection : pas reconstruite quand il change
+        fig = panel_output("prediction.sensitivity", lambda: sensitivity_figure(
+            salary, goal, horizon, down_payment_pct, inflation
+        ))
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption(f"Number of affordable locations in {2025 + horizon} for each income / "
+                   f"{'rate' if goal == 'Buy' else 'horizon'} combination • "
+                   f"inflation {inflation * 100:.1f}%")
+
+
+def sensitivity_figure(salary, goal, horizon, down_payment_pct, inflation):
+    salaries = np.unique(np.clip(np.round(salary * np.linspace(0.5, 1.5, 11), -3), 30_000, None))
+
+    if goal == "Buy":
+        rates = np.round(np.arange(0.03, 0.1201, 0.01), 4)
+        grid = sweep_locations(salaries, rates, [down_payment_pct], [horizon],
+                               goal=goal, inflation_rate=inflation)
+        heat = grid.pivot(index="Mortgage_Rate", columns="Salary", values="Eligible_Count")
+        heat.index = [f"{r * 100:.0f}%" for r in heat.index]
+        y_label = "Mortgage rate"
+    else:
+        horizons = [1, 3, 5, 10, 15, 20, 30]
+        grid = sweep_locations(salaries, [0.07], [0.20], horizons,
+                               goal=goal, inflation_rate=inflation)
+        heat = grid.pivot(index="Horizon", columns="Salary", values="Eligible_Count")
+        heat.index = [f"{h} yrs" for h in heat.index]
+        y_label = "Time horizon"
+    heat.columns = [f"${s / 1000:,.0f}k" for s in heat.columns]
+
+    fig = px.imshow(
+        heat,
+        text_auto=True,
+        aspect="auto",
+        color_continuous_scale="RdYlGn",
+        labels={"x": "Annual income", "y": y_label, "color": "Affordable ZIPs"}
+    )
+    fig.update_layout(height=450)
+    return fig
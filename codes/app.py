@@ -38,10 +38,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-import Home
-import Dashboard
-import Prediction
-
 if "page" not in st.session_state:
     st.session_state.page = "Home"
 
@@ -92,9 +88,16 @@ st.markdown(f"""
 </style>
 """, unsafe_allow_html=True)
 
+# Pages importées à la demande : seul l'onglet affiché est chargé
 if st.session_state.page == "Home":
+    import Home
+
     Home.run()
+    from utils.warmup import start_warmup  # après le rendu : n'entre pas dans le premier affichage
+    start_warmup()  # données préchargées en arrière-plan
 elif st.session_state.page == "Dashboard":
+    import Dashboard
+
     view = st.sidebar.radio("Section", ["National Overview", "My Personal Opportunities"])
     with st.sidebar:
         st.header("Your Profile")
@@ -123,5 +126,7 @@ elif st.session_state.page == "Dashboard":
         Dashboard.run_personal()
     
 else: 
+    import Prediction
+
     st.session_state.current_page = "Prediction"
     Prediction.run()
\ No newline at end of file
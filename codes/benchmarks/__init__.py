@@ -0,0 +1,2 @@
+# benchmarks/
+"""Benchmarks sans serveur Streamlit : voir benchmarks.run."""
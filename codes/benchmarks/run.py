@@ -0,0 +1,293 @@
+# benchmarks/run.py
+"""
+Micro-benchmarks des chemins critiques (chargement, recherche, classement,
+vue nationale, graphiques), exécutés sans serveur Streamlit sur des jeux
+synthétiques (benchmarks.synthetic).
+
+Chaque cas est exécuté une fois sans mesure (appel à froid : imports,
+initialisations de NumPy / pandas / Plotly), puis chronométré `repeat` fois ;
+les caches Streamlit et le cache de scénarios sont contournés (fonctions non
+cachées ou caches vidés avant chaque mesure), sauf pour les dépendances du
+cas, préchauffées une fois.
+Les résultats (JSON) sont comparés à une référence : un cas est une
+régression si sa médiane dépasse celle de la référence de plus de
+--threshold (et de plus de --min-delta secondes). Un cas absent de la
+référence fait aussi échouer le run : la référence doit être réenregistrée
+(--save-baseline) quand un cas est ajouté.
+
+Usage (depuis codes/) :
+    python -m benchmarks.run [--sizes 30k,300k,3M] [--repeat 5]
+                             [--baseline benchmarks/baseline.json] [--save-baseline]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit import config as st_config
+from streamlit.logger import set_log_level
+
+# Mode « bare » : config lue d'abord (elle réinitialise le niveau de log), puis
+# plus d'avertissements Streamlit (« No runtime found », « missing ScriptRunContext »…)
+st_config.get_option("logger.level")
+set_log_level("error")
+
+from benchmarks.synthetic import write_dataset
+from utils import zip_enrichment
+from utils.charts import affordability_scatter, data_table, kpi_row, map_us_states, top_expensive_areas
+from utils.data_loader import SNAPSHOT_PATH, load_affordability_data, load_affordability_frame
+from utils.filters import apply_filters
+from utils.geo_index import ZipGeoIndex, get_geo_index, locations_near
+from utils.hierarchy import build_hierarchy
+from utils.panels import clear_panel_outputs
+from utils.prediction_engine import break_even_summary, build_base_frame, get_best_locations, rank_locations
+from utils.scenario_cache import get_scenario_cache
+from utils.search_index import build_search_index
+from utils.user_profile import get_user_profile
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+RESULTS_DIR = BENCH_DIR / "results"
+DEFAULT_SIZES = "30k,300k,3M"
+DATA_DIR = Path(tempfile.gettempdir()) / "affordability_bench"
+
+SCENARIO = dict(salary=85_000, horizon=5, inflation_rate=0.04,
+                down_payment_pct=0.20, mortgage_rate=0.07)
+
+
+def parse_size(label):
+    """'30k' → 30 000, '3M' → 3 000 000."""
+    label = label.strip()
+    factor = {"k": 1_000, "m": 1_000_000}.get(label[-1].lower(), 1)
+    return int(float(label[:-1] if factor > 1 else label) * factor)
+
+
+def measure(fn, repeat, setup=None):
+    """
+    Temps (s) de fn sur `repeat` exécutions, après un appel de préchauffage
+    non compté ; setup (non chronométré) avant chacune.
+    """
+    times = []
+    for _ in range(repeat + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times = times[1:]  # premier appel (à froid) écarté
+    return {"median": statistics.median(times), "min": min(times), "repeat": repeat}
+
+
+def clear_caches():
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+@contextlib.contextmanager
+def synthetic_environment(root, uszips_path):
+    """
+    Dossier courant, source de données et uszips pointés sur le jeu synthétique
+    le temps du bloc, puis restaurés (caches vidés à l'entrée et à la sortie).
+    """
+    previous = (Path.cwd(), os.environ.get("DASHBOARD_DATA_SOURCE"), zip_enrichment.USZIPS_PATH)
+    os.chdir(root)  # snapshot Arrow écrit dans root/data_extracted/
+    os.environ["DASHBOARD_DATA_SOURCE"] = str(root)  # source « dossier local », sans téléchargement
+    zip_enrichment.USZIPS_PATH = uszips_path
+    clear_caches()
+    try:
+        yield
+    finally:
+        cwd, source, zip_enrichment.USZIPS_PATH = previous
+        os.chdir(cwd)
+        if source is None:
+            os.environ.pop("DASHBOARD_DATA_SOURCE", None)
+        else:
+            os.environ["DASHBOARD_DATA_SOURCE"] = source
+        clear_caches()
+
+
+# --- cas mesurés ---
+def bench_size(n_rows, repeat, data_dir, seed=0):
+    """Prépare le jeu de n_rows lignes et mesure tous les cas. Retourne {cas: stats}."""
+    root = Path(data_dir) / f"rows_{n_rows}_seed_{seed}"
+    csv_path, uszips_path = write_dataset(n_rows, root, seed)
+    with synthetic_environment(root, uszips_path):
+        return _bench_cases(root, csv_path, repeat)
+
+
+def _bench_cases(root, csv_path, repeat):
+    snapshot_path = root / SNAPSHOT_PATH
+    results = {}
+
+    # Chargement (cache Streamlit contourné) : parse CSV + écriture du snapshot, puis snapshot seul
+    results["load_csv"] = measure(
+        lambda: load_affordability_frame(csv_path, snapshot_path), repeat,
+        setup=lambda: snapshot_path.unlink(missing_ok=True)
+    )
+    results["load_snapshot"] = measure(lambda: load_affordability_frame(csv_path, snapshot_path), repeat)
+
+    df = load_affordability_data()  # version cachée, partagée par les cas suivants
+    index = build_search_index(df)
+    results["search_index_build"] = measure(lambda: build_search_index(df), repeat)
+    results["apply_filters"] = measure(lambda: apply_filters(df, index), repeat)
+
+    # Classement : table de base chaude, cache de scénarios vidé avant chaque mesure
+    city_map = zip_enrichment.load_zip_to_city()
+    results["base_frame_build"] = measure(lambda: build_base_frame(df, city_map), repeat)
+    for goal in ("Buy", "Rent"):
+        results[f"best_locations_{goal.lower()}"] = measure(
+            lambda: get_best_locations(goal=goal, **SCENARIO), repeat,
+            setup=get_scenario_cache().clear
+        )
+        results[f"rank_top100_{goal.lower()}"] = measure(
+            lambda: rank_locations(goal=goal, top_k=100, **SCENARIO), repeat,
+            setup=get_scenario_cache().clear
+        )
+
+    # Index spatial : construction, puis requêtes de rayon croissant (index en cache)
+    base = build_base_frame(df, city_map)
+    results["geo_index_build"] = measure(lambda: ZipGeoIndex(base, city_map), repeat)
+    work_zip = get_geo_index().zips[0]
+    results["nearby_radius_sweep"] = measure(
+        lambda: [locations_near(work_zip, radius, top_k=20, **SCENARIO) for radius in (10, 50, 200)], repeat
+    )
+
+    # Point mort achat / location : échéanciers (ZIP × 360 mois) de toutes les lignes, par blocs
+    results["break_even_all_zips"] = measure(
+        lambda: break_even_summary(base['ZHVI'].to_numpy(), base['ZORI'].to_numpy(), SCENARIO['horizon']), repeat
+    )
+
+    # Vue nationale : construction des agrégats, puis la page complète (agrégats en cache).
+    # Sans serveur, st.fragment n'exécute rien : les panneaux sont appelés directement.
+    results["hierarchy_build"] = measure(lambda: build_hierarchy(base), repeat)
+    import Dashboard
+    get_user_profile()  # valeurs par défaut du profil dans l'état de session
+
+    def render_national():
+        national = load_affordability_data()
+        for _, panel, needs_data in Dashboard.national_panels():
+            panel.__wrapped__(*((national,) if needs_data else ()))
+
+    render_national()
+    # premier rendu de la session, puis relance après un changement du profil (contenu réutilisé)
+    results["run_national"] = measure(render_national, repeat, setup=clear_panel_outputs)
+    results["run_national_rerun"] = measure(render_national, repeat)
+
+    # Graphiques sur le jeu complet
+    for name, builder in (("kpi_row", kpi_row), ("map_us_states", map_us_states),
+                          ("top_expensive_areas", top_expensive_areas),
+                          ("affordability_scatter", affordability_scatter),
+                          ("data_table", data_table)):
+        results[f"chart_{name}"] = measure(lambda: builder(df), repeat)
+
+    clear_caches()
+    return results
+
+
+# --- comparaison à la référence ---
+def compare(results, baseline, threshold=0.25, min_delta=0.005) -> pd.DataFrame:
+    """Une ligne par (taille, cas) du run, avec ratio et statut (MISSING : absent de la référence)."""
+    rows = []
+    for size, cases in results["results"].items():
+        reference = baseline["results"].get(size, {})
+        for case, stats in cases.items():
+            if case not in reference:
+                rows.append({"size": size, "case": case, "baseline_s": np.nan,
+                             "current_s": stats["median"], "ratio": np.nan, "status": "MISSING"})
+                continue
+            current, previous = stats["median"], reference[case]["median"]
+            ratio = current / previous if previous > 0 else np.inf
+            if ratio > 1 + threshold and current - previous > min_delta:
+                status = "REGRESSION"
+            elif ratio < 1 / (1 + threshold) and previous - current > min_delta:
+                status = "faster"
+            else:
+                status = "ok"
+            rows.append({"size": size, "case": case, "baseline_s": previous,
+                         "current_s": current, "ratio": ratio, "status": status})
+    return pd.DataFrame(rows, columns=["size", "case", "baseline_s", "current_s", "ratio", "status"])
+
+
+def environment():
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "streamlit": st.__version__,
+    }
+
+
+def write_json(payload, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks sans serveur des chemins critiques du dashboard.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"tailles des jeux synthétiques (défaut : {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=5, help="mesures par cas (médiane retenue)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=str(DATA_DIR), help="dossier des jeux générés (réutilisés d'un run à l'autre)")
+    parser.add_argument("--output", default=None, help="fichier JSON des résultats (défaut : benchmarks/results/<date>.json)")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="référence à comparer")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre ce run comme nouvelle référence")
+    parser.add_argument("--threshold", type=float, default=0.25, help="ralentissement toléré (0.25 = +25 %%)")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="écart minimal (s) pour signaler une régression")
+    args = parser.parse_args(argv)
+
+    # Chemins résolus avant les changements de dossier de bench_size
+    output = Path(args.output or RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json").resolve()
+    baseline_path = Path(args.baseline).resolve()
+    data_dir = Path(args.data_dir).resolve()
+    cwd = Path.cwd()
+
+    payload = {"environment": environment(), "repeat": args.repeat, "seed": args.seed, "results": {}}
+    try:
+        for label in args.sizes.split(","):
+            n_rows = parse_size(label)
+            print(f"[bench] {label} ({n_rows:,} rows)...", flush=True)
+            payload["results"][label.strip()] = bench_size(n_rows, args.repeat, data_dir, args.seed)
+    finally:
+        os.chdir(cwd)
+
+    write_json(payload, output)
+    print(f"[bench] results → {output}")
+
+    if args.save_baseline:
+        write_json(payload, baseline_path)
+        print(f"[bench] baseline updated → {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print("[bench] no baseline to compare with (use --save-baseline)")
+        return 0
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    report = compare(payload, baseline, args.threshold, args.min_delta)
+    with pd.option_context("display.max_rows", None, "display.width", 120):
+        print(report.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    regressions = report[report["status"] == "REGRESSION"]
+    missing = report[report["status"] == "MISSING"]
+    if len(regressions):
+        print(f"[bench] {len(regressions)} regression(s) vs baseline ({baseline['environment']['timestamp']})")
+    if len(missing):
+        print(f"[bench] {len(missing)} case(s) missing from the baseline (re-record with --save-baseline)")
+    return 1 if len(regressions) or len(missing) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# benchmarks/synthetic.py
+"""
+Jeux de données synthétiques au schéma de 'affordability_zip.csv' (+ uszips.csv),
+générés de façon déterministe (graine fixe) pour les benchmarks.
+Au-delà du nombre de ZIP disponibles, chaque ZIP est répété sur plusieurs mois
+(colonne Date), comme un historique empilé.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import CSV_RELATIVE_PATH
+
+MAX_ZIPS = 40_000
+STATES = [
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "FL", "GA", "HI", "ID", "IL",
+    "IN", "IA", "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT",
+    "NE", "NV", "NH", "NJ", "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI",
+    "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY", "DC",
+]
+MAJOR_METROS = [
+    "New York-Newark-Jersey City, NY-NJ-PA",
+    "Los Angeles-Long Beach-Anaheim, CA",
+    "Chicago-Naperville-Elgin, IL-IN-WI",
+    "Dallas-Fort Worth-Arlington, TX",
+    "Miami-Fort Lauderdale-Pompano Beach, FL",
+    "Boston-Cambridge-Newton, MA-NH",
+    "Seattle-Tacoma-Bellevue, WA",
+]
+CITIES = ["Springfield", "Riverside", "Fairview", "New York", "Miami", "Franklin",
+          "Clinton", "Greenville", "Madison", "Georgetown", "Salem", "Bristol"]
+N_METROS = 900
+MISSING_METRO = 0.10   # ZIP hors metro (Metro vide), comme dans les données réelles
+MISSING_ZORI = 0.05
+
+
+def make_affordability(n_rows, seed=0):
+    """Tableau synthétique : ZIP × mois, valeurs log-normales cohérentes par ZIP."""
+    rng = np.random.default_rng(seed)
+    n_zips = min(n_rows, MAX_ZIPS)
+    n_months = -(-n_rows // n_zips)
+
+    # --- attributs par ZIP ---
+    zips = np.sort(rng.choice(np.arange(501, 99_951), n_zips, replace=False))
+    metros = np.array(MAJOR_METROS + [
+        f"Metro {i}, {STATES[i % len(STATES)]}" for i in range(N_METROS - len(MAJOR_METROS))
+    ], dtype=object)
+    zip_metro = metros[rng.integers(0, len(metros), n_zips)]
+    zip_metro[rng.random(n_zips) < MISSING_METRO] = None
+    zip_state = np.array(STATES, dtype=object)[rng.integers(0, len(STATES), n_zips)]
+    zhvi = rng.lognormal(12.5, 0.55, n_zips)
+    zori = rng.lognormal(7.4, 0.3, n_zips)
+    agi = rng.lognormal(11.2, 0.4, n_zips)
+
+    # --- lignes : mois × ZIP, tronqué à n_rows ---
+    row_zip = np.tile(np.arange(n_zips), n_months)[:n_rows]
+    row_month = np.repeat(np.arange(n_months), n_zips)[:n_rows]
+    dates = pd.period_range(end="2024-10", periods=n_months, freq="M").to_timestamp(how="end")
+    drift = np.exp(0.003 * (row_month - (n_months - 1)))
+    noise = rng.normal(1.0, 0.01, n_rows)
+
+    df = pd.DataFrame({
+        "ZIP": zips[row_zip],
+        "Date": dates.strftime("%Y-%m-%d")[row_month],
+        "ZHVI": zhvi[row_zip] * drift * noise,
+        "ZORI": zori[row_zip] * drift * noise,
+        "Metro": zip_metro[row_zip],
+        "StateName": zip_state[row_zip],
+        "Avg_AGI": agi[row_zip],
+    })
+    df.loc[rng.random(n_rows) < MISSING_ZORI, "ZORI"] = np.nan
+    df["Income_Needed_Rent"] = df["ZORI"] * 12 / 0.30
+    df["Income_Needed_Buy"] = df["ZHVI"] * 0.80 * 0.0798 / 0.30
+    return df
+
+
+def make_uszips(df, seed=0):
+    """Table ZIP → ville / état au format de uszips.csv (90 % des ZIP couverts)."""
+    rng = np.random.default_rng(seed + 1)
+    zips = pd.unique(df["ZIP"])
+    zips = zips[rng.random(len(zips)) < 0.9]
+    return pd.DataFrame({
+        "zip": pd.Series(zips).astype(str).str.zfill(5),
+        "city": rng.choice([c.lower() for c in CITIES], len(zips)),
+        "state_id": rng.choice(STATES, len(zips)),
+        "lat": rng.uniform(25, 48, len(zips)),
+        "lng": rng.uniform(-124, -70, len(zips)),
+    })
+
+
+def write_dataset(n_rows, root, seed=0):
+    """
+    Écrit le jeu synthétique dans root/ avec l'arborescence d'une racine de
+    données (data/data_cleaned/affordability_zip.csv) et root/uszips.csv.
+    Réutilisé tel quel s'il existe déjà. Retourne (csv_path, uszips_path).
+    """
+    root = Path(root)
+    csv_path = root / CSV_RELATIVE_PATH
+    uszips_path = root / "uszips.csv"
+    if csv_path.exists() and uszips_path.exists():
+        return csv_path, uszips_path
+
+    df = make_affordability(n_rows, seed)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(csv_path, index=False, float_format="%.2f")
+    make_uszips(df, seed).to_csv(uszips_path, index=False)
+    return csv_path, uszips_path
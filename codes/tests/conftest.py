@@ -0,0 +1,36 @@
+# tests/conftest.py
+"""Tests exécutés depuis codes/ : python -m pytest -q"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def base_frame():
+    """Petite table de base : ex aequo de prix, NaN, ZIP hors metro."""
+    rng = np.random.default_rng(7)
+    n = 600
+    states = np.array(["CA", "TX", "NY", "FL"])
+    metros = np.array(["Metro A, CA", "Metro B, TX", "Metro C, NY-NJ", "Non-metropolitan area"])
+    zhvi = rng.choice([150_000, 250_000, 400_000], n) * rng.choice([1.0, 1.5], n)  # nombreux ex aequo
+    zori = np.round(zhvi * rng.uniform(0.004, 0.007, n), -1)
+    zhvi[::97] = np.nan
+    zori[::89] = np.nan
+    state = states[rng.integers(0, 4, n)]
+    frame = pd.DataFrame({
+        "ZIP": [f"{i:05d}" for i in range(n)],
+        "StateName": state,
+        "Metro": metros[rng.integers(0, 4, n)],
+        "City": np.array(["Springfield", "Riverside", "Franklin"])[rng.integers(0, 3, n)],
+        "ZHVI": zhvi,
+        "ZORI": zori,
+        "Avg_AGI": rng.uniform(30_000, 200_000, n),
+    })
+    frame["Income_Needed_Rent"] = frame["ZORI"] * 12 / 0.30
+    frame["Income_Needed_Buy"] = frame["ZHVI"] * 0.2
+    return frame
@@ -0,0 +1,54 @@
+# tests/test_aggregates.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import aggregates, data_loader
+from utils.aggregates import group_summary, summarize
+from utils.data_loader import freeze_frame, is_full_dataset, shared_view
+from utils.hierarchy import Hierarchy, add_derived_metrics, node_labels
+
+METRICS = ["ZHVI", "ZORI", "Rent_Ratio"]
+
+
+@pytest.fixture
+def frozen(base_frame, monkeypatch):
+    """Jeu complet « en cache » de la version v1 (comme _load_affordability_version), et sa hiérarchie."""
+    frame = freeze_frame(base_frame.astype({"StateName": "category", "Metro": "category"}))
+    hierarchy = Hierarchy(frame)
+    monkeypatch.setattr(data_loader, "get_data_version", lambda: "v1")
+    monkeypatch.setattr(data_loader, "_load_affordability_version", lambda version: frame)
+    monkeypatch.setattr(aggregates, "get_hierarchy", lambda: hierarchy)
+    return frame
+
+
+def test_is_full_dataset(frozen):
+    assert is_full_dataset(shared_view(frozen))
+    assert is_full_dataset(shared_view(frozen).reset_index(drop=True))
+    for other in (
+        frozen.assign(ZHVI=frozen["ZHVI"] * 2),                  # même longueur, autres données
+        frozen.assign(StateName=frozen["StateName"].astype(str)),  # autre colonne catégorielle
+        frozen.sort_values("ZHVI"),                              # mêmes lignes, autre ordre
+        frozen.iloc[:50],                                        # sous-ensemble
+    ):
+        assert not is_full_dataset(other)
+
+
+@pytest.mark.parametrize("q", [0.25, 0.5, 0.9])
+def test_summarize_full_dataset_and_subset(frozen, q):
+    for df in (shared_view(frozen), frozen[frozen["StateName"].isin(["CA", "TX"])]):
+        expected = add_derived_metrics(df)[METRICS].quantile(q)
+        pd.testing.assert_series_equal(summarize(df, METRICS, q), expected, check_names=False)
+
+
+@pytest.mark.parametrize("level", ["StateName", "Metro"])
+def test_group_summary_full_dataset_and_subset(frozen, level):
+    for df in (shared_view(frozen), frozen[frozen["ZHVI"] > 200_000], frozen.assign(ZHVI=1.0)):
+        expected = add_derived_metrics(df).groupby(node_labels(df, level))[METRICS].quantile(0.5)
+        got = group_summary(df, level, METRICS).sort_index()
+        pd.testing.assert_frame_equal(got, expected.sort_index(), check_names=False, check_dtype=False)
+
+
+def test_quantiles_outside_the_hierarchy_are_computed(frozen):
+    df = shared_view(frozen)
+    np.testing.assert_allclose(summarize(df, ["ZHVI"], 0.33), np.nanquantile(df["ZHVI"], 0.33))
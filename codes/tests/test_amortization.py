@@ -0,0 +1,67 @@
+# tests/test_amortization.py
+import numpy as np
+import pytest
+
+from utils.prediction_engine import (
+    amortization_schedule,
+    break_even_summary,
+    calculate_monthly_payment,
+)
+
+
+def monthly_loop(price, rent, down=0.20, rate=0.07, years=30, growth=0.04,
+                 tax=0.012, insurance=0.0035, hoa=150, closing=0.03, selling=0.06):
+    """Échéancier de référence, mois par mois."""
+    loan = price * (1 - down)
+    r, n = rate / 12, years * 12
+    payment = loan / n if r == 0 else loan * r * (1 + r) ** n / ((1 + r) ** n - 1)
+    balance, paid, rent_paid, rows = loan, 0.0, 0.0, []
+    for month in range(1, n + 1):
+        interest = balance * r
+        principal = payment - interest
+        balance -= principal
+        paid += payment + price * (tax + insurance) / 12 + hoa
+        rent_paid += rent * (1 + growth) ** ((month - 1) // 12)
+        value = price * (1 + growth) ** (month / 12)
+        buy_cost = price * (down + closing) + paid - (value * (1 - selling) - balance)
+        rows.append((interest, principal, max(balance, 0.0), value - balance, buy_cost, rent_paid))
+    return np.array(rows)
+
+
+@pytest.mark.parametrize("rate", [0.07, 0.035, 0.0])
+def test_schedule_matches_monthly_loop(rate):
+    prices, rents = np.array([300_000.0, 750_000.0]), np.array([1_800.0, 2_600.0])
+    schedule = amortization_schedule(prices, rents, rate=rate)
+    for i in range(len(prices)):
+        expected = monthly_loop(prices[i], rents[i], rate=rate)
+        for j, name in enumerate(["interest", "principal", "balance", "equity", "buy_cost", "rent_cost"]):
+            np.testing.assert_allclose(schedule[name][i], expected[:, j], rtol=1e-9, atol=1e-4, err_msg=name)
+
+
+def test_first_month_payment_matches_calculate_monthly_payment():
+    schedule = amortization_schedule([400_000.0], [2_000.0])
+    first = sum(schedule[name][0, 0] for name in ("interest", "principal", "tax", "insurance", "hoa"))
+    assert first == pytest.approx(calculate_monthly_payment(400_000))
+
+
+def test_break_even_is_independent_of_chunking():
+    rng = np.random.default_rng(1)
+    prices = rng.uniform(100_000, 900_000, 500)
+    rents = prices * rng.uniform(0.003, 0.008, 500)
+    prices[7] = np.nan
+    rents[11] = np.nan
+    whole = break_even_summary(prices, rents, horizon=5)
+    chunked = break_even_summary(prices, rents, horizon=5, max_chunk_bytes=100_000)
+    for name in whole:
+        np.testing.assert_array_equal(whole[name], chunked[name])
+    assert np.isnan(whole["Break_Even_Year"][[7, 11]]).all()
+
+
+def test_break_even_month_is_first_crossing():
+    price, rent = 350_000.0, 2_400.0
+    expected = monthly_loop(price, rent)
+    month = int(np.argmax(expected[:, 4] <= expected[:, 5])) + 1
+    summary = break_even_summary([price], [rent], horizon=5)
+    assert summary["Break_Even_Month"][0] == month
+    assert summary["Break_Even_Year"][0] == np.ceil(month / 12)
+    assert summary["Equity_Horizon"][0] == pytest.approx(expected[59, 3])
@@ -0,0 +1,138 @@
+# tests/test_batch_scoring.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.batch_scoring import (
+    OUTPUT_SCENARIO_COLUMNS,
+    ResultWriter,
+    normalize_profiles,
+    prefix_candidates,
+    rank_group,
+)
+from utils.prediction_engine import compute_scenario_columns, select_top_eligible
+from utils.scenario_cache import normalize_scenario_key
+
+
+def brute_force_candidates(weight, k):
+    """Éléments dans le top k (score décroissant, puis position) d'au moins un préfixe."""
+    weight = np.where(np.isnan(weight), -np.inf, weight)
+    found = set()
+    for end in range(1, len(weight) + 1):
+        prefix = weight[:end]
+        order = np.argsort(-prefix, kind="stable")
+        found.update(int(i) for i in order[:k] if prefix[i] > -np.inf)
+    return found
+
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_prefix_candidates_cover_brute_force(k):
+    rng = np.random.default_rng(k)
+    weight = rng.integers(0, 8, 200).astype(np.float64)  # nombreux ex aequo
+    weight[::13] = np.nan
+    assert brute_force_candidates(weight, k) <= set(prefix_candidates(weight, k).tolist())
+
+
+@pytest.mark.parametrize("goal", ["Buy", "Rent"])
+def test_rank_group_matches_select_top_eligible(base_frame, goal):
+    top_k = 10
+    cols = compute_scenario_columns(base_frame, 1.0, goal, 5, 0.04, 0.20, 0.07)
+    income, asset = cols["Income_Needed_Future"], cols["Asset_Price_Future"]
+    salaries = np.array([20_000, 45_000, 60_000, 85_000, 150_000, 1_000_000], dtype=np.float64)
+
+    for start, best, best_score, n_eligible in rank_group(salaries, income, asset, top_k):
+        for i, salary in enumerate(salaries[start:start + len(best)]):
+            ref = compute_scenario_columns(base_frame, salary, goal, 5, 0.04, 0.20, 0.07)
+            expected = select_top_eligible(ref["Score"], ref["Eligible_Future"], top_k)
+            got = best[i][best[i] >= 0]
+            np.testing.assert_array_equal(got, expected)
+            np.testing.assert_array_equal(best_score[i][:len(got)], ref["Score"][expected])
+            assert n_eligible[i] == ref["Eligible_Future"].sum()
+
+
+def test_select_top_eligible_breaks_ties_by_row():
+    score = np.array([5.0, 7.0, 5.0, 7.0, 5.0, 1.0])
+    eligible = np.ones(len(score), dtype=bool)
+    np.testing.assert_array_equal(select_top_eligible(score, eligible, 3), [1, 3, 0])
+    np.testing.assert_array_equal(select_top_eligible(score, eligible), [1, 3, 0, 2, 4, 5])
+
+
+def test_normalize_profiles_snaps_like_the_app():
+    profiles = pd.DataFrame({
+        "salary": [85_000.4, 85_000.6, 60_000, 70_000],
+        "goal": ["Buy", "Buy", "Rent", "Buy a home"],
+        "horizon": [5, 5.0, 3, 7],
+        "inflation": [0.0412, 0.04, 0.031, 0.05],
+        "down_payment": [0.2012, 0.2, 0.1, 0.3],
+        "rate": [0.07049, 0.0701, 0.05, 0.061],
+    })
+    normalized = normalize_profiles(profiles)
+    for row, source in zip(normalized.itertuples(), profiles.itertuples()):
+        key = normalize_scenario_key(
+            source.salary, source.goal, source.horizon, source.inflation, source.down_payment, source.rate
+        )
+        assert row.salary == key[0]
+        assert (row.goal, row.horizon, row.inflation_rate) == key[1:4]
+        if row.goal == "Buy":
+            assert (row.down_payment_pct, row.mortgage_rate) == key[4:]
+        else:
+            assert (row.down_payment_pct, row.mortgage_rate) == (0.20, 0.07)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_result_writer_round_trip(tmp_path, suffix):
+    path = tmp_path / f"out{suffix}"
+    writer = ResultWriter(path)
+    first = pd.DataFrame({"profile_id": [1, 1], "rank": [1, 2], "ZIP": ["00001", "00002"], "Score": [2.0, 1.0]})
+    second = pd.DataFrame({"profile_id": [2], "rank": [1], "ZIP": ["00003"], "Score": [3.0]})
+    writer.write(first)
+    writer.write(second)
+    writer.close()
+
+    read = pd.read_parquet(path) if suffix == ".parquet" else pd.read_csv(path, dtype={"ZIP": str})
+    expected = pd.concat([first, second], ignore_index=True)
+    pd.testing.assert_frame_equal(read.reset_index(drop=True), expected, check_dtype=False)
+    assert writer.rows == 3
+
+
+def test_result_writer_empty_output_has_header(tmp_path):
+    path = tmp_path / "empty.csv"
+    writer = ResultWriter(path)
+    writer.close()
+    assert list(pd.read_csv(path).columns[:2]) == ["profile_id", "rank"]
+    assert set(OUTPUT_SCENARIO_COLUMNS) <= set(pd.read_csv(path).columns)
+
+
+def test_score_profiles_matches_rank_locations(base_frame, monkeypatch, tmp_path):
+    from utils import batch_scoring, prediction_engine
+
+    base = base_frame.assign(Location=base_frame["City"] + " (" + base_frame["Metro"] + ")")
+    for module in (prediction_engine, batch_scoring):
+        monkeypatch.setattr(module, "get_base_version", lambda: "test-base")
+        monkeypatch.setattr(module, "load_base_frame", lambda version: base)
+    monkeypatch.setattr(prediction_engine, "get_compute_pool", lambda: None)
+
+    profiles = pd.DataFrame({
+        "profile_id": ["a", "b", "c", "d"],
+        "salary": [45_000, 85_000.4, 150_000, 60_000],
+        "goal": ["Buy", "Buy", "Rent", "Rent"],
+        "mortgage_rate": [0.07, 0.0651, 0.05, 0.07],
+    })
+    output = tmp_path / "results.csv"
+    batch_scoring.score_profiles(profiles, output, top_k=10)
+    results = pd.read_csv(output, dtype={"ZIP": str})
+
+    for profile in profiles.itertuples():
+        ranking = prediction_engine.rank_locations(
+            salary=profile.salary, goal=profile.goal, mortgage_rate=profile.mortgage_rate, top_k=10
+        )
+        got = results[results["profile_id"] == profile.profile_id]
+        assert got["ZIP"].tolist() == ranking.top["ZIP"].tolist()
+        np.testing.assert_allclose(got["Score"], ranking.top["Score"], rtol=1e-12)
+        assert (got["Eligible_Count"] == ranking.n_eligible).all()
+
+    # scénario effectivement classé, écrit dans les résultats
+    scored = results.drop_duplicates("profile_id").set_index("profile_id")
+    assert scored.loc["b", "salary"] == 85_000
+    assert scored.loc["b", "mortgage_rate"] == pytest.approx(0.065)
+    assert scored.loc["c", "goal"] == "Rent" and np.isnan(scored.loc["c", "mortgage_rate"])
@@ -0,0 +1,22 @@
+# tests/test_benchmarks.py
+from benchmarks.run import compare, measure
+
+
+def test_measure_discards_the_warmup_call():
+    calls = []
+    stats = measure(lambda: calls.append(1), repeat=3, setup=lambda: calls.append(0))
+    assert calls == [0, 1] * 4 and stats["repeat"] == 3
+
+
+def test_compare_flags_cases_missing_from_the_baseline():
+    baseline = {"results": {"30k": {"load_csv": {"median": 0.10}, "old_case": {"median": 1.0}}}}
+    results = {"results": {
+        "30k": {"load_csv": {"median": 0.20}, "new_case": {"median": 0.5}},
+        "3M": {"load_csv": {"median": 1.0}},
+    }}
+    report = compare(results, baseline).set_index(["size", "case"])["status"]
+    assert report.to_dict() == {
+        ("30k", "load_csv"): "REGRESSION",
+        ("30k", "new_case"): "MISSING",
+        ("3M", "load_csv"): "MISSING",
+    }
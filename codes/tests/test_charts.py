@@ -0,0 +1,45 @@
+# tests/test_charts.py
+import numpy as np
+import pandas as pd
+
+from utils import charts, data_loader
+from utils.charts import _frame_key, bin_points
+from utils.data_loader import freeze_frame, shared_view
+
+COLUMNS = ["Avg_AGI", "Income_Needed_Rent", "ZHVI"]
+
+
+def test_frame_key_follows_values_not_index(base_frame, monkeypatch):
+    frame = freeze_frame(base_frame)
+    monkeypatch.setattr(data_loader, "_load_affordability_version", lambda version: frame)
+    monkeypatch.setattr(data_loader, "get_data_version", lambda: "v1")
+    monkeypatch.setattr(charts, "get_data_version", lambda: "v1")
+
+    assert _frame_key(shared_view(frame), COLUMNS) == ("v1", "full")
+    subset = frame[frame["StateName"] == "CA"]
+    assert _frame_key(subset, COLUMNS) == _frame_key(subset.copy(), COLUMNS)
+    assert _frame_key(subset, COLUMNS) != _frame_key(subset.assign(ZHVI=subset["ZHVI"] + 1), COLUMNS)
+    derived = frame.assign(Avg_AGI=frame["Avg_AGI"] * 1.1)  # même RangeIndex, autres valeurs
+    assert _frame_key(derived, COLUMNS) not in (_frame_key(shared_view(frame), COLUMNS), _frame_key(frame.copy(), COLUMNS))
+
+
+def test_bin_points_matches_per_cell_reference():
+    rng = np.random.default_rng(5)
+    x, y = rng.lognormal(11, 0.5, 3_000), rng.lognormal(11, 0.6, 3_000)
+    z = rng.uniform(1e5, 1e6, 3_000)
+    x[::50], z[::70] = np.nan, np.nan
+    grid = bin_points(x, y, z, bins=20)
+
+    keep = np.isfinite(x) & np.isfinite(y)
+    edges = [np.geomspace(v[keep].min(), v[keep].max(), 21) for v in (x, y)]
+    counts, _, _ = np.histogram2d(x[keep], y[keep], bins=edges)
+    assert grid["count"].sum() == keep.sum()
+    assert sorted(grid["count"]) == sorted(counts[counts > 0].astype(int))
+
+    ix = np.clip(np.searchsorted(edges[0], x[keep], side="right") - 1, 0, 19)
+    iy = np.clip(np.searchsorted(edges[1], y[keep], side="right") - 1, 0, 19)
+    expected = pd.Series(z[keep]).groupby(ix * 20 + iy).median()
+    centers = [np.sqrt(e[:-1] * e[1:]) for e in edges]
+    for row in grid.itertuples():
+        cell = int(np.argmin(abs(centers[0] - row.x))) * 20 + int(np.argmin(abs(centers[1] - row.y)))
+        np.testing.assert_allclose(row.median_z, expected.get(cell, np.nan), equal_nan=True)
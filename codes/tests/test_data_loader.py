@@ -0,0 +1,76 @@
+# tests/test_data_loader.py
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from utils import data_loader
+from utils.data_loader import CSV_RELATIVE_PATH, data_root, ensure_source_csv
+from utils.data_source import ArchiveSource, DataSourceError, load_config
+
+
+class CountingSource(ArchiveSource):
+    prepared = 0
+
+    def prepare(self):
+        CountingSource.prepared += 1
+        return super().prepare()
+
+
+@pytest.fixture
+def archive_source(tmp_path, monkeypatch):
+    import zipfile
+
+    archive = tmp_path / "data.zip"
+    with zipfile.ZipFile(archive, "w") as out:
+        out.writestr(CSV_RELATIVE_PATH.as_posix(), "ZIP\n00001\n")
+    source = CountingSource(archive, extract_dir=tmp_path / "extracted")
+    CountingSource.prepared = 0
+    monkeypatch.setattr(data_loader, "get_data_source", lambda: source)
+    return source
+
+
+def test_data_root_prepares_once_per_archive_version(archive_source):
+    root = data_root()
+    assert data_root() == root and ensure_source_csv() == root / CSV_RELATIVE_PATH
+    assert CountingSource.prepared == 1
+
+    stat = archive_source.archive_path.stat()
+    os.utime(archive_source.archive_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    data_root()
+    assert CountingSource.prepared == 2
+
+
+def test_data_root_raises_outside_a_script_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, "get_data_source", lambda: ArchiveSource(tmp_path / "missing.zip"))
+    with pytest.raises(DataSourceError, match="introuvable"):
+        data_root()
+
+
+def test_load_config_rereads_a_changed_file(tmp_path, monkeypatch):
+    monkeypatch.delenv("DASHBOARD_DATA_SOURCE", raising=False)
+    monkeypatch.delenv("DASHBOARD_DATA_SHA256", raising=False)
+    path = tmp_path / "data_source.json"
+    path.write_text(json.dumps({"source": "a.zip"}))
+    assert load_config(path) == {"source": "a.zip"}
+
+    path.write_text(json.dumps({"source": "bb.zip", "sha256": "ff"}))
+    assert load_config(path) == {"source": "bb.zip", "sha256": "ff"}
+    monkeypatch.setenv("DASHBOARD_DATA_SOURCE", "c.zip")
+    assert load_config(path)["source"] == "c.zip"
+    assert load_config(path / "absent.json") == {"source": "c.zip"}
+
+
+def test_snapshot_numeric_columns_are_zero_copy(base_frame, tmp_path):
+    from utils.data_loader import FLOAT_COLUMNS, read_snapshot, write_snapshot
+
+    frame = base_frame.astype({name: "float32" for name in FLOAT_COLUMNS})
+    write_snapshot(frame, tmp_path / "snapshot.arrow", {"v": 1})
+    assert read_snapshot(tmp_path / "snapshot.arrow", {"v": 2}) is None
+    loaded = read_snapshot(tmp_path / "snapshot.arrow", {"v": 1})
+
+    pd.testing.assert_frame_equal(loaded, frame, check_dtype=False)
+    for name in FLOAT_COLUMNS:
+        values = loaded[name].to_numpy()
+        assert values.dtype == "float32" and not values.flags.owndata and not values.flags.writeable
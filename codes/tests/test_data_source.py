@@ -0,0 +1,58 @@
+# tests/test_data_source.py
+import zipfile
+
+import pytest
+
+from utils.data_source import ArchiveSource, DataSourceError, needed_member
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("data/data_cleaned/affordability_zip.csv", True),
+    ("data/data_cleaned/manifest.json", True),
+    ("data/data_cleaned/timeseries/zhvi/values.npy", True),
+    ("data/data_cleaned/other.csv", False),
+    ("data/data_cleaned/timeseries/", False),
+    ("data/data_cleaned/timeseries/../../../../x", False),
+    ("data/data_cleaned/timeseries/zhvi/../../../../../x", False),
+    ("/data/data_cleaned/affordability_zip.csv", False),
+    ("data/data_cleaned/timeseries/..\\..\\x", False),
+])
+def test_needed_member(name, expected):
+    assert needed_member(name) is expected
+
+
+def make_archive(path, members):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return path
+
+
+def test_archive_extracts_only_needed_members(tmp_path):
+    archive = make_archive(tmp_path / "data.zip", {
+        "data/data_cleaned/affordability_zip.csv": "ZIP\n00001\n",
+        "data/data_cleaned/timeseries/../../../../evil.txt": "x",
+        "data/raw/big.csv": "x",
+    })
+    root = ArchiveSource(archive, extract_dir=tmp_path / "extracted").prepare()
+
+    files = sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*") if p.is_file())
+    assert files == [
+        "data.zip",
+        f"extracted/{root.name}/.complete",
+        f"extracted/{root.name}/data/data_cleaned/affordability_zip.csv",
+    ]
+    assert ArchiveSource(archive, extract_dir=tmp_path / "extracted").prepare() == root
+
+
+def test_archive_sha256_mismatch(tmp_path):
+    archive = make_archive(tmp_path / "data.zip", {"data/data_cleaned/affordability_zip.csv": "ZIP\n"})
+    with pytest.raises(DataSourceError):
+        ArchiveSource(archive, sha256="0" * 64, extract_dir=tmp_path / "extracted").prepare()
+
+
+def test_archive_without_csv(tmp_path):
+    archive = make_archive(tmp_path / "data.zip", {"data/data_cleaned/manifest.json": "{}"})
+    with pytest.raises(DataSourceError):
+        ArchiveSource(archive, extract_dir=tmp_path / "extracted").prepare()
+    assert not list((tmp_path / "extracted").glob("*"))
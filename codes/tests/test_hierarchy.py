@@ -0,0 +1,73 @@
+# tests/test_hierarchy.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.hierarchy import (
+    HIERARCHY_LEVELS,
+    NODE_METRICS,
+    NODE_QUANTILES,
+    Hierarchy,
+    add_derived_metrics,
+    node_labels,
+    segment_quantiles,
+)
+
+
+def test_segment_quantiles_match_groupby():
+    rng = np.random.default_rng(3)
+    codes = rng.integers(-1, 12, 2_000)
+    values = rng.normal(100, 30, 2_000)
+    values[::11] = np.nan
+    got, counts = segment_quantiles(codes, values, 13)
+
+    keep = codes >= 0
+    expected = pd.Series(values[keep]).groupby(codes[keep]).quantile(list(NODE_QUANTILES)).unstack()
+    expected = expected.reindex(range(13))
+    np.testing.assert_allclose(got, expected.to_numpy(), rtol=1e-12)
+    assert counts[12] == 0 and np.isnan(got[12]).all()
+
+
+@pytest.fixture
+def hierarchy(base_frame):
+    return Hierarchy(base_frame)
+
+
+@pytest.mark.parametrize("level", ["StateName", "Metro"])
+@pytest.mark.parametrize("q", [0.1, 0.5, 0.9])
+def test_table_matches_groupby(base_frame, hierarchy, level, q):
+    labels = node_labels(base_frame, level)  # hors metro : un nœud par état
+    expected = add_derived_metrics(base_frame).groupby(labels)[NODE_METRICS].quantile(q)
+    got = hierarchy.table(level, q=q, names=expected.index)
+    pd.testing.assert_frame_equal(got[NODE_METRICS], expected, check_names=False)
+    assert got["Count"].sum() == len(base_frame)
+
+
+@pytest.mark.parametrize("q", NODE_QUANTILES)
+def test_national_matches_quantile(base_frame, hierarchy, q):
+    expected = add_derived_metrics(base_frame)[NODE_METRICS].quantile(q)
+    pd.testing.assert_series_equal(hierarchy.national(q=q), expected, check_names=False)
+
+
+def test_non_metro_nodes_are_per_state(hierarchy):
+    names = set(hierarchy.level("Metro").names)
+    assert "Non-metropolitan area" not in names
+    assert hierarchy.parent("Metro", "Non-metropolitan area (CA)") == "CA"
+
+
+def test_every_zip_reaches_a_state(hierarchy):
+    node = np.arange(len(hierarchy.level("ZIP")))
+    for level in HIERARCHY_LEVELS[:-1]:
+        node = hierarchy.level(level).parent[node]
+        assert (node >= 0).all()
+
+
+def test_children_partition_parent_nodes(hierarchy):
+    for level in HIERARCHY_LEVELS[1:]:
+        child_level = HIERARCHY_LEVELS[HIERARCHY_LEVELS.index(level) - 1]
+        seen = []
+        for name in hierarchy.level(level).names:
+            children = hierarchy.children(level, name)
+            assert all(hierarchy.parent(child_level, child) == name for child in children.index)
+            seen.extend(children.index)
+        assert sorted(seen) == sorted(hierarchy.level(child_level).names)
@@ -0,0 +1,53 @@
+# tests/test_manifest.py
+import os
+
+from utils.manifest import (
+    content_hash,
+    data_version,
+    file_record,
+    load_manifest,
+    record_artifact,
+    save_manifest,
+    stage_is_fresh,
+)
+
+
+def write_with_manifest(folder, text):
+    csv_path = folder / "affordability_zip.csv"
+    csv_path.write_text(text)
+    manifest = load_manifest(folder / "manifest.json")
+    record_artifact(manifest, "affordability_zip", csv_path, inputs={"src": "abc"})
+    save_manifest(manifest, folder / "manifest.json")
+    return csv_path
+
+
+def test_data_version_uses_manifest_hash(tmp_path):
+    csv_path = write_with_manifest(tmp_path, "ZIP,ZHVI\n00001,1\n")
+    assert data_version(csv_path) == content_hash(csv_path)[:16]
+
+
+def test_same_size_rewrite_changes_version(tmp_path):
+    csv_path = write_with_manifest(tmp_path, "ZIP,ZHVI\n00001,1\n")
+    before = data_version(csv_path)
+    stat = csv_path.stat()
+    csv_path.write_text("ZIP,ZHVI\n00001,2\n")  # même taille, contenu différent
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert data_version(csv_path) != before
+    assert data_version(csv_path) == content_hash(csv_path)[:16]
+
+
+def test_file_record_counts_csv_rows(tmp_path):
+    csv_path = tmp_path / "a.csv"
+    csv_path.write_text("a,b\n1,2\n3,4\n")
+    record = file_record(csv_path)
+    assert record["columns"] == ["a", "b"] and record["rows"] == 2
+    assert file_record(csv_path, previous=record) == {key: record[key] for key in record}
+
+
+def test_stage_is_fresh(tmp_path):
+    csv_path = write_with_manifest(tmp_path, "ZIP\n00001\n")
+    manifest = load_manifest(tmp_path / "manifest.json")
+    assert stage_is_fresh(manifest, "affordability_zip", {"src": "abc"}, output_path=csv_path)
+    assert not stage_is_fresh(manifest, "affordability_zip", {"src": "other"}, output_path=csv_path)
+    csv_path.write_text("ZIP\n00002\n00003\n")
+    assert not stage_is_fresh(manifest, "affordability_zip", {"src": "abc"}, output_path=csv_path)
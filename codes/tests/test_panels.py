@@ -0,0 +1,26 @@
+# tests/test_panels.py
+import streamlit as st
+
+from utils import panels
+from utils.panels import MAX_PANEL_OUTPUTS, clear_panel_outputs, panel_output
+
+
+def test_panel_outputs_are_a_bounded_lru(monkeypatch):
+    monkeypatch.setattr(panels, "get_base_version", lambda: "v1")
+    clear_panel_outputs()
+    builds = []
+
+    def render(salary):
+        st.session_state["user_salary"] = salary
+        return panel_output("personal.ranking", lambda: builds.append(salary) or salary)
+
+    assert render(50_000) == 50_000 and render(50_000) == 50_000
+    assert render(60_000) == 60_000 and render(50_000) == 50_000  # scénario récent : réutilisé
+    assert builds == [50_000, 60_000]
+
+    for salary in range(MAX_PANEL_OUTPUTS + 5):
+        render(salary)
+    assert len(st.session_state["_panel_outputs"]) == MAX_PANEL_OUTPUTS
+    render(60_000)  # évincé : reconstruit
+    assert builds[-1] == 60_000
+    clear_panel_outputs()
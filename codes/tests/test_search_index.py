@@ -0,0 +1,16 @@
+# tests/test_search_index.py
+import numpy as np
+import pytest
+
+from utils.search_index import build_search_index, scan_matches
+
+
+@pytest.mark.parametrize("query", ["ca", "Metro", "ny-nj", "b, t", "non-metro", "001", "0059", "5", "zz", "  TX "])
+def test_scan_matches_index_search(base_frame, query):
+    frame = base_frame.astype({"Metro": "category", "StateName": "category"})
+    index = build_search_index(frame)
+    np.testing.assert_array_equal(np.flatnonzero(scan_matches(frame, query)), index.search(query))
+
+
+def test_scan_matches_empty_query_keeps_everything(base_frame):
+    assert scan_matches(base_frame, " ").all()
@@ -0,0 +1,23 @@
+# tests/test_warmup.py
+from utils import warmup
+from utils.warmup import Warmup
+
+
+def test_failed_warmup_is_retried(monkeypatch):
+    calls = []
+
+    def warm():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise OSError("données pas encore joignables")
+
+    monkeypatch.setattr(warmup, "_warm_caches", warm)
+    process = Warmup()
+    process.start().join()
+    assert isinstance(process.error, OSError)
+
+    process.start().join()  # rendu suivant de l'accueil : relancé
+    assert process.error is None and len(calls) == 2
+    process.start().join()  # réussi : pas relancé
+    assert len(calls) == 2
+
@@ -0,0 +1,29 @@
+# utils/aggregates.py
+"""
+Quantiles nationaux et par état / metro d'un tableau. Jeu complet : lus dans
+la hiérarchie (utils.hierarchy, précalculée une fois par version). Tout autre
+tableau (résultat de recherche…) est agrégé directement, sur les mêmes nœuds.
+"""
+import pandas as pd
+
+from utils.data_loader import is_full_dataset
+from utils.hierarchy import NODE_QUANTILES, add_derived_metrics, get_hierarchy, node_labels
+from utils.tracing import traced
+
+LEVELS = ["StateName", "Metro"]
+
+
+@traced()
+def summarize(df, metrics, q=0.5) -> pd.Series:
+    """Quantile q de chaque métrique sur df (métriques dérivées comprises)."""
+    if q in NODE_QUANTILES and is_full_dataset(df):
+        return get_hierarchy().national(metrics, q)
+    return add_derived_metrics(df)[metrics].quantile(q)
+
+
+@traced()
+def group_summary(df, level, metrics, q=0.5) -> pd.DataFrame:
+    """Quantile q de chaque métrique par état / metro sur df (ZIP hors metro regroupés par état)."""
+    if q in NODE_QUANTILES and is_full_dataset(df):
+        return get_hierarchy().table(level, metrics, q).drop(columns="Count")
+    return add_derived_metrics(df).groupby(node_labels(df, level))[metrics].quantile(q)
@@ -0,0 +1,293 @@
+# utils/batch_scoring.py
+"""
+Classement hors interface d'un fichier de profils utilisateurs : top K des
+ZIP de chaque profil, avec les calculs de prediction_engine.
+
+Les profils sont regroupés par scénario hors salaire (objectif, horizon,
+inflation, apport, taux) : dans un groupe, le revenu requis et le prix de
+chaque ZIP ne dépendent pas du salaire, et le score est proportionnel au
+salaire. Le classement d'un profil est donc le top K (par score / salaire)
+des ZIP dont le revenu requis est <= salaire, c'est-à-dire d'un préfixe des
+ZIP triés par revenu requis. Seuls les ZIP qui peuvent entrer dans le top K
+d'un préfixe (K couches de maxima préfixes) sont candidats ; les profils du
+groupe sont ensuite classés ensemble sur cette petite matrice, par blocs.
+Les résultats sont écrits au fil de l'eau (CSV ou Parquet) : la mémoire reste
+bornée quel que soit le nombre de profils.
+
+Colonnes des profils (CSV ou Parquet ; seule 'salary' est obligatoire) :
+    profile_id, salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate
+    (alias acceptés : inflation, down_payment, rate)
+
+Comme dans l'application, chaque profil est ramené au pas des sliders avant
+le calcul (salaire au dollar, taux à 0,1 %, apport et inflation à 0,5 %) :
+les résultats sont ceux que l'application afficherait. Le scénario
+effectivement classé est écrit dans les colonnes de sortie (salary, goal,
+horizon, inflation_rate, down_payment_pct, mortgage_rate ; apport et taux
+vides en location).
+
+Usage (depuis codes/) :
+    python -m utils.batch_scoring profiles.csv -o results.parquet [--top-k 10] [--forecast trend]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.data_source import DataSourceError
+from utils.forecasting import FORECAST_MODELS, forecast_growth
+from utils.prediction_engine import compute_scenario_columns, get_base_version, load_base_frame
+from utils.scenario_cache import normalize_scenario_key
+from utils.tracing import traced
+
+PROFILE_DEFAULTS = {
+    "goal": "Buy",
+    "horizon": 5,
+    "inflation_rate": 0.04,
+    "down_payment_pct": 0.20,
+    "mortgage_rate": 0.07,
+}
+PROFILE_ALIASES = {"inflation": "inflation_rate", "down_payment": "down_payment_pct", "rate": "mortgage_rate"}
+SCENARIO_COLUMNS = ["goal", "horizon", "inflation_rate", "down_payment_pct", "mortgage_rate"]
+OUTPUT_BASE_COLUMNS = ["ZIP", "Location", "StateName"]
+OUTPUT_SCENARIO_COLUMNS = ["salary"] + SCENARIO_COLUMNS  # scénario classé (ramené au pas des sliders)
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+TIE_TOLERANCE = 1e-9
+
+
+def read_profiles(path) -> pd.DataFrame:
+    """Profils normalisés : colonnes complétées par défaut, objectif Buy / Rent, sans salaire manquant."""
+    path = Path(path)
+    profiles = pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_csv(path)
+    return normalize_profiles(profiles)
+
+
+def normalize_profiles(profiles) -> pd.DataFrame:
+    profiles = profiles.rename(columns=PROFILE_ALIASES)
+    if "salary" not in profiles.columns:
+        raise ValueError("colonne 'salary' manquante dans le fichier de profils")
+    if "profile_id" not in profiles.columns:
+        profiles = profiles.assign(profile_id=np.arange(len(profiles)))
+    for column, default in PROFILE_DEFAULTS.items():
+        if column not in profiles.columns:
+            profiles[column] = default
+        profiles[column] = profiles[column].fillna(default)
+
+    profiles = profiles[["profile_id", "salary"] + SCENARIO_COLUMNS].dropna(subset=["salary"])
+    profiles = profiles.reset_index(drop=True)
+    # Mêmes valeurs que l'application : salaire arrondi au dollar, paramètres
+    # ramenés au pas des sliders par normalize_scenario_key
+    profiles["salary"] = np.round(profiles["salary"].astype(np.float64))
+    profiles["goal"] = np.where(profiles["goal"].astype(str).str.strip() == "Buy", "Buy", "Rent")
+    profiles["horizon"] = profiles["horizon"].astype(np.int64)
+    for column in ("inflation_rate", "down_payment_pct", "mortgage_rate"):
+        profiles[column] = profiles[column].astype(np.float64)
+
+    groups = profiles.groupby(SCENARIO_COLUMNS, sort=False).ngroup().to_numpy()
+    scenarios = profiles[SCENARIO_COLUMNS].drop_duplicates()  # même ordre que ngroup
+    snapped = []
+    for goal, horizon, inflation_rate, down_payment_pct, mortgage_rate in scenarios.itertuples(index=False):
+        _, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate = normalize_scenario_key(
+            0, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate
+        )
+        # En location, l'apport et le taux n'ont pas d'effet : un seul groupe
+        if goal == "Rent":
+            down_payment_pct = PROFILE_DEFAULTS["down_payment_pct"]
+            mortgage_rate = PROFILE_DEFAULTS["mortgage_rate"]
+        snapped.append((goal, horizon, inflation_rate, down_payment_pct, mortgage_rate))
+    snapped = pd.DataFrame(snapped, columns=SCENARIO_COLUMNS)
+    for column in SCENARIO_COLUMNS:
+        profiles[column] = snapped[column].to_numpy()[groups]
+    return profiles
+
+
+def prefix_candidates(weight, k) -> np.ndarray:
+    """
+    Positions (croissantes) des éléments pouvant figurer dans le top k d'un
+    préfixe de weight : réunion des k premières couches de maxima préfixes,
+    ex aequo compris (un élément précédé de moins de k éléments strictement
+    plus grands est dans l'une d'elles, quel que soit le départage des ex aequo).
+    Les quasi ex aequo (écart relatif < TIE_TOLERANCE) sont gardés aussi : le
+    score recalculé avec le salaire peut les départager autrement à l'arrondi près.
+    """
+    remaining = np.where(np.isnan(weight), -np.inf, weight)
+    layers = []
+    for _ in range(k):
+        running = np.maximum.accumulate(remaining)
+        previous = np.concatenate([[-np.inf], running[:-1]])
+        records = np.flatnonzero((remaining >= previous * (1 - TIE_TOLERANCE)) & (remaining > -np.inf))
+        if len(records) == 0:
+            break
+        layers.append(records)
+        remaining[records] = -np.inf
+    if not layers:
+        return np.empty(0, dtype=np.int64)
+    return np.sort(np.concatenate(layers))
+
+
+def rank_group(salaries, income, asset, top_k, max_chunk_bytes=MAX_CHUNK_BYTES):
+    """
+    Top K de chaque salaire d'un même scénario (revenu requis / prix par ZIP
+    fixés). Produit des blocs (début, indices de lignes (profils × K, -1 si
+    moins de K ZIP éligibles), scores, nombre de ZIP éligibles).
+    """
+    valid = np.flatnonzero(~np.isnan(income))
+    order = valid[np.argsort(income[valid], kind="stable")]
+    sorted_income = income[order]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight = 100 * (1_000_000 / asset[order]) / sorted_income  # score / salaire
+
+    positions = prefix_candidates(weight, top_k)
+    by_row = np.argsort(order[positions], kind="stable")  # candidats dans l'ordre de la table
+    positions = positions[by_row]
+    rows = order[positions]
+    cand_income, cand_asset = income[rows], asset[rows]
+    top_k = min(top_k, len(positions))
+
+    chunk = max(1, int(max_chunk_bytes // (3 * 8 * max(len(positions), 1))))
+    for start in range(0, len(salaries), chunk):
+        salary = salaries[start:start + chunk]
+        n_eligible = np.searchsorted(sorted_income, salary, side="right")
+        best = np.full((len(salary), top_k), -1, dtype=np.int64)
+        best_score = np.full((len(salary), top_k), np.nan)
+        if top_k:
+            # même formule que compute_scenario_columns (mêmes valeurs, même ordre)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                score = (salary[:, None] / cand_income) * 100 * (1_000_000 / cand_asset)
+            score = np.where(positions[None, :] < n_eligible[:, None], score, -np.inf)
+            # tri stable sur les candidats (peu nombreux) rangés par ligne : à score
+            # égal, ordre de la table, comme select_top_eligible
+            ranked = np.argsort(-score, axis=1, kind="stable")[:, :top_k]
+            best = rows[ranked]
+            best_score = np.take_along_axis(score, ranked, axis=1)
+            best[best_score == -np.inf] = -1
+        yield start, best, best_score, n_eligible
+
+
+class ResultWriter:
+    """Écriture en continu des résultats, en CSV (ajouts) ou Parquet (un row group par bloc)."""
+
+    def __init__(self, path, fmt=None):
+        self.path = Path(path)
+        self.fmt = fmt or ("parquet" if self.path.suffix == ".parquet" else "csv")
+        self._writer = None
+        self.rows = 0
+
+    def write(self, frame):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(str(self.path), table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            frame.to_csv(self.path, mode="w" if self._writer is None else "a",
+                         header=self._writer is None, index=False)
+            self._writer = True
+        self.rows += len(frame)
+
+    def close(self):
+        if self.fmt == "parquet" and self._writer is not None:
+            self._writer.close()
+        if self._writer is None:  # aucun résultat : fichier vide avec en-tête
+            self.write(pd.DataFrame(columns=["profile_id", "rank"] + OUTPUT_SCENARIO_COLUMNS + OUTPUT_BASE_COLUMNS))
+            self.close()
+
+
+@traced()
+def score_profiles(profiles, output, top_k=10, forecast="flat", fmt=None,
+                   max_chunk_bytes=MAX_CHUNK_BYTES) -> dict:
+    """
+    Classe chaque profil (DataFrame ou chemin de fichier) sur tous les ZIP et
+    écrit ses top_k résultats dans output : une ligne par (profil, rang), avec
+    le nombre de ZIP éligibles du profil. Retourne un résumé du traitement.
+    """
+    if not isinstance(profiles, pd.DataFrame):
+        profiles = read_profiles(profiles)
+    else:
+        profiles = normalize_profiles(profiles)
+    base = load_base_frame(get_base_version())
+    base_columns = {name: base[name].to_numpy() for name in OUTPUT_BASE_COLUMNS}
+    writer = ResultWriter(output, fmt)
+    n_groups = 0
+    try:
+        for scenario, group in profiles.groupby(SCENARIO_COLUMNS, sort=False):
+            goal, horizon, inflation_rate, down_payment_pct, mortgage_rate = scenario
+            n_groups += 1
+            growth = forecast_growth(base['ZIP'].to_numpy(), forecast, horizon, inflation_rate)
+            cols = compute_scenario_columns(
+                base, 1.0, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate,
+                growth=growth
+            )
+            income, asset = cols["Income_Needed_Future"], cols["Asset_Price_Future"]
+            if goal != "Buy":  # sans effet en location : laissés vides dans les résultats
+                down_payment_pct, mortgage_rate = np.nan, np.nan
+            salaries = group["salary"].to_numpy()
+            profile_ids = group["profile_id"].to_numpy()
+
+            for start, best, best_score, n_eligible in rank_group(
+                salaries, income, asset, top_k, max_chunk_bytes
+            ):
+                found = best >= 0
+                profile_pos, rank = np.nonzero(found)
+                rows = best[found]
+                salary = salaries[start:start + len(best)][profile_pos]
+                result = pd.DataFrame({
+                    "profile_id": profile_ids[start:start + len(best)][profile_pos],
+                    "rank": rank + 1,
+                    "salary": salary,
+                    "goal": goal,
+                    "horizon": horizon,
+                    "inflation_rate": inflation_rate,
+                    "down_payment_pct": down_payment_pct,
+                    "mortgage_rate": mortgage_rate,
+                    **{name: values[rows] for name, values in base_columns.items()},
+                    "Score": best_score[found],
+                    "Affordability_%": salary / income[rows] * 100,
+                    "Income_Needed_Future": income[rows],
+                    "Asset_Price_Future": asset[rows],
+                    "Eligible_Count": n_eligible[profile_pos],
+                })
+                if len(result):
+                    writer.write(result)
+    finally:
+        writer.close()
+    return {"profiles": len(profiles), "scenarios": n_groups, "rows": writer.rows, "output": str(output)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Classe les ZIP pour chaque profil d'un fichier (CSV / Parquet).",
+        epilog="Les paramètres sont ramenés au pas des sliders de l'application (salaire au dollar, "
+               "taux à 0,1 %, apport et inflation à 0,5 %) ; le scénario classé est écrit dans "
+               "les colonnes salary, goal, horizon, inflation_rate, down_payment_pct et mortgage_rate.",
+    )
+    parser.add_argument("profiles", help="fichier de profils (.csv ou .parquet)")
+    parser.add_argument("-o", "--output", required=True, help="fichier de résultats (.csv ou .parquet)")
+    parser.add_argument("--top-k", type=int, default=10, help="emplacements retenus par profil")
+    parser.add_argument("--forecast", choices=list(FORECAST_MODELS), default="flat", help="modèle de projection")
+    parser.add_argument("--format", choices=["csv", "parquet"], default=None, help="format (défaut : extension)")
+    args = parser.parse_args(argv)
+
+    # Sans serveur Streamlit : pas d'avertissements du mode « bare »
+    from streamlit import config as st_config
+    from streamlit.logger import set_log_level
+
+    st_config.get_option("logger.level")
+    set_log_level("error")
+
+    started = time.perf_counter()
+    try:
+        summary = score_profiles(args.profiles, args.output, args.top_k, args.forecast, args.format)
+    except DataSourceError as exc:
+        sys.exit(str(exc))
+    print(f"{summary['profiles']:,} profils ({summary['scenarios']:,} scénarios) → "
+          f"{summary['rows']:,} lignes en {time.perf_counter() - started:.1f} s → {summary['output']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
 # utils/charts.py
+import hashlib
+
+import numpy as np
 import streamlit as st
 import plotly.express as px
 import pandas as pd
 
+from utils.aggregates import group_summary, summarize
+from utils.data_loader import get_data_version, is_full_dataset
+from utils.tracing import cache_miss, traced
+
+SCATTER_POINT_LIMIT = 5_000  # au-delà : nuage agrégé en cellules 2D (taille du JSON bornée)
+SCATTER_BINS = 60            # cellules par axe, à pas logarithmique
+
 state_codes = {
     'California': 'CA', 'New York': 'NY', 'Texas': 'TX', 'Florida': 'FL',
     'Illinois': 'IL', 'Pennsylvania': 'PA', 'Ohio': 'OH', 'Georgia': 'GA',
@@ -14,23 +24,26 @@ state_codes = {
     'Connecticut': 'CT', 'Utah': 'UT', 'Iowa': 'IA', 'Nevada': 'NV'
 }
 
+@traced()
 def kpi_row(df):
+    value = summarize(df, ['ZHVI', 'ZORI', 'Avg_AGI', 'Rent_Ratio'])
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Median Home Price", f"${df['ZHVI'].median():,.0f}", help="Zillow ZHVI")
+        st.metric("Median Home Price", f"${value['ZHVI']:,.0f}", help="Zillow ZHVI")
     with col2:
-        st.metric("Median Rent", f"${df['ZORI'].median():,.0f}", help="Zillow ZORI")
+        st.metric("Median Rent", f"${value['ZORI']:,.0f}", help="Zillow ZORI")
     with col3:
-        st.metric("Median Income", f"${df['Avg_AGI'].median():,.0f}", help="IRS tax data")
+        st.metric("Median Income", f"${value['Avg_AGI']:,.0f}", help="IRS tax data")
     with col4:
-        ratio = (df['Income_Needed_Rent'] / df['Avg_AGI']).median()
+        ratio = value['Rent_Ratio']
         st.metric("Rent Affordability Ratio", f"{ratio:.2f}x",
                   delta="Good" if ratio < 0.33 else "High" if ratio < 0.5 else "Critical",
                   help="Required income ÷ Actual income. Ideal < 0.30")
 
+@traced()
 def map_us_states(df):
     st.subheader("Median Rent by State")
-    state_df = df.groupby('StateName')['ZORI'].median().reset_index()
+    state_df = group_summary(df, 'StateName', ['ZORI']).reset_index()
     state_df['code'] = state_df['StateName'].map(state_codes)
     
     fig = px.choropleth(state_df, locations='code', locationmode='USA-states',
@@ -39,6 +52,7 @@ def map_us_states(df):
     fig.update_layout(height=500)
     st.plotly_chart(fig, use_container_width=True)
 
+@traced()
 def top_expensive_areas(df):
     st.subheader("Top 15 Most Expensive Areas (Rent)")
     top = df.nlargest(15, 'ZORI')[['Metro', 'ZIP', 'ZORI', 'StateName']]
@@ -48,19 +62,113 @@ def top_expensive_areas(df):
     fig.update_traces(texttemplate='$%{text:,.0f}')
     st.plotly_chart(fig, use_container_width=True)
 
+# --- nuages de points : points individuels ou cellules agrégées ---
+def bin_points(x, y, z, bins=SCATTER_BINS) -> pd.DataFrame:
+    """
+    Agrège les points (x, y) > 0 en bins 2D à pas logarithmique : nombre de
+    points et médiane de z par cellule non vide (une ligne par cellule,
+    centre géométrique de la cellule en x / y).
+    """
+    x, y, z = (np.asarray(v, dtype=np.float64) for v in (x, y, z))
+    keep = (x > 0) & (y > 0) & np.isfinite(x) & np.isfinite(y)
+    x, y, z = x[keep], y[keep], z[keep]
+    if len(x) == 0:
+        return pd.DataFrame(columns=["x", "y", "count", "median_z"])
+
+    edges = []
+    for values in (x, y):
+        lo, hi = values.min(), values.max()
+        edges.append(np.geomspace(lo, max(hi, lo * 1.001), bins + 1))
+    counts, _, _ = np.histogram2d(x, y, bins=edges)
+
+    # cellule de chaque point (même convention que histogram2d : dernier bin fermé)
+    ix = np.clip(np.searchsorted(edges[0], x, side="right") - 1, 0, bins - 1)
+    iy = np.clip(np.searchsorted(edges[1], y, side="right") - 1, 0, bins - 1)
+    cell = ix * bins + iy
+
+    # médiane de z par cellule : tri (cellule, z) puis élément(s) du milieu de chaque segment
+    median = np.full(bins * bins, np.nan)
+    valid = np.isfinite(z)
+    order = np.lexsort((z[valid], cell[valid]))
+    sorted_cell, sorted_z = cell[valid][order], z[valid][order]
+    cells, start, n = np.unique(sorted_cell, return_index=True, return_counts=True)
+    median[cells] = (sorted_z[start + (n - 1) // 2] + sorted_z[start + n // 2]) / 2
+
+    occupied = np.flatnonzero(counts.ravel())
+    centers = [np.sqrt(e[:-1] * e[1:]) for e in edges]
+    return pd.DataFrame({
+        "x": centers[0][occupied // bins],
+        "y": centers[1][occupied % bins],
+        "count": counts.ravel()[occupied].astype(np.int64),
+        "median_z": median[occupied],
+    })
+
+
+def _frame_key(df, columns):
+    """
+    Clé de la grille de df : version des données pour le jeu complet, sinon
+    empreinte des valeurs des colonnes agrégées (l'index ne suffit pas : deux
+    tableaux de même index peuvent avoir d'autres valeurs).
+    """
+    if is_full_dataset(df):
+        return get_data_version(), "full"
+    digest = hashlib.blake2b(digest_size=16)
+    for name in columns:
+        digest.update(np.ascontiguousarray(df[name].to_numpy(dtype=np.float64)).tobytes())
+    return len(df), digest.hexdigest()
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+@cache_miss
+def _binned_grid(_df, frame_key, x, y, z, bins):
+    # _df n'est pas haché par Streamlit : la clé est frame_key
+    return bin_points(_df[x], _df[y], _df[z], bins)
+
+
+def is_binned(df):
+    return len(df) > SCATTER_POINT_LIMIT
+
+
+def affordability_figure(df, y, labels, **points_kwargs):
+    """
+    Revenu réel (Avg_AGI) vs revenu requis (y), avec la droite d'accessibilité.
+    Jusqu'à SCATTER_POINT_LIMIT lignes : un point par ZIP (points_kwargs passés
+    à px.scatter). Au-delà : une bulle par cellule (taille = nombre de ZIP,
+    couleur = ZHVI médian), grille mise en cache par filtre.
+    """
+    if not is_binned(df):
+        fig = px.scatter(df, x='Avg_AGI', y=y, labels=labels, **points_kwargs)
+        max_val = max(df['Avg_AGI'].max(), df[y].max()) * 1.1
+        fig.add_scatter(x=[0, max_val], y=[0, max_val], mode='lines',
+                        line=dict(color='green', dash='dash'), name="Affordable")
+        return fig
+
+    grid = _binned_grid(df, _frame_key(df, ['Avg_AGI', y, 'ZHVI']), 'Avg_AGI', y, 'ZHVI', SCATTER_BINS)
+    fig = px.scatter(grid, x='x', y='y', size='count', color='median_z',
+                     log_x=True, log_y=True, size_max=18, color_continuous_scale="Viridis",
+                     hover_data={'count': ':,', 'median_z': ':$,.0f'},
+                     labels={'x': labels.get('Avg_AGI', 'Avg_AGI'), 'y': labels.get(y, y),
+                             'count': 'ZIP codes', 'median_z': 'Median Home Price'})
+    lo = min(grid['x'].min(), grid['y'].min()) / 1.1
+    hi = max(grid['x'].max(), grid['y'].max()) * 1.1
+    fig.add_scatter(x=[lo, hi], y=[lo, hi], mode='lines',
+                    line=dict(color='green', dash='dash'), name="Affordable", showlegend=False)
+    return fig
+
+
+@traced()
 def affordability_scatter(df):
     st.subheader("Affordability: Required vs Actual Income")
-    fig = px.scatter(df, x='Avg_AGI', y='Income_Needed_Rent',
-                     size='ZHVI', color='StateName', hover_name='Metro',
-                     hover_data=['ZIP'], labels={
-                         'Avg_AGI': 'Actual Income (IRS)',
-                         'Income_Needed_Rent': 'Income Needed to Rent'
-                     })
-    max_val = max(df['Avg_AGI'].max(), df['Income_Needed_Rent'].max()) * 1.1
-    fig.add_scatter(x=[0, max_val], y=[0, max_val], mode='lines',
-                    line=dict(color='green', dash='dash'), name="Affordable")
+    fig = affordability_figure(
+        df, 'Income_Needed_Rent',
+        labels={'Avg_AGI': 'Actual Income (IRS)', 'Income_Needed_Rent': 'Income Needed to Rent'},
+        size='ZHVI', color='StateName', hover_name='Metro', hover_data=['ZIP']
+    )
+    if is_binned(df):
+        st.caption(f"{len(df):,} ZIP codes grouped into income cells • bubble size = ZIP codes, color = median home price")
     st.plotly_chart(fig, use_container_width=True)
 
+@traced()
 def data_table(df):
     st.subheader("Detailed Data")
     cols = ['ZIP', 'Metro', 'StateName', 'ZHVI', 'ZORI', 'Avg_AGI', 'Income_Needed_Rent']
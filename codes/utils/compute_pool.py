@@ -0,0 +1,193 @@
+# utils/compute_pool.py
+"""
+Backend de calcul optionnel : pool de processus locaux pour les classements
+de scénarios, hors du thread du script Streamlit
+(et donc hors du GIL partagé par les sessions).
+
+Activé par DASHBOARD_COMPUTE_WORKERS=N (N processus, "auto" = nombre de
+cœurs) ; absent ou 0 : tout est calculé dans le processus, comme avant.
+
+Les colonnes utiles de chaque version des données sont publiées une fois
+dans un segment de mémoire partagée (multiprocessing.shared_memory) ; les
+workers s'y attachent sans copie et gardent leurs structures dérivées
+tant que la version est publiée. Une requête n'envoie que ses
+paramètres et reçoit un résultat compact (indices de lignes + colonnes
+numériques) : les pages reconstruisent les lignes depuis leur propre table.
+"""
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import get_data_version, get_timeseries_version, load_affordability_data
+from utils.tracing import traced
+
+SHARED_FLOAT_COLUMNS = ["ZHVI", "ZORI", "Avg_AGI", "Income_Needed_Rent", "Income_Needed_Buy"]
+KEEP_DATASETS = 2  # version courante + précédente (requêtes encore en cours)
+_ALIGN = 64
+
+
+class DatasetSpec(NamedTuple):
+    """Description picklable d'un segment publié : nom, position de chaque tableau, catégories."""
+    key: tuple
+    segment: str
+    layout: dict       # nom → (offset, dtype, shape)
+    categories: dict   # colonne catégorielle → liste des catégories
+
+
+class SharedDataset:
+    """Tableaux d'un segment de mémoire partagée (lecture seule) + cache des structures dérivées."""
+
+    def __init__(self, spec, buffer):
+        self.spec = spec
+        self.columns = {}
+        for name, (offset, dtype, shape) in spec.layout.items():
+            values = np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+            values.flags.writeable = False
+            self.columns[name] = values
+        self._memo = {}
+
+    def frame(self, names=None) -> pd.DataFrame:
+        """DataFrame sans copie des colonnes numériques ; catégories reconstruites depuis les codes."""
+        data = {}
+        for name in names or self.columns:
+            values = self.columns[name]
+            if name in self.spec.categories:
+                values = pd.Categorical.from_codes(values, categories=self.spec.categories[name])
+            data[name] = values
+        return pd.DataFrame(data, copy=False)
+
+    def memo(self, name, build):
+        """Structure dérivée construite une fois par worker et par version."""
+        if name not in self._memo:
+            self._memo[name] = build()
+        return self._memo[name]
+
+
+def publish(key, arrays, categories=None):
+    """Copie les tableaux dans un nouveau segment. Retourne (SharedMemory, DatasetSpec)."""
+    layout, offset = {}, 0
+    arrays = {name: np.ascontiguousarray(values) for name, values in arrays.items()}
+    for name, values in arrays.items():
+        offset = -(-offset // _ALIGN) * _ALIGN
+        layout[name] = (offset, values.dtype.str, values.shape)
+        offset += values.nbytes
+
+    segment = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for name, values in arrays.items():
+        start, dtype, shape = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=segment.buf, offset=start)[...] = values
+    return segment, DatasetSpec(key, segment.name, layout, dict(categories or {}))
+
+
+# --- côté worker ---
+_attached = OrderedDict()  # clé → (SharedMemory, SharedDataset)
+
+
+def _attach(spec) -> SharedDataset:
+    entry = _attached.get(spec.key)
+    if entry is None:
+        segment = shared_memory.SharedMemory(name=spec.segment)
+        entry = _attached[spec.key] = (segment, SharedDataset(spec, segment.buf))
+        while len(_attached) > KEEP_DATASETS:
+            _, (old_segment, old_dataset) = _attached.popitem(last=False)
+            old_dataset.columns.clear()
+            old_dataset._memo.clear()
+            try:
+                old_segment.close()
+            except BufferError:
+                pass  # vues encore référencées : libéré à la fin du processus
+    _attached.move_to_end(spec.key)
+    return entry[1]
+
+
+def _run_task(spec, func, args):
+    return func(_attach(spec), *args)
+
+
+# --- côté application ---
+class ComputePool:
+    """Pool de processus + segments publiés (un par version des données)."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        # "spawn" : pas de fork d'un serveur multi-thread
+        self.executor = ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+        self._datasets = OrderedDict()  # clé → (SharedMemory, DatasetSpec)
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def dataset(self, key, build) -> DatasetSpec:
+        """Segment de la version key, publié au premier appel (build() → (tableaux, catégories))."""
+        with self._lock:
+            entry = self._datasets.get(key)
+            if entry is None:
+                entry = self._datasets[key] = publish(key, *build())
+                while len(self._datasets) > KEEP_DATASETS:
+                    _, (segment, _) = self._datasets.popitem(last=False)
+                    segment.close()
+                    segment.unlink()  # les workers encore attachés gardent leur mapping
+            self._datasets.move_to_end(key)
+            return entry[1]
+
+    @traced("compute_pool.run")
+    def run(self, func, *args):
+        """func(dataset, *args) dans un worker, sur la version courante des données."""
+        spec = self.dataset(dataset_key(), build_shared_columns)
+        return self.executor.submit(_run_task, spec, func, args).result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            while self._datasets:
+                _, (segment, _) = self._datasets.popitem()
+                segment.close()
+                segment.unlink()
+
+
+def dataset_key():
+    """Version publiée : données d'accessibilité + historiques (pentes de tendance)."""
+    return get_data_version(), get_timeseries_version("zhvi"), get_timeseries_version("zori")
+
+
+def build_shared_columns():
+    """
+    Colonnes publiées, dans l'ordre des lignes du jeu complet (donc aussi de
+    la table de base) : valeurs numériques, pentes de tendance par ZIP
+    (NaN sans historique).
+    """
+    from utils.forecasting import trend_slopes  # forecasting → data_loader uniquement
+
+    df = load_affordability_data()
+    arrays = {name: df[name].to_numpy() for name in SHARED_FLOAT_COLUMNS}
+    for column, slope in trend_slopes(df['ZIP'].to_numpy()).items():
+        arrays[f"slope_{column}"] = slope
+    return arrays, {}
+
+
+def configured_workers():
+    """Nombre de workers demandé par DASHBOARD_COMPUTE_WORKERS (0 = désactivé)."""
+    value = os.environ.get("DASHBOARD_COMPUTE_WORKERS", "").strip().lower()
+    if value in ("", "0", "off", "false", "no"):
+        return 0
+    if value == "auto":
+        return os.cpu_count() or 1
+    return max(0, int(value))
+
+
+@st.cache_resource(show_spinner=False)
+def _start_pool(workers):
+    return ComputePool(workers)
+
+
+def get_compute_pool():
+    """Pool partagé par le processus, ou None si le backend n'est pas activé."""
+    workers = configured_workers()
+    return _start_pool(workers) if workers else None
@@ -1,10 +1,18 @@
 # utils/data_loader.py
 
+import json
+import os
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import streamlit as st
 from pathlib import Path
-import gdown
-import zipfile
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils.data_source import DataSourceError, UrlSource, load_config, make_source
+from utils.manifest import MANIFEST_NAME, data_version
+from utils.timeseries_store import open_store
+from utils.tracing import cache_miss, traced
 
 # --- CONFIG Google Drive ---
 FILE_ID = "1DK5GpCeIlecHwYljoCpzGfCkUojCPKZL"
@@ -12,33 +20,269 @@ ZIP_URL = f"https://drive.google.com/uc?id={FILE_ID}"
 
 # --- chemins locaux ---
 ZIP_PATH = Path("data.zip")
-EXTRACT_DIR = Path("data_extracted")
-CSV_RELATIVE_PATH = Path("data/data_cleaned/affordability_zip.csv")  # chemin dans le ZIP
+EXTRACT_DIR = Path("data_extracted")  # versions lues depuis l'archive + snapshot
+CSV_RELATIVE_PATH = Path("data/data_cleaned/affordability_zip.csv")  # chemin dans le ZIP / la racine des données
+SNAPSHOT_PATH = EXTRACT_DIR / "affordability_zip.arrow"  # snapshot colonnaire (Arrow IPC)
+TIMESERIES_RELATIVE_DIR = Path("data/data_cleaned/timeseries")  # historique ZIP × mois (optionnel)
 
+# --- schéma typé du snapshot ---
+SNAPSHOT_VERSION = 2  # à incrémenter si le schéma ci-dessous change
+CATEGORY_COLUMNS = ["Date", "Metro", "StateName"]
+FLOAT_COLUMNS = ["ZHVI", "ZORI", "Avg_AGI", "Income_Needed_Rent", "Income_Needed_Buy"]
+_SNAPSHOT_META_KEY = b"affordability_source"
 
-@st.cache_data(ttl=3600, show_spinner="Chargement des données...")
-def load_affordability_data():
+
+def _source_fingerprint(csv_path):
+    """Empreinte du CSV source : sert à vérifier que le snapshot est à jour."""
+    stat = Path(csv_path).stat()
+    return {
+        "snapshot_version": SNAPSHOT_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def read_affordability_csv(csv_path):
     """
-    Télécharge le ZIP depuis Google Drive si nécessaire,
-    l'extrait, puis charge le CSV 'affordability_zip.csv'.
+    Parse le CSV avec les types fixés dès la lecture :
+    ZIP en texte sur 5 caractères, Metro/StateName catégoriels, valeurs en float32.
     """
+    dtypes = {"ZIP": str}
+    dtypes.update({col: "category" for col in CATEGORY_COLUMNS})
+    dtypes.update({col: "float32" for col in FLOAT_COLUMNS})
 
-    # 1) Télécharger si le ZIP n'existe pas
-    if not ZIP_PATH.exists():
-        gdown.download(ZIP_URL, str(ZIP_PATH), quiet=False)
+    df = pd.read_csv(csv_path, dtype=dtypes)
+    df['ZIP'] = df['ZIP'].str.zfill(5)
+    return df
 
-    # 2) Dézipper si non extrait
-    target_csv_path = EXTRACT_DIR / CSV_RELATIVE_PATH
 
-    if not target_csv_path.exists():
-        with zipfile.ZipFile(ZIP_PATH, "r") as zip_ref:
-            zip_ref.extractall(EXTRACT_DIR)
+def write_snapshot(df, snapshot_path, fingerprint):
+    """
+    Écrit le snapshot Arrow IPC de façon atomique (fichier temporaire + rename).
+    Flottants écrits avec leurs NaN (pas de masque de nulls) : relus sans copie.
+    """
+    snapshot_path = Path(snapshot_path)
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for name in FLOAT_COLUMNS:
+        if name in df.columns:
+            values = pa.array(df[name].to_numpy(), from_pandas=False)
+            table = table.set_column(table.schema.get_field_index(name), name, values)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_SNAPSHOT_META_KEY] = json.dumps(fingerprint).encode()
+    table = table.replace_schema_metadata(metadata)
 
-    # 3) Charger le CSV
-    if not target_csv_path.exists():
-        st.error(f"Fichier introuvable après extraction : {target_csv_path}")
-        st.stop()
+    tmp_path = snapshot_path.with_suffix(snapshot_path.suffix + ".tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, snapshot_path)
+
+
+def read_snapshot(snapshot_path, fingerprint=None):
+    """
+    Lit le snapshot en mémoire mappée. Les colonnes numériques sans nulls
+    restent des vues en lecture seule sur le fichier mappé (aucune copie) ;
+    catégories et textes sont convertis. Retourne None s'il est absent,
+    illisible ou construit à partir d'une autre version du CSV.
+    """
+    snapshot_path = Path(snapshot_path)
+    if not snapshot_path.exists():
+        return None
+    try:
+        with pa.memory_map(str(snapshot_path), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    if fingerprint is not None:
+        stored = (table.schema.metadata or {}).get(_SNAPSHOT_META_KEY)
+        if stored is None or json.loads(stored) != fingerprint:
+            return None
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def load_affordability_frame(csv_path, snapshot_path):
+    """
+    Charge le tableau depuis le snapshot s'il correspond au CSV source,
+    sinon parse le CSV une fois et (re)construit le snapshot.
+    """
+    fingerprint = _source_fingerprint(csv_path)
+    df = read_snapshot(snapshot_path, fingerprint)
+    if df is not None:
+        return df
 
-    df = pd.read_csv(target_csv_path)
-    df['ZIP'] = df['ZIP'].astype(str).str.zfill(5)
+    df = read_affordability_csv(csv_path)
+    try:
+        write_snapshot(df, snapshot_path, fingerprint)
+    except OSError:
+        pass  # disque en lecture seule : on garde simplement le CSV parsé
     return df
+
+
+def freeze_frame(df):
+    """
+    Version partageable de df : un bloc par colonne, tableaux NumPy en lecture
+    seule (sans copie des données). Avec le copy-on-write de pandas, une
+    écriture par un appelant copie la colonne concernée au lieu de modifier
+    l'original partagé.
+    """
+    columns = {}
+    for name in df.columns:
+        column = df[name]
+        if isinstance(column.dtype, np.dtype):
+            values = column.to_numpy()
+            values.flags.writeable = False
+            columns[name] = values
+        else:
+            columns[name] = column.array  # catégories / texte : tableaux immuables
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def shared_view(df):
+    """Vue sans copie d'un tableau partagé : colonnes ajoutées / supprimées propres à l'appelant."""
+    return df.copy(deep=False)
+
+
+# --- jeu complet : reconnu à ses tableaux (vues sans copie du cache) ---
+def _fingerprint(df):
+    """Nombre de lignes + adresses des tableaux numériques / codes catégoriels de df."""
+    arrays = []
+    for name in df.columns:
+        column = df[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            arrays.append((name, column.array.codes.ctypes.data))
+        elif isinstance(column.dtype, np.dtype) and column.dtype.kind in "fiub":
+            arrays.append((name, column.to_numpy().ctypes.data))
+    return (len(df),) + tuple(arrays) if arrays else None
+
+
+def is_full_dataset(df):
+    """
+    Vrai si df est le jeu complet de la version courante : mêmes tableaux que
+    le cache (load_affordability_data, vue sans copie). Un tableau filtré,
+    trié ou dont une colonne est réécrite a d'autres tableaux.
+    """
+    fingerprint = _fingerprint(df)
+    return fingerprint is not None and fingerprint == _fingerprint(_load_affordability_version(get_data_version()))
+
+
+def get_data_source():
+    """Source configurée (DASHBOARD_DATA_SOURCE / data_source.json), sinon l'archive Google Drive."""
+    config = load_config()
+    if "source" not in config:
+        return UrlSource(ZIP_URL, config.get("sha256"), ZIP_PATH, EXTRACT_DIR)
+    return make_source(config["source"], config.get("sha256"), ZIP_PATH, EXTRACT_DIR)
+
+
+def data_unavailable(message):
+    """
+    Données indisponibles : message et arrêt du script dans une page Streamlit,
+    DataSourceError ailleurs (thread de préchargement, outils en ligne de commande).
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        raise DataSourceError(message)
+    st.error(message)
+    st.stop()
+
+
+_ROOTS = {}  # état de la source (source.state()) → racine préparée
+
+
+@traced()
+def data_root() -> Path:
+    """
+    Racine des données de la version courante (contient CSV_RELATIVE_PATH) :
+    téléchargement / lecture de l'archive si nécessaire, avec vérification.
+    Préparée une fois par source et par version de l'archive ; les appels
+    suivants ne font que relire l'état de la source.
+    """
+    try:
+        source = get_data_source()
+        key = source.state()
+        root = _ROOTS.get(key)
+        if root is None or not root.is_dir():
+            root = source.prepare()
+            if key is not None:
+                _ROOTS[key] = root
+        return root
+    except (DataSourceError, OSError) as exc:
+        data_unavailable(f"Données indisponibles : {exc}")
+
+
+@traced()
+def ensure_source_csv():
+    """Chemin de 'affordability_zip.csv' pour la source de données configurée."""
+    target_csv_path = data_root() / CSV_RELATIVE_PATH
+    if not target_csv_path.exists():
+        data_unavailable(f"Fichier introuvable : {target_csv_path}")
+    return target_csv_path
+
+
+@traced()
+def get_data_version():
+    """
+    Identifiant de la version des données : hash du CSV enregistré dans
+    data_cleaned/manifest.json (produit par utils.etl), sinon hash du contenu.
+    Sert de clé à tous les caches : ils sont invalidés quand les données
+    changent, et seulement dans ce cas.
+    """
+    return data_version(ensure_source_csv())
+
+
+@traced(cached=True)
+def load_affordability_data():
+    """
+    'affordability_zip.csv' (via son snapshot Arrow) pour la version courante.
+    Vue sans copie du tableau partagé par toutes les sessions du processus.
+    """
+    ensure_source_csv()
+    return shared_view(_load_affordability_version(get_data_version()))
+
+
+@st.cache_resource(max_entries=2, show_spinner="Chargement des données...")
+@cache_miss
+def _load_affordability_version(data_version):
+    # Snapshot colonnaire : parse du CSV uniquement s'il a changé.
+    # Chargé une fois par processus (pas de copie par appel comme avec cache_data)
+    return freeze_frame(load_affordability_frame(ensure_source_csv(), SNAPSHOT_PATH))
+
+
+def get_timeseries_version(kind):
+    """Version du store d'historique 'zhvi' / 'zori' (None s'il n'est pas fourni)."""
+    root = data_root()
+    values_path = root / TIMESERIES_RELATIVE_DIR / kind / "values.npy"
+    if not values_path.exists():
+        return None
+    manifest_path = root / CSV_RELATIVE_PATH.parent / MANIFEST_NAME
+    return data_version(values_path, manifest_path, artifact=f"timeseries/{kind}")
+
+
+@traced(cached=True)
+def load_timeseries(kind):
+    """Store ZIP × mois en mémoire mappée (partagé par processus), ou None."""
+    version = get_timeseries_version(kind)
+    if version is None:
+        return None
+    return _load_timeseries_version(kind, version)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+@cache_miss
+def _load_timeseries_version(kind, version):
+    return open_store(data_root() / TIMESERIES_RELATIVE_DIR / kind)
+
+
+@traced(cached=True)
+def load_trend_metrics(kind, years=5):
+    """CAGR glissant / YoY / volatilité de tous les ZIP (index ZIP), ou None."""
+    version = get_timeseries_version(kind)
+    if version is None:
+        return None
+    return _trend_metrics_version(kind, version, years)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+@cache_miss
+def _trend_metrics_version(kind, version, years):
+    return _load_timeseries_version(kind, version).trend_metrics(years)
@@ -0,0 +1,259 @@
+# utils/data_source.py
+"""
+Source des données de l'application : dossier local, archive ZIP locale ou URL.
+
+Configuration (la variable d'environnement l'emporte sur le fichier) :
+    DASHBOARD_DATA_SOURCE   chemin d'un dossier, d'une archive .zip, ou URL http(s)
+    DASHBOARD_DATA_SHA256   sha256 attendu de l'archive (optionnel)
+    DASHBOARD_DATA_CONFIG   fichier JSON {"source": ..., "sha256": ...}
+                            (défaut : data_source.json dans le dossier courant)
+Sans configuration : archive Google Drive du projet (comportement historique).
+
+Chaque source fournit une racine de données au format de l'archive
+(data/data_cleaned/affordability_zip.csv, manifest.json, timeseries/…).
+Pour une archive, seuls ces membres sont lus, en flux, dans un dossier
+versionné par le hash de l'archive (data_extracted/v-<hash>), rempli sous un
+nom temporaire puis renommé une fois complet. Un lecteur voit donc soit
+l'ancienne version complète, soit la nouvelle, jamais un mélange.
+Les téléchargements passent par un fichier temporaire vérifié (ZIP lisible,
+sha256) avant d'être renommés : un téléchargement interrompu est ignoré.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import urllib.request
+import uuid
+import zipfile
+from pathlib import Path
+
+from utils.manifest import MANIFEST_NAME, content_hash
+
+DATA_RELATIVE_DIR = Path("data/data_cleaned")  # dans l'archive / la racine des données
+KEEP_VERSIONS = 2  # version courante + précédente (lecteurs encore ouverts)
+_COPY_BLOCK = 1024 * 1024
+# Préparation (téléchargement, extraction) sérialisée dans le processus :
+# sessions Streamlit et thread de préchargement partagent le même pid.
+_PREPARE_LOCK = threading.RLock()
+
+
+class DataSourceError(RuntimeError):
+    """Source mal configurée, introuvable ou corrompue."""
+
+
+def needed_member(name):
+    """
+    Membres de l'archive utilisés par l'application (le reste n'est jamais lu).
+    Noms absolus ou contenant « .. » refusés (écriture hors du dossier d'extraction).
+    """
+    path = Path(name)
+    if path.is_absolute() or ".." in path.parts or "\\" in name:
+        return False
+    if name.endswith("/") or path.parent.parts[:2] != DATA_RELATIVE_DIR.parts:
+        return False
+    relative = path.relative_to(DATA_RELATIVE_DIR)
+    return (relative.name in ("affordability_zip.csv", MANIFEST_NAME) and len(relative.parts) == 1) \
+        or relative.parts[0] == "timeseries"
+
+
+def _temp_path(path, suffix):
+    """Nom temporaire propre à un appel (voisin de path) : aucun autre thread ni processus ne l'utilise."""
+    return path.with_name(f".{path.name}.{os.getpid()}-{uuid.uuid4().hex[:12]}.{suffix}")
+
+
+def _atomic_stream(source, target):
+    """Copie un flux dans target via un fichier temporaire ; retourne le sha256."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = _temp_path(target, "tmp")
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, "wb") as out:
+            for block in iter(lambda: source.read(_COPY_BLOCK), b""):
+                digest.update(block)
+                out.write(block)
+        os.replace(tmp_path, target)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return digest.hexdigest()
+
+
+class DirectorySource:
+    """Données déjà présentes sur disque (déploiement hors ligne, sortie de utils.etl)."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def state(self):
+        """Clé de la racine préparée : elle reste valable tant que la clé ne change pas."""
+        return ("dir", os.path.abspath(self.root))
+
+    def prepare(self) -> Path:
+        if not (self.root / DATA_RELATIVE_DIR).is_dir():
+            raise DataSourceError(f"{self.root} ne contient pas {DATA_RELATIVE_DIR}/")
+        return self.root
+
+
+class ArchiveSource:
+    """Archive ZIP locale : membres utiles lus en flux dans un dossier versionné."""
+
+    def __init__(self, archive_path, sha256=None, extract_dir=Path("data_extracted")):
+        self.archive_path = Path(archive_path)
+        self.sha256 = sha256.lower() if sha256 else None
+        self.extract_dir = Path(extract_dir)
+
+    def state(self):
+        """Clé de la racine préparée (archive identifiée par taille / mtime), None si absente."""
+        try:
+            stat = self.archive_path.stat()
+        except OSError:
+            return None
+        return ("zip", os.path.abspath(self.archive_path), os.path.abspath(self.extract_dir),
+                self.sha256, stat.st_size, stat.st_mtime_ns)
+
+    def verify(self):
+        """Hash de l'archive (mémorisé par taille / mtime), comparé au hash attendu."""
+        if not self.archive_path.exists():
+            raise DataSourceError(f"archive introuvable : {self.archive_path}")
+        digest = content_hash(self.archive_path)
+        if self.sha256 and digest != self.sha256:
+            raise DataSourceError(
+                f"sha256 de {self.archive_path} inattendu : {digest[:16]}… au lieu de {self.sha256[:16]}…"
+            )
+        return digest
+
+    def prepare(self) -> Path:
+        with _PREPARE_LOCK:
+            digest = self.verify()
+            version_dir = self.extract_dir / f"v-{digest[:16]}"
+            if not (version_dir / ".complete").exists():
+                self._extract(version_dir)
+                self._prune(version_dir)
+            return version_dir
+
+    def _extract(self, version_dir):
+        """Lit les membres utiles (CRC vérifié par zipfile), dans un dossier temporaire renommé à la fin."""
+        tmp_dir = _temp_path(version_dir, "tmp")
+        root = tmp_dir.resolve()
+        try:
+            with zipfile.ZipFile(self.archive_path) as archive:
+                members = [info for info in archive.infolist() if needed_member(info.filename)]
+                if not any(Path(info.filename).name == "affordability_zip.csv" for info in members):
+                    raise DataSourceError(f"{self.archive_path} ne contient pas {DATA_RELATIVE_DIR}/affordability_zip.csv")
+                for info in members:
+                    target = tmp_dir / info.filename
+                    if not target.resolve().is_relative_to(root):
+                        raise DataSourceError(f"membre hors du dossier d'extraction : {info.filename}")
+                    with archive.open(info) as member:
+                        _atomic_stream(member, target)
+        except zipfile.BadZipFile as exc:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise DataSourceError(f"archive illisible : {self.archive_path} ({exc})") from exc
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        (tmp_dir / ".complete").touch()
+        try:
+            os.replace(tmp_dir, version_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # extraite entre-temps par un autre processus
+            if not (version_dir / ".complete").exists():
+                raise
+
+    def _prune(self, version_dir):
+        """Supprime les versions plus anciennes que la précédente."""
+        versions = sorted(self.extract_dir.glob("v-*"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for old in [p for p in versions if p != version_dir][KEEP_VERSIONS - 1:]:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+class UrlSource(ArchiveSource):
+    """Archive distante : téléchargée une fois (fichier temporaire vérifié), puis comme ArchiveSource."""
+
+    def __init__(self, url, sha256=None, archive_path=Path("data.zip"), extract_dir=Path("data_extracted")):
+        super().__init__(archive_path, sha256, extract_dir)
+        self.url = url
+
+    def state(self):
+        archive = super().state()
+        return None if archive is None else ("url", self.url) + archive[1:]
+
+    def prepare(self) -> Path:
+        with _PREPARE_LOCK:
+            if not self.archive_path.exists() or not self._matches():
+                self.download()
+            return super().prepare()
+
+    def _matches(self):
+        try:
+            self.verify()
+            return True
+        except DataSourceError:
+            return False
+
+    def download(self):
+        with _PREPARE_LOCK:
+            self._download()
+
+    def _download(self):
+        self.archive_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = _temp_path(self.archive_path, "part")
+        try:
+            if "drive.google.com" in self.url:
+                import gdown  # uniquement pour l'archive Google Drive
+
+                if gdown.download(self.url, str(tmp_path), quiet=False) is None:
+                    raise DataSourceError(f"téléchargement impossible : {self.url}")
+            else:
+                with urllib.request.urlopen(self.url, timeout=60) as response:
+                    _atomic_stream(response, tmp_path)
+            if not zipfile.is_zipfile(tmp_path):
+                raise DataSourceError(f"téléchargement incomplet ou invalide : {self.url}")
+            if self.sha256 and content_hash(tmp_path) != self.sha256:
+                raise DataSourceError(f"sha256 du téléchargement inattendu : {self.url}")
+            os.replace(tmp_path, self.archive_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+
+
+_CONFIG_FILES = {}  # chemin → ((taille, mtime), contenu) : fichier relu seulement s'il change
+
+
+def _read_config_file(config_path):
+    try:
+        stat = config_path.stat()
+    except OSError:
+        return {}
+    entry = _CONFIG_FILES.get(config_path)
+    if entry is None or entry[0] != (stat.st_size, stat.st_mtime_ns):
+        with open(config_path) as f:
+            config = {key: value for key, value in json.load(f).items() if key in ("source", "sha256")}
+        entry = _CONFIG_FILES[config_path] = ((stat.st_size, stat.st_mtime_ns), config)
+    return entry[1]
+
+
+def load_config(config_path=None) -> dict:
+    """{'source': ..., 'sha256': ...} depuis le fichier JSON puis l'environnement."""
+    config_path = Path(config_path or os.environ.get("DASHBOARD_DATA_CONFIG", "data_source.json")).resolve()
+    config = dict(_read_config_file(config_path))
+    if os.environ.get("DASHBOARD_DATA_SOURCE"):
+        config["source"] = os.environ["DASHBOARD_DATA_SOURCE"]
+    if os.environ.get("DASHBOARD_DATA_SHA256"):
+        config["sha256"] = os.environ["DASHBOARD_DATA_SHA256"]
+    return config
+
+
+def make_source(source, sha256=None, archive_path=Path("data.zip"), extract_dir=Path("data_extracted")):
+    """Source correspondant à la valeur configurée (URL, archive .zip ou dossier)."""
+    source = str(source)
+    if source.startswith(("http://", "https://")):
+        return UrlSource(source, sha256, archive_path, extract_dir)
+    path = Path(source).expanduser()
+    if path.is_dir():
+        return DirectorySource(path)
+    if path.suffix == ".zip" or path.is_file():
+        return ArchiveSource(path, sha256, extract_dir)
+    raise DataSourceError(f"source de données introuvable : {source}")
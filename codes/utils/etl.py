@@ -0,0 +1,271 @@
+# utils/etl.py
+"""
+Pipeline de construction de 'affordability_zip.csv' (remplace la cellule du notebook).
+
+Lecture limitée aux colonnes utiles (identifiants + dernier mois des fichiers Zillow,
+zipcode/A00100 pour l'IRS), agrégation IRS par blocs, sources Zillow traitées en
+parallèle dans des processus, écriture atomique des fichiers produits.
+
+Reconstruction incrémentale : data_cleaned/manifest.json garde le hash, la taille,
+le nombre de lignes et le schéma de chaque source et de chaque fichier produit ;
+seules les étapes dont une entrée a changé sont recalculées.
+
+Usage (depuis codes/) :
+    python -m utils.etl [--data-dir ../data] [--workers 4] [--force]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from utils.manifest import (
+    MANIFEST_NAME, file_record, load_manifest, record_artifact, save_manifest, stage_is_fresh
+)
+from utils.timeseries_store import STORE_KINDS, build_store
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+
+ZILLOW_FILES = {
+    'metro_days': 'Zillow_datasets/Metro_days_on_market_mean_doz_pending_uc_sfrcondo_sm_month.csv',
+    'metro_for_sale': 'Zillow_datasets/Metro_for_sale_listings_invt_fs_uc_sfrcondo_sm_month.csv',
+    'metro_heat': 'Zillow_datasets/Metro_market_heat_index_uc_sfrcondo_month.csv',
+    'metro_income_buy': 'Zillow_datasets/Metro_new_homeowner_income_needed_downpayment_0.20_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv',
+    'metro_income_rent': 'Zillow_datasets/Metro_new_renter_income_needed_uc_sfrcondomfr_sm_sa_month.csv',
+    'metro_sales': 'Zillow_datasets/Metro_sales_count_now_uc_sfrcondo_month.csv',
+    'zip_forecast': 'Zillow_datasets/Zip_home_values_forecasts_zhvf_growth_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv',
+    'zip_zhvi': 'Zillow_datasets/Zip_home_values_zhvi_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv',
+    'zip_zori': 'Zillow_datasets/Zip_rentals_zori_uc_sfrcondomfr_sm_month.csv',
+}
+IRS_FILE = 'IRS/22zpallagi.csv'
+BLS_FILE = 'BLS/all_data_M_2024.xlsx'  # optionnel
+
+ID_COLUMNS = ["RegionName", "Metro", "StateName"]
+AFFORDABILITY_COLUMNS = [
+    'ZIP', 'Date', 'ZHVI', 'ZORI', 'Metro', 'StateName',
+    'Avg_AGI', 'Income_Needed_Rent', 'Income_Needed_Buy'
+]
+IRS_CHUNKSIZE = 250_000
+
+
+# --- écriture ---
+def write_csv_atomic(df, path):
+    """Écrit le CSV dans un fichier temporaire du même dossier puis le renomme."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return path
+
+
+# --- Zillow ---
+def date_columns(path):
+    """Colonnes mensuelles d'un fichier Zillow (format large), lues depuis l'en-tête seul."""
+    header = pd.read_csv(path, nrows=0).columns
+    return [col for col in header if col.startswith(('19', '20'))]
+
+
+def extract_latest(key, path, date=None):
+    """
+    Lit uniquement les identifiants et le mois demandé (par défaut le dernier)
+    d'un fichier Zillow. Retourne (clé, DataFrame[id..., Date, Value]).
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    if date is None:
+        date = date_columns(path)[-1]
+    ids = [col for col in ID_COLUMNS if col in header]
+    df = pd.read_csv(path, usecols=ids + [date], dtype={"RegionName": str})
+    df = df.rename(columns={date: "Value"})
+    if key.startswith("zip_"):
+        df["RegionName"] = df["RegionName"].str.zfill(5)
+    df.insert(len(ids), "Date", date)
+    return key, df
+
+
+# --- IRS ---
+def aggregate_irs(path, chunksize=IRS_CHUNKSIZE):
+    """
+    Moyenne de A00100 par ZIP (zipcode 0 exclu), calculée par blocs :
+    seules deux colonnes sont lues et seuls sommes / effectifs sont gardés.
+    """
+    sums, counts = [], []
+    reader = pd.read_csv(path, usecols=['zipcode', 'A00100'], chunksize=chunksize)
+    for chunk in reader:
+        chunk = chunk[chunk['zipcode'] != 0]
+        grouped = chunk.groupby('zipcode')['A00100']
+        sums.append(grouped.sum())
+        counts.append(grouped.count())
+
+    total = pd.concat(sums).groupby(level=0).sum()
+    n = pd.concat(counts).groupby(level=0).sum()
+    irs_agg = (total / n.where(n > 0)).rename('Avg_AGI').reset_index()
+    irs_agg['ZIP'] = irs_agg['zipcode'].astype(str).str.zfill(5)
+    return irs_agg[['ZIP', 'Avg_AGI']]
+
+
+# --- BLS ---
+def aggregate_bls(path):
+    """Salaire médian « All Occupations » par zone BLS (comme dans le notebook)."""
+    bls_df = pd.read_excel(path, usecols=['AREA_TITLE', 'OCC_TITLE', 'A_MEDIAN'])
+    bls_df = bls_df[bls_df['OCC_TITLE'] == 'All Occupations']
+    bls_df['A_MEDIAN'] = pd.to_numeric(bls_df['A_MEDIAN'], errors='coerce')
+    bls_metro_agg = bls_df.groupby('AREA_TITLE')['A_MEDIAN'].median().reset_index()
+    return bls_metro_agg.rename(columns={'AREA_TITLE': 'Metro', 'A_MEDIAN': 'Median_Wage_Metro'})
+
+
+# --- affordability ---
+def build_affordability(zori_latest, zhvi_latest, irs_agg):
+    """Même calcul que la cellule finale du notebook, sur les extraits du dernier mois."""
+    zori = zori_latest.rename(columns={'RegionName': 'ZIP', 'Value': 'ZORI'})
+    zori = zori[['ZIP', 'ZORI', 'Metro', 'StateName', 'Date']]
+    zhvi = zhvi_latest.rename(columns={'RegionName': 'ZIP', 'Value': 'ZHVI'})[['ZIP', 'ZHVI']]
+
+    df = zori.merge(zhvi, on='ZIP', how='inner')
+    df = df.merge(irs_agg, on='ZIP', how='left')
+
+    df['Income_Needed_Rent'] = (df['ZORI'] * 12) / 0.3
+    df['Income_Needed_Buy'] = (df['ZHVI'] * 0.8 * 0.07) / 0.3
+    return df[AFFORDABILITY_COLUMNS]
+
+
+def _read_latest(path):
+    return pd.read_csv(path, dtype={"RegionName": str})
+
+
+def run_pipeline(data_dir=DATA_DIR, output_dir=None, workers=None, force=False):
+    """
+    Exécute les étapes dont les entrées ont changé (toutes si force=True) et
+    retourne {artefact: "rebuilt" | "up-to-date"}. Artefacts dans data_cleaned/ :
+    'latest/<source>.csv' par source Zillow, 'timeseries/<zhvi|zori>/' (historique
+    complet mappable), 'irs_clean.csv', 'bls_metro_agg.csv' (si la source BLS est
+    présente) et 'affordability_zip.csv'.
+    """
+    data_dir = Path(data_dir)
+    output_dir = Path(output_dir) if output_dir else data_dir / "data_cleaned"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+    started = time.perf_counter()
+
+    # --- 1) sources : hash / lignes / schéma (repris du manifeste si inchangées) ---
+    source_paths = {key: data_dir / rel for key, rel in ZILLOW_FILES.items()}
+    source_paths['irs'] = data_dir / IRS_FILE
+    missing = [str(p) for p in source_paths.values() if not p.exists()]
+    if missing:
+        raise FileNotFoundError("Sources manquantes :\n" + "\n".join(missing))
+    if (data_dir / BLS_FILE).exists():
+        source_paths['bls'] = data_dir / BLS_FILE
+
+    sources = {
+        name: file_record(path, manifest["sources"].get(name))
+        for name, path in source_paths.items()
+    }
+    manifest["sources"] = sources
+
+    # Même mois pour ZHVI et ZORI (dernier mois de ZORI, comme dans le notebook)
+    dates = {key: None for key in ZILLOW_FILES}
+    dates['zip_zori'] = date_columns(source_paths['zip_zori'])[-1]
+    if dates['zip_zori'] in date_columns(source_paths['zip_zhvi']):
+        dates['zip_zhvi'] = dates['zip_zori']
+
+    # --- 2) étapes indépendantes : extraits Zillow, IRS, BLS ---
+    stages = {}
+    for key in ZILLOW_FILES:
+        stages[f"latest/{key}"] = dict(
+            output=output_dir / "latest" / f"{key}.csv",
+            inputs={key: sources[key]["sha256"]},
+            params={"date": dates[key]},
+            job=(extract_latest, key, source_paths[key], dates[key]),
+        )
+    for kind, key in STORE_KINDS.items():
+        store_dir = output_dir / "timeseries" / kind
+        stages[f"timeseries/{kind}"] = dict(
+            output=store_dir / "values.npy",
+            inputs={key: sources[key]["sha256"]},
+            params={},
+            job=(build_store, source_paths[key], store_dir),
+            writes_output=True,  # le job écrit lui-même son dossier
+        )
+    stages["irs_clean"] = dict(
+        output=output_dir / "irs_clean.csv",
+        inputs={"irs": sources["irs"]["sha256"]},
+        params={},
+        job=(aggregate_irs, source_paths['irs']),
+    )
+    if 'bls' in sources:
+        stages["bls_metro_agg"] = dict(
+            output=output_dir / "bls_metro_agg.csv",
+            inputs={"bls": sources["bls"]["sha256"]},
+            params={},
+            job=(aggregate_bls, source_paths['bls']),
+        )
+
+    status = {}
+    stale = {
+        name: stage for name, stage in stages.items()
+        if force or not stage_is_fresh(manifest, name, stage["inputs"], stage["params"], stage["output"])
+    }
+    results = {}
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(*stage["job"]) for name, stage in stale.items()}
+            for name, future in futures.items():
+                result = future.result()
+                results[name] = result[1] if isinstance(result, tuple) else result
+    for name, stage in stages.items():
+        if name in results:
+            if not stage.get("writes_output"):
+                write_csv_atomic(results[name], stage["output"])
+            record_artifact(manifest, name, stage["output"], stage["inputs"], stage["params"])
+            status[name] = "rebuilt"
+            n_rows = results[name] if stage.get("writes_output") else len(results[name])
+            print(f"{name}: {n_rows:,} lignes (reconstruit)")
+        else:
+            status[name] = "up-to-date"
+
+    # --- 3) affordability_zip : dépend des extraits ZORI / ZHVI et de l'IRS ---
+    deps = ["latest/zip_zori", "latest/zip_zhvi", "irs_clean"]
+    inputs = {name: manifest["artifacts"][name]["sha256"] for name in deps}
+    output = output_dir / "affordability_zip.csv"
+    if force or not stage_is_fresh(manifest, "affordability_zip", inputs, output_path=output):
+        zori = results.get("latest/zip_zori")
+        zhvi = results.get("latest/zip_zhvi")
+        irs_agg = results.get("irs_clean")
+        final = build_affordability(
+            zori if zori is not None else _read_latest(stages["latest/zip_zori"]["output"]),
+            zhvi if zhvi is not None else _read_latest(stages["latest/zip_zhvi"]["output"]),
+            irs_agg if irs_agg is not None else pd.read_csv(stages["irs_clean"]["output"], dtype={"ZIP": str}),
+        )
+        write_csv_atomic(final, output)
+        record_artifact(manifest, "affordability_zip", output, inputs)
+        status["affordability_zip"] = "rebuilt"
+        print(f"affordability_zip: {len(final):,} lignes (reconstruit)")
+    else:
+        status["affordability_zip"] = "up-to-date"
+
+    save_manifest(manifest, manifest_path)
+    rebuilt = sum(1 for value in status.values() if value == "rebuilt")
+    print(f"{rebuilt}/{len(status)} étapes reconstruites en "
+          f"{time.perf_counter() - started:.1f} s → {output_dir}")
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construit affordability_zip.csv à partir des sources Zillow / IRS.")
+    parser.add_argument("--data-dir", default=str(DATA_DIR), help="dossier des sources (défaut : data/ à la racine)")
+    parser.add_argument("--output-dir", default=None, help="dossier de sortie (défaut : <data-dir>/data_cleaned)")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de processus (défaut : nb de cœurs)")
+    parser.add_argument("--force", action="store_true", help="tout reconstruire, même les étapes à jour")
+    args = parser.parse_args(argv)
+    run_pipeline(args.data_dir, args.output_dir, args.workers, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
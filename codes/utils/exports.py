@@ -0,0 +1,90 @@
+# utils/exports.py
+"""
+Exports des classements (CSV, Parquet, Arrow IPC), construits à la demande :
+les octets ne sont produits qu'au clic sur le bouton de téléchargement
+(données différées de st.download_button, Streamlit >= 1.52), sérialisés
+par blocs de lignes, puis gardés dans le cache de scénarios sous la clé du scénario et du format.
+Un second téléchargement du même fichier ne coûte rien.
+"""
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.forecasting import forecast_version
+from utils.prediction_engine import get_base_version, rank_locations
+from utils.scenario_cache import get_scenario_cache, normalize_scenario_key
+from utils.tracing import traced
+
+EXPORT_FORMATS = {
+    "csv": ("CSV", "text/csv", "csv"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet", "parquet"),
+    "arrow": ("Arrow IPC", "application/vnd.apache.arrow.file", "arrow"),
+}
+CHUNK_ROWS = 50_000
+
+
+def serialize_frame(df, fmt, chunk_rows=CHUNK_ROWS) -> bytes:
+    """
+    Sérialise df au format fmt, CHUNK_ROWS lignes à la fois : seule la
+    conversion d'un bloc est en mémoire en plus du fichier produit.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format d'export inconnu : {fmt}")
+    chunks = [df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows)] or [df]
+
+    if fmt == "csv":
+        out = io.BytesIO()
+        for i, chunk in enumerate(chunks):
+            out.write(chunk.to_csv(index=False, header=i == 0).encode())
+        return out.getvalue()
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+    with writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    return sink.getvalue().to_pybytes()
+
+
+@traced()
+def export_ranking(
+    salary,
+    goal,
+    horizon,
+    inflation_rate,
+    down_payment_pct,
+    mortgage_rate,
+    fmt="csv",
+    limit=None,
+    forecast="flat"
+) -> bytes:
+    """
+    Fichier du classement d'un scénario : les `limit` meilleurs emplacements
+    éligibles, ou tous (limit=None). Mis en cache (LRU borné) par scénario et format.
+    """
+    scenario = normalize_scenario_key(
+        salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate
+    )
+    key = ("export", get_base_version(), scenario, forecast, forecast_version(forecast), fmt, limit)
+
+    def build():
+        ranking = rank_locations(
+            salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate,
+            top_k=limit or 0, full=limit is None, forecast=forecast
+        )
+        return serialize_frame(ranking.top, fmt)
+
+    return get_scenario_cache().get_or_compute(key, build)
+
+
+def export_file_name(stem, fmt):
+    return f"{stem}.{EXPORT_FORMATS[fmt][2]}"
+
+
+def export_mime(fmt):
+    return EXPORT_FORMATS[fmt][1]
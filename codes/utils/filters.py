@@ -1,7 +1,12 @@
 # codes/utils/filters.py
 import streamlit as st
 
-def apply_filters(df):
+from utils.data_loader import is_full_dataset
+from utils.search_index import get_search_index, scan_matches
+from utils.tracing import traced
+
+@traced()
+def apply_filters(df, index=None):
     st.sidebar.header("Smart Search")
     query = st.sidebar.text_input(
         "Search city, metro, ZIP, or state (e.g. Miami, 90210, California)",
@@ -11,18 +16,24 @@ def apply_filters(df):
     if not query:
         return df
 
-    # Recherche insensible à la casse, avec gestion des NaN
-    mask = (
-        df['Metro'].astype(str).str.contains(query, case=False, na=False) |
-        df['StateName'].astype(str).str.contains(query, case=False, na=False) |
-        df['ZIP'].astype(str).str.contains(query, na=False)
-    )
+    # Jeu complet : index prébâti (une fois par version des données), la recherche
+    # ne parcourt que les noms/ZIP correspondants. Autre tableau : simple parcours.
+    if is_full_dataset(df):
+        if index is None:
+            index = get_search_index()
+        filtered = df.iloc[index.search(query)]
+    else:
+        index = None
+        filtered = df[scan_matches(df, query)]
 
-    filtered = df[mask]
-    
     if filtered.empty:
         st.warning(f"No results for '{query}'. Showing national overview.")
         return df
     else:
         st.sidebar.success(f"{len(filtered):,} ZIP codes found")
-        return filtered
\ No newline at end of file
+        suggestions = index.suggest(query, limit=5) if index is not None else []
+        if suggestions:
+            st.sidebar.caption("Top matches: " + " • ".join(
+                f"{label} ({count:,})" for label, count in suggestions
+            ))
+        return filtered
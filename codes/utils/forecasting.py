@@ -0,0 +1,140 @@
+# utils/forecasting.py
+"""
+Projection des prix / loyers par ZIP à partir de l'historique Zillow, au lieu
+d'un taux d'inflation unique. Les tendances log-linéaires de tous les ZIP sont
+ajustées en une seule résolution des moindres carrés (forme fermée, vectorisée
+sur la matrice ZIP × mois), puis mises en cache par version des données.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import get_timeseries_version, load_timeseries
+from utils.tracing import cache_miss, traced
+
+FORECAST_MODELS = {
+    "flat": "Flat inflation rate",
+    "trend": "Per-ZIP log-linear trend",
+    "damped": "Per-ZIP damped trend",
+}
+FIT_WINDOW_MONTHS = 60      # tendance ajustée sur les 5 dernières années
+MIN_OBSERVATIONS = 24       # en dessous : pas de tendance, repli sur l'inflation
+DAMPING = 0.85              # amortissement annuel de la croissance (modèle "damped")
+ANNUAL_GROWTH_BOUNDS = (-0.15, 0.25)  # garde-fou contre les extrapolations extrêmes
+
+
+def fit_log_linear(values, window_months=FIT_WINDOW_MONTHS) -> pd.DataFrame:
+    """
+    Ajuste log(valeur) = intercept + slope × mois pour chaque ligne, sur les
+    window_months derniers mois, en ignorant les mois manquants. Moindres carrés
+    pondérés en forme fermée : un seul passage NumPy pour tous les ZIP.
+    slope = croissance logarithmique mensuelle ; intercept au dernier mois.
+    """
+    window = np.asarray(values[:, -window_months:], dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        y = np.log(window)
+    mask = np.isfinite(y)
+    y = np.where(mask, y, 0.0)
+    t = np.arange(window.shape[1], dtype=np.float64) - (window.shape[1] - 1)  # dernier mois = 0
+
+    n = mask.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_mean = (mask * t).sum(axis=1) / n
+        y_mean = y.sum(axis=1) / n
+        dt = np.where(mask, t - t_mean[:, None], 0.0)
+        slope = (dt * (y - y_mean[:, None])).sum(axis=1) / (dt ** 2).sum(axis=1)
+        intercept = y_mean - slope * t_mean
+        resid = np.where(mask, y - (intercept[:, None] + slope[:, None] * t), 0.0)
+        resid_std = np.sqrt((resid ** 2).sum(axis=1) / (n - 2))
+
+    enough = n >= MIN_OBSERVATIONS
+    return pd.DataFrame({
+        "slope": np.where(enough, slope, np.nan),
+        "intercept": np.where(enough, intercept, np.nan),
+        "resid_std": np.where(enough, resid_std, np.nan),
+        "n_obs": n,
+    })
+
+
+def growth_factor(slope, horizon, model="trend", inflation_rate=0.04, damping=DAMPING):
+    """
+    Facteur de croissance sur `horizon` années pour chaque ZIP.
+    - trend  : exp(croissance annuelle × horizon)
+    - damped : la croissance annuelle décroît de `damping` chaque année
+    ZIP sans tendance (slope NaN) → (1 + inflation_rate) ** horizon.
+    """
+    flat = (1 + inflation_rate) ** horizon
+    if model == "flat":
+        return np.full(np.shape(slope), flat)
+
+    low, high = np.log1p(ANNUAL_GROWTH_BOUNDS[0]), np.log1p(ANNUAL_GROWTH_BOUNDS[1])
+    annual = np.clip(np.asarray(slope, dtype=np.float64) * 12, low, high)
+    if model == "damped":
+        log_growth = annual * damping * (1 - damping ** horizon) / (1 - damping)
+    else:
+        log_growth = annual * horizon
+    return np.where(np.isnan(log_growth), flat, np.exp(log_growth))
+
+
+@st.cache_resource(max_entries=4, show_spinner="Fitting per-ZIP trends...")
+@cache_miss
+def _fit_version(kind, version):
+    store = load_timeseries(kind)
+    fit = fit_log_linear(store.values)
+    fit.index = pd.Index(store.zips, name="ZIP")
+    return fit[~fit.index.duplicated()]
+
+
+@traced(cached=True)
+def load_trend_fit(kind):
+    """Paramètres ajustés (index ZIP) du store 'zhvi' / 'zori', ou None sans historique."""
+    version = get_timeseries_version(kind)
+    if version is None:
+        return None
+    return _fit_version(kind, version)
+
+
+def forecast_version(model):
+    """
+    Versions des historiques dont dépend le modèle (None pour "flat") : à
+    inclure dans les clés de cache des résultats projetés.
+    """
+    if model == "flat":
+        return None
+    return get_timeseries_version("zhvi"), get_timeseries_version("zori")
+
+
+def forecast_available():
+    return get_timeseries_version("zhvi") is not None
+
+
+def trend_slopes(zips) -> dict:
+    """Pentes mensuelles {'ZHVI': ndarray, 'ZORI': ndarray} alignées sur zips (NaN sans historique)."""
+    zips = np.asarray(zips)
+    slopes = {}
+    for column, kind in (("ZHVI", "zhvi"), ("ZORI", "zori")):
+        fit = load_trend_fit(kind)
+        if fit is None:
+            slopes[column] = np.full(len(zips), np.nan)
+        else:
+            slopes[column] = fit["slope"].reindex(zips).to_numpy()
+    return slopes
+
+
+def growth_from_slopes(slopes, model, horizon, inflation_rate):
+    """Facteurs de croissance par colonne à partir des pentes (None pour le modèle "flat")."""
+    if model == "flat":
+        return None
+    return {column: growth_factor(slope, horizon, model, inflation_rate)
+            for column, slope in slopes.items()}
+
+
+@traced()
+def forecast_growth(zips, model, horizon, inflation_rate):
+    """
+    Facteurs de croissance {'ZHVI': ndarray, 'ZORI': ndarray} alignés sur zips,
+    ou None pour le modèle "flat" (taux unique appliqué par le moteur).
+    """
+    if model == "flat":
+        return None
+    return growth_from_slopes(trend_slopes(zips), model, horizon, inflation_rate)
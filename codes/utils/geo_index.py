@@ -0,0 +1,115 @@
+# utils/geo_index.py
+"""
+Index spatial des centroïdes de ZIP (BallTree, distance haversine) pour les
+recherches « abordable à moins de N miles de mon travail ».
+
+L'arbre ne contient que les ZIP présents dans la table de base et localisés
+dans uszips.csv ; chaque point renvoie à ses lignes de la table de base
+(format CSR). L'origine d'une recherche peut être n'importe quel ZIP localisé
+dans uszips.csv, même sans ligne dans la table de base. Construit une fois par version de la table de base : une
+requête ne coûte ensuite qu'une recherche dans l'arbre et le calcul du
+scénario sur les lignes trouvées.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sklearn.neighbors import BallTree
+
+from utils.prediction_engine import Ranking, get_base_version, load_base_frame, rank_rows
+from utils.tracing import cache_miss, traced
+from utils.zip_enrichment import load_zip_to_city
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+class ZipGeoIndex:
+    """BallTree des ZIP localisés + lignes de la table de base de chaque ZIP."""
+
+    def __init__(self, base, city_map):
+        coords = city_map[['ZIP', 'Lat', 'Lng']].dropna().drop_duplicates('ZIP').set_index('ZIP')
+        base_zips = base['ZIP'].to_numpy()
+        located = pd.Index(base_zips).isin(coords.index)
+
+        # points = ZIP distincts localisés, dans l'ordre de leur première ligne
+        codes, zips = pd.factorize(base_zips[located])
+        self.zips = np.asarray(zips)
+        self.lat_lng = coords.loc[self.zips, ['Lat', 'Lng']].to_numpy(dtype=np.float64)
+        self.tree = BallTree(np.radians(self.lat_lng), metric="haversine")
+
+        # lignes de la table de base par point (CSR)
+        located_rows = np.flatnonzero(located)
+        order = np.argsort(codes, kind="stable")
+        self.rows = located_rows[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(self.zips)))])
+
+        # origines possibles : tous les ZIP localisés de uszips.csv, avec ou
+        # sans ligne dans la table de base (ZIP de quartiers d'affaires…)
+        self.origins = pd.Index(coords.index, name="ZIP")
+        self.origin_lat_lng = coords[['Lat', 'Lng']].to_numpy(dtype=np.float64)
+
+    def locate(self, zip_code):
+        """(lat, lng) du ZIP d'après uszips.csv, ou None s'il n'y est pas localisé."""
+        position = self.origins.get_indexer([str(zip_code).strip().zfill(5)])[0]
+        return None if position < 0 else tuple(self.origin_lat_lng[position])
+
+    def _expand(self, points, distances):
+        """Lignes de la table de base des points, et pour chaque ligne : distance, (lat, lng)."""
+        counts = self.offsets[points + 1] - self.offsets[points]
+        first = np.repeat(self.offsets[points], counts)
+        rank_in_point = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return (self.rows[first + rank_in_point],
+                np.repeat(distances, counts),
+                np.repeat(self.lat_lng[points], counts, axis=0))
+
+    def within(self, zip_code, radius_miles):
+        """Lignes de la table de base à moins de radius_miles du ZIP (+ distances en miles, coordonnées)."""
+        origin = self.locate(zip_code)
+        if origin is None:
+            raise KeyError(zip_code)
+        points, distances = self.tree.query_radius(
+            np.radians([origin]), r=radius_miles / EARTH_RADIUS_MILES, return_distance=True
+        )
+        return self._expand(points[0], distances[0] * EARTH_RADIUS_MILES)
+
+    def nearest(self, zip_code, k):
+        """Lignes de la table de base des k ZIP les plus proches, origine comprise (comme within)."""
+        origin = self.locate(zip_code)
+        if origin is None:
+            raise KeyError(zip_code)
+        distances, points = self.tree.query(np.radians([origin]), k=min(k, len(self.zips)))
+        return self._expand(points[0], distances[0] * EARTH_RADIUS_MILES)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+@cache_miss
+def _load_geo_index(base_version):
+    return ZipGeoIndex(load_base_frame(base_version), load_zip_to_city())
+
+
+@traced(cached=True)
+def get_geo_index() -> ZipGeoIndex:
+    """Index spatial de la version courante de la table de base."""
+    return _load_geo_index(get_base_version())
+
+
+@traced()
+def locations_near(
+    zip_code,
+    radius_miles=None,
+    k_nearest=None,
+    top_k=None,
+    **scenario
+) -> Ranking:
+    """
+    Emplacements éligibles à moins de radius_miles du ZIP (ou parmi ses
+    k_nearest plus proches voisins), classés par Score décroissant, avec leur
+    distance (Distance_mi) et leurs coordonnées. scenario : paramètres de rank_locations.
+    Lève KeyError si le ZIP n'est pas localisé dans uszips.csv.
+    """
+    index = get_geo_index()
+    if k_nearest is not None:
+        rows, distances, lat_lng = index.nearest(zip_code, k_nearest)
+    else:
+        rows, distances, lat_lng = index.within(zip_code, radius_miles)
+    extra = {"Distance_mi": distances, "Lat": lat_lng[:, 0], "Lng": lat_lng[:, 1]}
+    return rank_rows(rows, top_k=top_k, extra=extra, **scenario)
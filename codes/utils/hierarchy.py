@@ -0,0 +1,208 @@
+# utils/hierarchy.py
+"""
+Hiérarchie ZIP → ville → metro → état, construite une fois par version de
+la table de base.
+
+Chaque niveau a des codes entiers (un par ligne), les noms de ses nœuds,
+le parent de chaque nœud (parent majoritaire : une ville ou un metro peut
+déborder sur plusieurs niveaux supérieurs) et ses enfants au format CSR.
+Les statistiques de chaque nœud (nombre de lignes, quantiles exacts des
+métriques) sont calculées une fois, sur les lignes du nœud lui-même : un
+metro à cheval sur deux états garde toutes ses lignes.
+Requête d'un nœud : recherche du nom puis lecture d'un tableau (temps constant) ;
+descente : enfants du nœud (CSR), sans repasser sur les lignes.
+
+Les ZIP hors metro sont rattachés à un nœud « Non-metropolitan area (XX) »
+par état, pour que chaque ZIP remonte jusqu'à son état. Les quantiles
+nationaux (toutes les lignes) sont calculés au même moment.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.prediction_engine import get_base_version, load_base_frame
+from utils.tracing import cache_miss, traced
+
+HIERARCHY_LEVELS = ["ZIP", "City", "Metro", "StateName"]  # du plus fin au plus large
+NODE_METRICS = ["ZHVI", "ZORI", "Avg_AGI", "Income_Needed_Rent", "Income_Needed_Buy", "Rent_Ratio"]
+NODE_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+NON_METRO = "Non-metropolitan area"
+
+
+def add_derived_metrics(df):
+    """Colonnes dérivées agrégées comme les autres (ratio loyer requis / revenu)."""
+    return df.assign(Rent_Ratio=df['Income_Needed_Rent'] / df['Avg_AGI'])
+
+
+def node_labels(df, level) -> pd.Series:
+    """
+    Nom du nœud de chaque ligne de df au niveau level (mêmes noms que la
+    hiérarchie) : ZIP hors metro regroupés par état, villes suffixées par l'état.
+    """
+    state = df['StateName'].astype(object)
+    if level == "StateName":
+        labels = state
+    elif level == "Metro":
+        metro = df['Metro'].astype(object).replace(NON_METRO, np.nan)
+        labels = metro.fillna(NON_METRO + " (" + state.fillna("?") + ")")
+    elif level == "City":
+        labels = df['City'].astype(object) + ", " + state.fillna("?")
+    else:
+        labels = df['ZIP'].astype(object)
+    return labels.rename(level)
+
+
+def segment_quantiles(codes, values, n_groups, quantiles=NODE_QUANTILES):
+    """
+    Quantiles (interpolation linéaire, comme pandas) de values par groupe,
+    en un tri : tableau (n_groups, len(quantiles)), NaN pour un groupe vide.
+    Les NaN de values sont ignorés. Retourne aussi le nombre de valeurs par groupe.
+    """
+    valid = ~np.isnan(values) & (codes >= 0)
+    codes, values = codes[valid], values[valid]
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    result = np.full((n_groups, len(quantiles)), np.nan)
+    present = counts > 0
+    for j, q in enumerate(quantiles):
+        h = (counts[present] - 1) * q
+        lo = np.floor(h).astype(np.int64)
+        hi = np.ceil(h).astype(np.int64)
+        v_lo = sorted_values[starts[present] + lo]
+        v_hi = sorted_values[starts[present] + hi]
+        result[present, j] = v_lo + (h - lo) * (v_hi - v_lo)
+    return result, counts
+
+
+class HierarchyLevel:
+    """Un niveau : codes des lignes, noms et statistiques des nœuds, parent et enfants."""
+
+    def __init__(self, name, labels, values):
+        codes, names = pd.factorize(labels, use_na_sentinel=True)
+        self.name = name
+        self.codes = codes.astype(np.int32)
+        self.names = pd.Index(names, name=name)
+        self.counts = np.bincount(codes[codes >= 0], minlength=len(names))
+        self.quantiles = {}  # métrique → (nœuds, quantiles)
+        for metric, metric_values in values.items():
+            self.quantiles[metric], _ = segment_quantiles(codes, metric_values, len(names))
+        self.parent = None          # code du nœud parent (niveau supérieur), -1 si aucun
+        self.child_ids = None       # enfants (niveau inférieur), CSR
+        self.child_offsets = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def node(self, name) -> int:
+        """Code du nœud name (KeyError s'il n'existe pas)."""
+        return self.names.get_loc(name)
+
+
+def majority_parent(child_codes, parent_codes, n_children):
+    """Parent le plus fréquent (en lignes) de chaque nœud enfant ; -1 sans parent connu."""
+    keep = (child_codes >= 0) & (parent_codes >= 0)
+    pairs = np.stack([child_codes[keep].astype(np.int64), parent_codes[keep].astype(np.int64)], axis=1)
+    unique, counts = np.unique(pairs, axis=0, return_counts=True)
+    # par enfant : plus grand compteur d'abord (ex aequo : plus petit code parent)
+    order = np.lexsort((unique[:, 1], -counts, unique[:, 0]))
+    unique = unique[order]
+    first = np.concatenate([[True], unique[1:, 0] != unique[:-1, 0]])
+    parent = np.full(n_children, -1, dtype=np.int64)
+    parent[unique[first, 0]] = unique[first, 1]
+    return parent
+
+
+class Hierarchy:
+    """Niveaux ZIP → City → Metro → StateName et leurs liens parent / enfants."""
+
+    def __init__(self, base):
+        derived = add_derived_metrics(base)
+        values = {metric: derived[metric].to_numpy(dtype=np.float64) for metric in NODE_METRICS}
+        self.n_rows = len(base)
+        self.levels = {
+            name: HierarchyLevel(name, node_labels(base, name).to_numpy(), values) for name in HIERARCHY_LEVELS
+        }
+        everything = np.zeros(self.n_rows, dtype=np.int64)
+        self._national = {
+            metric: segment_quantiles(everything, metric_values, 1)[0][0] for metric, metric_values in values.items()
+        }
+
+        for child_name, parent_name in zip(HIERARCHY_LEVELS[:-1], HIERARCHY_LEVELS[1:]):
+            child, parent = self.levels[child_name], self.levels[parent_name]
+            child.parent = majority_parent(child.codes, parent.codes, len(child))
+            linked = np.flatnonzero(child.parent >= 0)
+            order = linked[np.argsort(child.parent[linked], kind="stable")]
+            parent.child_ids = order
+            parent.child_offsets = np.concatenate(
+                [[0], np.cumsum(np.bincount(child.parent[linked], minlength=len(parent)))]
+            )
+
+    def level(self, name) -> HierarchyLevel:
+        return self.levels[name]
+
+    # --- requêtes ---
+    def table(self, level, metrics=None, q=0.5, names=None) -> pd.DataFrame:
+        """
+        Quantile q de chaque métrique pour les nœuds du niveau (tous, ou names
+        dans cet ordre ; les noms inconnus sont ignorés), avec le nombre de lignes.
+        """
+        node_level = self.levels[level]
+        if q not in NODE_QUANTILES:
+            raise ValueError(f"quantile précalculé disponible pour {NODE_QUANTILES}")
+        if names is None:
+            ids = np.arange(len(node_level))
+        else:
+            ids = node_level.names.get_indexer(list(names))
+            ids = ids[ids >= 0]
+        return self._rows(node_level, ids, metrics, q)
+
+    def national(self, metrics=None, q=0.5) -> pd.Series:
+        """Quantile q de chaque métrique sur toutes les lignes."""
+        if q not in NODE_QUANTILES:
+            raise ValueError(f"quantile précalculé disponible pour {NODE_QUANTILES}")
+        column = NODE_QUANTILES.index(q)
+        return pd.Series({metric: self._national[metric][column] for metric in metrics or NODE_METRICS})
+
+    def children(self, level, name, metrics=None, q=0.5) -> pd.DataFrame:
+        """Statistiques des enfants du nœud name (niveau inférieur), triés par nombre de lignes."""
+        index = HIERARCHY_LEVELS.index(level)
+        if index == 0:
+            raise ValueError("le niveau ZIP n'a pas d'enfants")
+        node_level = self.levels[level]
+        node = node_level.node(name)
+        ids = node_level.child_ids[node_level.child_offsets[node]:node_level.child_offsets[node + 1]]
+        child_level = self.levels[HIERARCHY_LEVELS[index - 1]]
+        return self._rows(child_level, ids, metrics, q).sort_values("Count", ascending=False)
+
+    def parent(self, level, name):
+        """Nom du parent (majoritaire) du nœud name, ou None."""
+        index = HIERARCHY_LEVELS.index(level)
+        if index == len(HIERARCHY_LEVELS) - 1:
+            return None
+        parent = self.levels[level].parent[self.levels[level].node(name)]
+        return None if parent < 0 else self.levels[HIERARCHY_LEVELS[index + 1]].names[parent]
+
+    def _rows(self, node_level, ids, metrics, q):
+        column = NODE_QUANTILES.index(q)
+        data = {metric: node_level.quantiles[metric][ids, column] for metric in metrics or NODE_METRICS}
+        data["Count"] = node_level.counts[ids]
+        return pd.DataFrame(data, index=pd.Index(node_level.names[ids], name=node_level.name))
+
+
+def build_hierarchy(base) -> Hierarchy:
+    return Hierarchy(base)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+@cache_miss
+def _load_hierarchy(base_version):
+    return build_hierarchy(load_base_frame(base_version))
+
+
+@traced(cached=True)
+def get_hierarchy() -> Hierarchy:
+    """Hiérarchie de la version courante de la table de base."""
+    return _load_hierarchy(get_base_version())
@@ -0,0 +1,129 @@
+# utils/manifest.py
+"""
+Manifeste des données : empreinte (sha256), taille, nombre de lignes et schéma
+de chaque source et de chaque fichier dérivé, avec les entrées qui ont servi
+à le produire. Utilisé par l'ETL (reconstructions incrémentales) et par
+l'application (clé de version des caches).
+"""
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+_HASH_BLOCK = 1024 * 1024
+
+
+@lru_cache(maxsize=256)
+def _sha256(path, size, mtime_ns):
+    """Hash du contenu, mémorisé tant que (taille, mtime) ne changent pas."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_hash(path):
+    path = Path(path)
+    stat = path.stat()
+    return _sha256(str(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _csv_shape(path):
+    """Colonnes (en-tête) et nombre de lignes de données d'un CSV, lu en flux."""
+    with open(path, "rb") as f:
+        header = f.readline().decode("utf-8", errors="replace").rstrip("\r\n")
+        rows = sum(block.count(b"\n") for block in iter(lambda: f.read(_HASH_BLOCK), b""))
+    return header.split(",") if header else [], rows
+
+
+def file_record(path, previous=None):
+    """
+    Entrée de manifeste d'un fichier. Si previous a la même taille et le même
+    mtime, le hash et le schéma sont repris tels quels (pas de relecture).
+    """
+    path = Path(path)
+    stat = path.stat()
+    if previous and previous.get("bytes") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+        return {key: previous[key] for key in ("sha256", "bytes", "mtime_ns", "rows", "columns")}
+
+    record = {
+        "sha256": content_hash(path),
+        "bytes": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "rows": None,
+        "columns": None,
+    }
+    if path.suffix == ".csv":
+        record["columns"], record["rows"] = _csv_shape(path)
+    return record
+
+
+def load_manifest(path):
+    path = Path(path)
+    if not path.exists():
+        return {"sources": {}, "artifacts": {}}
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest.setdefault("sources", {})
+    manifest.setdefault("artifacts", {})
+    return manifest
+
+
+def save_manifest(manifest, path):
+    """Écriture atomique (fichier temporaire + rename)."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def stage_is_fresh(manifest, artifact, inputs, params=None, output_path=None):
+    """
+    Vrai si l'artefact a été produit à partir exactement de ces entrées
+    ({nom: sha256}) et paramètres, et si le fichier produit n'a pas changé.
+    """
+    entry = manifest["artifacts"].get(artifact)
+    if entry is None or entry.get("inputs") != inputs or entry.get("params") != (params or {}):
+        return False
+    if output_path is not None:
+        output_path = Path(output_path)
+        if not output_path.exists() or file_record(output_path, entry)["sha256"] != entry["sha256"]:
+            return False
+    return True
+
+
+def record_artifact(manifest, artifact, output_path, inputs, params=None, stage=None):
+    entry = file_record(output_path)
+    entry.update({"inputs": inputs, "params": params or {}, "stage": stage or artifact})
+    manifest["artifacts"][artifact] = entry
+    return entry
+
+
+def data_version(path, manifest_path=None, artifact=None):
+    """
+    Version d'un fichier de données pour les caches de l'application :
+    hash enregistré dans le manifeste (par défaut celui du dossier, artefact
+    nommé d'après le fichier) s'il décrit bien ce fichier (même taille et même
+    mtime, comme file_record), sinon hash du contenu (mémorisé par taille /
+    mtime). Les deux donnent la même version pour un contenu identique.
+    """
+    path = Path(path)
+    manifest_path = Path(manifest_path) if manifest_path else path.parent / MANIFEST_NAME
+    stat = path.stat()
+    if manifest_path.exists():
+        entry = _manifest_entry(str(manifest_path), manifest_path.stat().st_mtime_ns, artifact or path.stem)
+        if entry and entry.get("bytes") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry["sha256"][:16]
+    return _sha256(str(path), stat.st_size, stat.st_mtime_ns)[:16]
+
+
+@lru_cache(maxsize=16)
+def _manifest_entry(manifest_path, mtime_ns, artifact):
+    try:
+        return load_manifest(manifest_path)["artifacts"].get(artifact)
+    except (OSError, ValueError):
+        return None
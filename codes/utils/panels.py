@@ -0,0 +1,73 @@
+# utils/panels.py
+"""
+Panneaux des pages et état dont chacun dépend.
+
+Chaque panneau est un fragment Streamlit (st.fragment) : un widget placé
+dans le panneau ne relance que ce panneau. Un widget de la barre latérale
+(profil) relance toute la page ; chaque panneau ne reconstruit alors son
+contenu (figures, tableaux) que si l'une de ses entrées a changé : version
+de la table de base (données + ZIP → ville), version des historiques pour
+les panneaux de TIMESERIES_PANELS, ou clés de session déclarées dans
+PANEL_DEPENDENCIES. Les contenus sont gardés par (panneau, entrées), au plus
+MAX_PANEL_OUTPUTS par session (LRU) : revenir à un scénario récent est
+immédiat, et la mémoire d'une session reste bornée.
+"""
+from collections import OrderedDict
+
+import streamlit as st
+
+from utils.data_loader import get_timeseries_version
+from utils.prediction_engine import get_base_version
+
+# --- clés de session écrites par les widgets ---
+PROFILE_KEYS = ("user_salary", "goal", "horizon", "down_payment_pct", "mortgage_rate")
+FORECAST_KEYS = ("forecast_inflation", "forecast_model")
+
+# panneau → clés de session lues par son calcul (les données sont toujours une entrée)
+PANEL_DEPENDENCIES = {
+    "national.rent_extremes": (),
+    "national.state_map": (),
+    "national.metro_bars": (),
+    "national.affordability": (),
+    "personal.ranking": PROFILE_KEYS,
+    "personal.break_even": PROFILE_KEYS,
+    "personal.nearby": PROFILE_KEYS + ("work_zip", "work_radius"),
+    "prediction.ranking": PROFILE_KEYS + FORECAST_KEYS,
+    "prediction.sensitivity": PROFILE_KEYS + ("forecast_inflation",),
+}
+
+# panneaux dont le calcul lit l'historique ZIP × mois (modèles de projection)
+TIMESERIES_PANELS = {"prediction.ranking"}
+
+_OUTPUTS_KEY = "_panel_outputs"
+MAX_PANEL_OUTPUTS = 16  # contenus gardés par session, tous panneaux confondus
+
+
+def clear_panel_outputs():
+    """Oublie le contenu construit des panneaux de la session (tout sera reconstruit)."""
+    st.session_state.pop(_OUTPUTS_KEY, None)
+
+
+def panel_inputs(name) -> tuple:
+    """Valeurs actuelles des entrées du panneau : versions des données + clés déclarées."""
+    versions = (get_base_version(),)
+    if name in TIMESERIES_PANELS:
+        versions += (get_timeseries_version("zhvi"), get_timeseries_version("zori"))
+    return versions + tuple(st.session_state.get(key) for key in PANEL_DEPENDENCIES[name])
+
+
+def panel_output(name, build):
+    """
+    Contenu du panneau name : build() n'est rappelé que si la session n'a pas
+    de contenu récent pour ces entrées (sinon : même résultat).
+    build ne doit lire que les données et les clés déclarées pour name.
+    """
+    outputs = st.session_state.setdefault(_OUTPUTS_KEY, OrderedDict())
+    key = (name, panel_inputs(name))
+    if key in outputs:
+        outputs.move_to_end(key)
+        return outputs[key]
+    value = outputs[key] = build()
+    while len(outputs) > MAX_PANEL_OUTPUTS:
+        outputs.popitem(last=False)
+    return value
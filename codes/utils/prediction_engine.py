@@ -1,9 +1,61 @@
 # utils/prediction_engine.py
+from typing import NamedTuple
+
 import numpy as np
-from utils.data_loader import load_affordability_data
-from utils.zip_enrichment import load_zip_to_city
+import pandas as pd
+from utils.compute_pool import get_compute_pool
+from utils.data_loader import freeze_frame, get_data_version, load_affordability_data
+from utils.forecasting import forecast_growth, forecast_version, growth_from_slopes
+from utils.scenario_cache import get_scenario_cache, normalize_scenario_key
+from utils.tracing import cache_miss, traced
+from utils.zip_enrichment import get_zip_map_version, load_zip_to_city
 import streamlit as st
 
+def mortgage_payment_vec(loan_amount, rate=0.07, years=30) -> np.ndarray:
+    """Mensualité (capital + intérêts) d'un prêt à taux fixe, vectorisée."""
+    loan_amount = np.asarray(loan_amount, dtype=np.float64)
+    monthly_rate = np.asarray(rate, dtype=np.float64) / 12
+    n_payments = np.asarray(years, dtype=np.float64) * 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (1 + monthly_rate) ** n_payments
+        amortized = loan_amount * (monthly_rate * growth / (growth - 1))
+    return np.where(monthly_rate == 0, loan_amount / n_payments, amortized)
+
+def calculate_monthly_payment_vec(
+    price,
+    down_payment_pct=0.20,
+    rate=0.07,
+    years=30,
+    property_tax_rate=0.012,
+    insurance_rate=0.0035,
+    hoa_monthly=150
+) -> np.ndarray:
+    """
+    Version vectorisée de calculate_monthly_payment : chaque paramètre peut être
+    un scalaire, un tableau NumPy ou une Series (broadcast NumPy).
+    Retourne un ndarray float64 du paiement mensuel total (PITI + HOA).
+    """
+    price = np.asarray(price, dtype=np.float64)
+    down_payment_pct = np.asarray(down_payment_pct, dtype=np.float64)
+    rate = np.asarray(rate, dtype=np.float64)
+    years = np.asarray(years, dtype=np.float64)
+
+    mortgage = mortgage_payment_vec(price * (1 - down_payment_pct), rate, years)
+
+    tax = price * np.asarray(property_tax_rate, dtype=np.float64) / 12
+    insurance = price * np.asarray(insurance_rate, dtype=np.float64) / 12
+    return mortgage + tax + insurance + np.asarray(hoa_monthly, dtype=np.float64)
+
+def income_needed_to_buy_vec(
+    price,
+    down_payment_pct=0.20,
+    rate=0.07,
+    **payment_kwargs
+) -> np.ndarray:
+    """Revenu annuel nécessaire (règle des 30 %), vectorisé sur tous les paramètres."""
+    monthly = calculate_monthly_payment_vec(price, down_payment_pct, rate, **payment_kwargs)
+    return (monthly * 12) / 0.30
+
 def calculate_monthly_payment(
     price: float,
     down_payment_pct: float = 0.20,
@@ -16,77 +68,534 @@ def calculate_monthly_payment(
     """
     Retourne le paiement mensuel total (PITI + HOA)
     """
-    loan_amount = price * (1 - down_payment_pct)
-    monthly_rate = rate / 12
-    n_payments = years * 12
-    if monthly_rate == 0:
-        mortgage = loan_amount / n_payments
-    else:
-        mortgage = loan_amount * (
-            monthly_rate * (1 + monthly_rate)**n_payments /
-            ((1 + monthly_rate)**n_payments - 1)
-        )
-    tax = price * property_tax_rate / 12
-    insurance = price * insurance_rate / 12
-    return mortgage + tax + insurance + hoa_monthly
+    return float(calculate_monthly_payment_vec(
+        price, down_payment_pct, rate, years,
+        property_tax_rate, insurance_rate, hoa_monthly
+    ))
 
 def income_needed_to_buy(
     price: float,
     down_payment_pct: float = 0.20,
     rate: float = 0.07
 ) -> float:
-  
+    return float(income_needed_to_buy_vec(price, down_payment_pct, rate))
 
-    monthly = calculate_monthly_payment(price, down_payment_pct, rate)
-    return (monthly * 12) / 0.30
+# --- Amortissement et point mort achat / location ---
+SCHEDULE_ARRAYS = 12                 # tableaux (ZIP × mois) vivants pendant un échéancier
+MAX_SCHEDULE_BYTES = 64 * 1024 * 1024
 
-@st.cache_data(ttl=3600, show_spinner=False)
-def get_best_locations(
-    salary=85000,
-    goal="Buy",
-    horizon=5,
-    inflation_rate=0.04,
+def amortization_schedule(
+    price,
+    monthly_rent,
     down_payment_pct=0.20,
-    mortgage_rate=0.07
-):
-    # FORCE LE RECALCUL À CHAQUE CHANGEMENT MÊME MINIME
-    salary = float(salary)
-    goal = str(goal).strip()
-    horizon = int(horizon)
-    inflation_rate = float(inflation_rate)
-    down_payment_pct = float(down_payment_pct)
-    mortgage_rate = float(mortgage_rate)
-
-    # CLÉ DE CACHE UNIQUE → on force avec tous les params
-    # (Streamlit le fait déjà, mais on s'assure)
-    df = load_affordability_data().copy()
-
-    # --- Enrichissement ---
-    city_map = load_zip_to_city()
-    df = df.merge(city_map[['ZIP', 'City']], on='ZIP', how='left')
-    df['City'] = df['City'].fillna("Rural Area").str.title()
-    df['Metro'] = df['Metro'].fillna("Non-metropolitan area")
-    df['Location'] = df['City'] + " (" + df['Metro'] + ")"
+    rate=0.07,
+    years=30,
+    appreciation=0.04,
+    rent_growth=0.04,
+    property_tax_rate=0.012,
+    insurance_rate=0.0035,
+    hoa_monthly=150,
+    closing_cost_pct=0.03,
+    selling_cost_pct=0.06
+) -> dict:
+    """
+    Échéancier mois par mois d'un achat au prix price (un ZIP par élément),
+    comparé à la location au loyer monthly_rent. Retourne {nom: tableau
+    (ZIP × mois)} pour les mois 1 .. years * 12 ; les paramètres autres que
+    price / monthly_rent sont des scalaires (un scénario).
+    Taxe, assurance et HOA comme calculate_monthly_payment (sur le prix
+    d'achat) ; le bien prend appreciation par an, le loyer rent_growth chaque année.
+    buy_cost : coût net cumulé de l'achat (apport, frais, paiements, moins le
+    produit d'une revente) ; rent_cost : loyers cumulés.
+    """
+    price = np.asarray(price, dtype=np.float64).reshape(-1, 1)
+    rent = np.asarray(monthly_rent, dtype=np.float64).reshape(-1, 1)
+    months = np.arange(1, int(years * 12) + 1)
+    shape = (len(price), len(months))
+    monthly_rate = rate / 12
+
+    # Solde en fin de mois (forme fermée) : facteurs mensuels 1-D, produits externes
+    loan = price * (1 - down_payment_pct)
+    payment = mortgage_payment_vec(loan, rate, years)
+    if monthly_rate == 0:
+        balance = loan - payment * months
+    else:
+        growth = (1 + monthly_rate) ** months
+        balance = loan * growth - payment * ((growth - 1) / monthly_rate)
+    balance = np.maximum(balance, 0)
+    previous = np.concatenate([loan, balance[:, :-1]], axis=1)
+
+    schedule = {}
+    schedule['interest'] = previous * monthly_rate
+    schedule['principal'] = previous - balance
+    schedule['tax'] = np.broadcast_to(price * property_tax_rate / 12, shape)
+    schedule['insurance'] = np.broadcast_to(price * insurance_rate / 12, shape)
+    schedule['hoa'] = np.broadcast_to(np.float64(hoa_monthly), shape)
+    schedule['balance'] = balance
+    schedule['home_value'] = price * (1 + appreciation) ** (months / 12)
+    schedule['equity'] = schedule['home_value'] - balance
+    rent_factor = (1 + rent_growth) ** ((months - 1) // 12)
+    schedule['rent'] = rent * rent_factor
+    schedule['rent_cost'] = rent * np.cumsum(rent_factor)
+
+    monthly_cost = payment + price * ((property_tax_rate + insurance_rate) / 12) + hoa_monthly
+    upfront = price * (down_payment_pct + closing_cost_pct)
+    sale_proceeds = schedule['home_value'] * (1 - selling_cost_pct) - balance
+    schedule['buy_cost'] = upfront + monthly_cost * months - sale_proceeds
+    return schedule
+
+def break_even_summary(
+    price,
+    monthly_rent,
+    horizon=5,
+    max_chunk_bytes=MAX_SCHEDULE_BYTES,
+    **schedule_kwargs
+) -> dict:
+    """
+    Bilan par ZIP de amortization_schedule, calculé par blocs de ZIP (mémoire
+    bornée par max_chunk_bytes) : point mort (premier mois où acheter coûte
+    moins cher que louer, NaN s'il n'arrive pas avant la fin du prêt) et
+    bilan à l'horizon (en années). Retourne {nom de colonne: ndarray}.
+    """
+    price = np.asarray(price, dtype=np.float64).ravel()
+    monthly_rent = np.asarray(monthly_rent, dtype=np.float64).ravel()
+    n_months = int(schedule_kwargs.get('years', 30) * 12)
+    at = min(max(int(horizon * 12), 1), n_months) - 1  # colonne du dernier mois de l'horizon
+    chunk = max(1, int(max_chunk_bytes // (SCHEDULE_ARRAYS * 8 * n_months)))
+
+    names = ['Break_Even_Month', 'Equity_Horizon', 'Interest_Paid_Horizon',
+             'Principal_Paid_Horizon', 'Rent_Paid_Horizon', 'Buy_Cost_Horizon']
+    out = {name: np.empty(len(price)) for name in names}
+    with np.errstate(invalid="ignore"):
+        for start in range(0, len(price), chunk):
+            stop = start + chunk
+            schedule = amortization_schedule(price[start:stop], monthly_rent[start:stop], **schedule_kwargs)
+            cheaper = schedule['buy_cost'] <= schedule['rent_cost']
+            out['Break_Even_Month'][start:stop] = np.where(cheaper.any(axis=1), cheaper.argmax(axis=1) + 1, np.nan)
+            out['Equity_Horizon'][start:stop] = schedule['equity'][:, at]
+            out['Interest_Paid_Horizon'][start:stop] = schedule['interest'][:, :at + 1].sum(axis=1)
+            out['Principal_Paid_Horizon'][start:stop] = schedule['principal'][:, :at + 1].sum(axis=1)
+            out['Rent_Paid_Horizon'][start:stop] = schedule['rent_cost'][:, at]
+            out['Buy_Cost_Horizon'][start:stop] = schedule['buy_cost'][:, at]
+    out['Break_Even_Year'] = np.ceil(out['Break_Even_Month'] / 12)
+    return out
+
+def build_base_frame(df, city_map):
+    """
+    Table de base indépendante du scénario : jointure ZIP → ville
+    et colonnes texte (City, Metro, Location) calculées une seule fois.
+    Mêmes lignes, dans le même ordre, que df (positions partagées avec le pool de calcul).
+    """
+    cities = city_map[['ZIP', 'City']].drop_duplicates('ZIP')
+    base = df.merge(cities, on='ZIP', how='left')
+    base['City'] = base['City'].fillna("Rural Area").str.title()
+    base['Metro'] = base['Metro'].astype(object).fillna("Non-metropolitan area")
+    base['Location'] = base['City'] + " (" + base['Metro'] + ")"
+    return base
+
+def get_base_version():
+    """Version de la table de base : données d'accessibilité + correspondance ZIP → ville."""
+    return f"{get_data_version()}+{get_zip_map_version()}"
+
+@traced(cached=True)
+@st.cache_resource(max_entries=2, show_spinner=False)
+@cache_miss
+def load_base_frame(data_version):
+    """
+    Table de base partagée, construite une fois par version des données.
+    Tableaux en lecture seule : elle est commune à tous les appels et sessions.
+    """
+    return freeze_frame(build_base_frame(load_affordability_data(), load_zip_to_city()))
+
+@traced()
+def compute_scenario_columns(
+    base,
+    salary,
+    goal,
+    horizon,
+    inflation_rate,
+    down_payment_pct,
+    mortgage_rate,
+    growth=None
+) -> dict:
+    """
+    Colonnes numériques d'un scénario, calculées sur les tableaux de la table
+    de base (sans copie ni jointure). Retourne {nom de colonne: ndarray}.
+    growth : facteurs par ZIP {'ZHVI': ndarray, 'ZORI': ndarray} (modèles de
+    tendance) ; None → même inflation pour tous les ZIP.
+    """
+    zhvi = base['ZHVI'].to_numpy()
+    zori = base['ZORI'].to_numpy()
+    flat = (1 + inflation_rate) ** horizon
+    growth_zhvi = flat if growth is None else growth['ZHVI']
+    growth_zori = flat if growth is None else growth['ZORI']
 
     # --- Projections ---
-    df['ZHVI_Future'] = df['ZHVI'] * (1 + inflation_rate) ** horizon
-    df['ZORI_Future_Annual'] = df['ZORI'] * 12 * (1 + inflation_rate) ** horizon
+    cols = {}
+    cols['ZHVI_Future'] = zhvi * growth_zhvi
+    cols['ZORI_Future_Annual'] = zori * 12 * growth_zori
 
     # --- Calcul du revenu nécessaire (SÉCURISÉ) ---
     if goal == "Buy":
-        df['Income_Needed_Future'] = df['ZHVI_Future'].apply(
-            income_needed_to_buy,
+        cols['Income_Needed_Future'] = income_needed_to_buy_vec(
+            cols['ZHVI_Future'],
             down_payment_pct=down_payment_pct,
             rate=mortgage_rate
         )
-        df['Asset_Price_Future'] = df['ZHVI_Future']
+        cols['Asset_Price_Future'] = cols['ZHVI_Future']
     else:  # Rent OU tout autre cas (y compris "Buy a home", None, etc.)
-        df['Income_Needed_Future'] = df['ZORI_Future_Annual'] / 0.30
-        df['Asset_Price_Future'] = df['ZORI_Future_Annual']   # ← LIGNE CRUCIALE
+        cols['Income_Needed_Future'] = cols['ZORI_Future_Annual'] / 0.30
+        cols['Asset_Price_Future'] = cols['ZORI_Future_Annual']   # ← LIGNE CRUCIALE
 
     # --- Score & éligibilité ---
-    df["Eligible_Future"] = salary >= df["Income_Needed_Future"]
-    df["Affordability_%"] = (salary / df["Income_Needed_Future"]) * 100
-    df["Score"] = df["Affordability_%"] * (1_000_000 / df["Asset_Price_Future"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cols["Eligible_Future"] = salary >= cols["Income_Needed_Future"]
+        cols["Affordability_%"] = (salary / cols["Income_Needed_Future"]) * 100
+        cols["Score"] = cols["Affordability_%"] * (1_000_000 / cols["Asset_Price_Future"])
+    return cols
+
+class Ranking(NamedTuple):
+    """Résultat compact d'un scénario : top K éligibles + compteurs."""
+    top: pd.DataFrame   # lignes éligibles triées par Score décroissant
+    n_eligible: int
+    n_total: int
+
+def select_top_eligible(score, eligible, k=None) -> np.ndarray:
+    """
+    Indices des K meilleures lignes éligibles, triés par score décroissant ;
+    à score égal, par position dans la table (même ordre que batch_scoring).
+    Sélection partielle : seules les lignes au moins aussi bonnes que la
+    K-ième sont triées. k=None → ordre complet de toutes les lignes éligibles.
+    """
+    candidates = np.flatnonzero(eligible)
+    if k is not None and k < len(candidates):
+        if k <= 0:
+            return candidates[:0]
+        candidate_score = score[candidates]
+        kth = -np.partition(-candidate_score, k - 1)[k - 1]
+        candidates = candidates[candidate_score >= kth]  # ex aequo de la K-ième compris, ordre des lignes
+    return candidates[np.argsort(-score[candidates], kind="stable")[:k]]
+
+def take_columns(cols, idx):
+    """Colonnes du scénario restreintes aux lignes idx (résultat compact)."""
+    return {name: values[idx] for name, values in cols.items()}
+
+def frame_rows(base, idx, picked):
+    """DataFrame des lignes idx : colonnes de base + colonnes du scénario déjà extraites."""
+    df = base.take(idx).reset_index(drop=True)
+    for name, values in picked.items():
+        df[name] = values
+    return df
+
+def gather_rows(base, cols, idx):
+    """Construit le DataFrame des lignes idx : colonnes de base + colonnes du scénario."""
+    return frame_rows(base, idx, take_columns(cols, idx))
+
+@traced()
+def rank_locations(
+    salary=85000,
+    goal="Buy",
+    horizon=5,
+    inflation_rate=0.04,
+    down_payment_pct=0.20,
+    mortgage_rate=0.07,
+    top_k=100,
+    full=False,
+    forecast="flat"
+) -> Ranking:
+    """
+    Classement d'un scénario : les top_k emplacements éligibles et les compteurs.
+    full=True retourne toutes les lignes éligibles dans l'ordre (exports).
+    forecast : "flat" (inflation unique), "trend" ou "damped" (tendance par ZIP).
+    Résultat mis en cache (LRU borné) sous une clé normalisée : ne pas le modifier.
+    """
+    scenario = normalize_scenario_key(
+        salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate
+    )
+    data_version = get_base_version()
+    top_k = None if full else int(top_k)
+    key = ("rank", data_version, scenario, top_k, forecast, forecast_version(forecast))
+    return get_scenario_cache().get_or_compute(
+        key, lambda: _rank_scenario(data_version, scenario, top_k, forecast)
+    )
+
+def _unpack_scenario(scenario):
+    salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate = scenario
+    if goal != "Buy":  # valeurs sans effet en location, mais calculs inchangés
+        down_payment_pct, mortgage_rate = 0.20, 0.07
+    return salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate
+
+def _scenario_columns(data_version, scenario, forecast):
+    """Table de base + colonnes du scénario normalisé (avec le modèle de projection)."""
+    salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate = _unpack_scenario(scenario)
+
+    base = load_base_frame(data_version)
+    growth = forecast_growth(base['ZIP'].to_numpy(), forecast, horizon, inflation_rate)
+    cols = compute_scenario_columns(
+        base, salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate,
+        growth=growth
+    )
+    return base, cols
+
+def _rank_scenario(data_version, scenario, top_k, forecast="flat"):
+    pool = get_compute_pool()
+    if pool is not None:
+        idx, picked, n_eligible = pool.run(_rank_task, scenario, top_k, forecast)
+        base = load_base_frame(data_version)
+        return Ranking(top=frame_rows(base, idx, picked), n_eligible=n_eligible, n_total=len(base))
+
+    base, cols = _scenario_columns(data_version, scenario, forecast)
+
+    eligible = cols["Eligible_Future"]
+    idx = select_top_eligible(cols["Score"], eligible, top_k)
+    return Ranking(
+        top=gather_rows(base, cols, idx),
+        n_eligible=int(eligible.sum()),
+        n_total=len(base)
+    )
+
+@traced()
+def rank_rows(
+    rows,
+    salary=85000,
+    goal="Buy",
+    horizon=5,
+    inflation_rate=0.04,
+    down_payment_pct=0.20,
+    mortgage_rate=0.07,
+    top_k=None,
+    forecast="flat",
+    extra=None
+) -> Ranking:
+    """
+    Classement restreint aux lignes rows (positions) de la table de base :
+    colonnes du scénario calculées sur ces lignes seulement, mêmes scores que
+    rank_locations. extra : colonnes {nom: ndarray aligné sur rows} ajoutées au résultat.
+    """
+    scenario = normalize_scenario_key(
+        salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate
+    )
+    salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate = _unpack_scenario(scenario)
+    rows = np.asarray(rows, dtype=np.int64)
+    base = load_base_frame(get_base_version())
+    subset = base[['ZIP', 'ZHVI', 'ZORI']].take(rows)
+
+    growth = forecast_growth(subset['ZIP'].to_numpy(), forecast, horizon, inflation_rate)
+    cols = compute_scenario_columns(
+        subset, salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate,
+        growth=growth
+    )
+    cols.update(extra or {})
+    eligible = cols["Eligible_Future"]
+    idx = select_top_eligible(cols["Score"], eligible, top_k)
+    return Ranking(
+        top=frame_rows(base, rows[idx], take_columns(cols, idx)),
+        n_eligible=int(eligible.sum()),
+        n_total=len(rows)
+    )
+
+@traced()
+def get_best_locations(
+    salary=85000,
+    goal="Buy",
+    horizon=5,
+    inflation_rate=0.04,
+    down_payment_pct=0.20,
+    mortgage_rate=0.07,
+    forecast="flat"
+):
+    """
+    Tableau complet (toutes les lignes, éligibles ou non) trié par Score.
+    Les pages utilisent rank_locations ; l'ordre complet n'est calculé qu'ici.
+    """
+    scenario = normalize_scenario_key(
+        salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate
+    )
+    data_version = get_base_version()
+    return get_scenario_cache().get_or_compute(
+        ("full_frame", data_version, scenario, forecast, forecast_version(forecast)),
+        lambda: _full_ranking(data_version, scenario, forecast)
+    )
+
+def _full_ranking(data_version, scenario, forecast="flat"):
+    pool = get_compute_pool()
+    if pool is not None:
+        order, picked = pool.run(_full_ranking_task, scenario, forecast)
+        return frame_rows(load_base_frame(data_version), order, picked)
+
+    # --- Table de base (jointure + texte) : une fois par version des données ---
+    base, cols = _scenario_columns(data_version, scenario, forecast)
+
+    # --- Tri complet par score décroissant (NaN en dernier), une seule extraction ---
+    order = np.argsort(-cols["Score"], kind="stable")
+    return gather_rows(base, cols, order)
+
+# --- exécution dans un worker du pool de calcul (utils.compute_pool) ---
+def _shared_scenario_columns(dataset, scenario, forecast):
+    """Colonnes du scénario sur les tableaux en mémoire partagée (mêmes lignes que la table de base)."""
+    salary, goal, horizon, inflation_rate, down_payment_pct, mortgage_rate = _unpack_scenario(scenario)
+    slopes = {"ZHVI": dataset.columns["slope_ZHVI"], "ZORI": dataset.columns["slope_ZORI"]}
+    return compute_scenario_columns(
+        dataset.frame(["ZHVI", "ZORI"]), salary, goal, horizon, inflation_rate,
+        down_payment_pct, mortgage_rate,
+        growth=growth_from_slopes(slopes, forecast, horizon, inflation_rate)
+    )
+
+def _rank_task(dataset, scenario, top_k, forecast):
+    cols = _shared_scenario_columns(dataset, scenario, forecast)
+    eligible = cols["Eligible_Future"]
+    idx = select_top_eligible(cols["Score"], eligible, top_k)
+    return idx, take_columns(cols, idx), int(eligible.sum())
+
+def _full_ranking_task(dataset, scenario, forecast):
+    cols = _shared_scenario_columns(dataset, scenario, forecast)
+    order = np.argsort(-cols["Score"], kind="stable")
+    return order, take_columns(cols, order)
+
+@traced()
+def sweep_scenarios(
+    base,
+    salaries,
+    mortgage_rates,
+    down_payments,
+    horizons,
+    goal="Buy",
+    inflation_rate=0.04,
+    top_n=3,
+    max_chunk_bytes=64 * 1024 * 1024
+) -> pd.DataFrame:
+    """
+    Évalue toute la grille salaire × taux × apport × horizon sur tous les ZIP
+    en un calcul NumPy vectorisé (cellules × ZIP), par blocs de cellules pour
+    borner la mémoire à ~max_chunk_bytes. Une ligne par cellule : nombre
+    d'emplacements éligibles et meilleurs choix (ZIP / Location).
+    """
+    grid = np.meshgrid(
+        np.asarray(salaries, dtype=np.float64),
+        np.asarray(mortgage_rates, dtype=np.float64),
+        np.asarray(down_payments, dtype=np.float64),
+        np.asarray(horizons, dtype=np.float64),
+        indexing="ij"
+    )
+    salary, rate, down, horizon = (axis.ravel() for axis in grid)
+    n_cells = salary.size
+
+    zhvi = base['ZHVI'].to_numpy(dtype=np.float64)
+    zori = base['ZORI'].to_numpy(dtype=np.float64)
+    n_zips = len(base)
+    top_n = max(0, min(int(top_n), n_zips))
+
+    # ~6 tableaux temporaires (cellules × ZIP) en float64 par bloc
+    chunk = max(1, int(max_chunk_bytes // (6 * 8 * max(n_zips, 1))))
+
+    eligible_count = np.empty(n_cells, dtype=np.int64)
+    top_idx = np.full((n_cells, top_n), -1, dtype=np.int64)
+
+    for start in range(0, n_cells, chunk):
+        stop = min(start + chunk, n_cells)
+        growth = (1 + inflation_rate) ** horizon[start:stop, None]
+        if goal == "Buy":
+            price = zhvi[None, :] * growth
+            income = income_needed_to_buy_vec(
+                price,
+                down_payment_pct=down[start:stop, None],
+                rate=rate[start:stop, None]
+            )
+        else:
+            price = zori[None, :] * 12 * growth
+            income = price / 0.30
+
+        cell_salary = salary[start:stop, None]
+        eligible = cell_salary >= income
+        eligible_count[start:stop] = eligible.sum(axis=1)
+        if top_n == 0:
+            continue
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = (cell_salary / income) * 100 * (1_000_000 / price)
+        score = np.where(eligible, score, -np.inf)
+        part = np.argpartition(-score, top_n - 1, axis=1)[:, :top_n]
+        part_score = np.take_along_axis(score, part, axis=1)
+        order = np.argsort(-part_score, axis=1, kind="stable")
+        best = np.take_along_axis(part, order, axis=1)
+        best[np.take_along_axis(part_score, order, axis=1) == -np.inf] = -1
+        top_idx[start:stop] = best
+
+    zips = base['ZIP'].to_numpy()
+    locations = base['Location'].to_numpy()
+
+    def _pick(values, idx):
+        return [values[i] if i >= 0 else None for i in idx]
+
+    result = pd.DataFrame({
+        "Salary": salary,
+        "Mortgage_Rate": rate,
+        "Down_Payment_Pct": down,
+        "Horizon": horizon.astype(np.int64),
+        "Eligible_Count": eligible_count,
+        "Eligible_%": eligible_count / max(n_zips, 1) * 100,
+    })
+    if top_n:
+        result["Best_ZIP"] = _pick(zips, top_idx[:, 0])
+        result["Best_Location"] = _pick(locations, top_idx[:, 0])
+        result["Top_ZIPs"] = [
+            [zips[i] for i in row if i >= 0] for row in top_idx
+        ]
+    return result
+
+@traced()
+def sweep_locations(
+    salaries,
+    mortgage_rates,
+    down_payments,
+    horizons,
+    goal="Buy",
+    inflation_rate=0.04,
+    top_n=3
+) -> pd.DataFrame:
+    """sweep_scenarios sur la table de base, mis en cache (LRU borné) par grille."""
+    goal = "Buy" if str(goal).strip() == "Buy" else "Rent"
+    data_version = get_base_version()
+    key = (
+        "sweep", data_version, goal, round(float(inflation_rate), 6), int(top_n),
+        tuple(np.round(np.asarray(salaries, dtype=float), 2)),
+        tuple(np.round(np.asarray(mortgage_rates, dtype=float), 6)),
+        tuple(np.round(np.asarray(down_payments, dtype=float), 6)),
+        tuple(int(h) for h in horizons),
+    )
+    return get_scenario_cache().get_or_compute(key, lambda: sweep_scenarios(
+        load_base_frame(data_version), salaries, mortgage_rates, down_payments,
+        horizons, goal=goal, inflation_rate=inflation_rate, top_n=top_n
+    ))
+
+@traced()
+def break_even_table(
+    horizon=5,
+    inflation_rate=0.04,
+    down_payment_pct=0.20,
+    mortgage_rate=0.07
+) -> dict:
+    """
+    break_even_summary de chaque ligne de la table de base (achat au ZHVI
+    actuel, loyer ZORI actuel, prix et loyers suivant l'inflation), dans
+    l'ordre de la table. Mis en cache (LRU borné) : ne pas modifier les tableaux.
+    """
+    scenario = normalize_scenario_key(
+        0, "Buy", horizon, inflation_rate, down_payment_pct, mortgage_rate
+    )
+    _, _, horizon, inflation_rate, down_payment_pct, mortgage_rate = scenario
+    data_version = get_base_version()
+    key = ("break_even", data_version) + scenario[2:]
+
+    def build():
+        base = load_base_frame(data_version)
+        summary = break_even_summary(
+            base['ZHVI'].to_numpy(), base['ZORI'].to_numpy(), horizon,
+            down_payment_pct=down_payment_pct, rate=mortgage_rate,
+            appreciation=inflation_rate, rent_growth=inflation_rate
+        )
+        for values in summary.values():
+            values.flags.writeable = False
+        return summary
 
-    return df.sort_values("Score", ascending=False).reset_index(drop=True)
\ No newline at end of file
+    return get_scenario_cache().get_or_compute(key, build)
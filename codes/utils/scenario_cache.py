@@ -0,0 +1,141 @@
+# utils/scenario_cache.py
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.tracing import annotate
+
+# --- pas des sliders (user_profile / Prediction) ---
+RATE_STEP = 0.001         # taux hypothécaire : 0.1 %
+DOWN_PAYMENT_STEP = 0.005  # apport : 0.5 % (app.py) ou 1 % (user_profile)
+INFLATION_STEP = 0.005    # inflation : 0.5 %
+
+DEFAULT_MAX_MB = 64
+
+
+def _snap(value, step):
+    """Arrondit au pas du slider (et élimine le bruit flottant)."""
+    return round(round(float(value) / step) * step, 6)
+
+
+def normalize_scenario_key(
+    salary,
+    goal,
+    horizon,
+    inflation_rate,
+    down_payment_pct,
+    mortgage_rate
+) -> tuple:
+    """
+    Clé normalisée d'un scénario : deux requêtes quasi identiques
+    (bruit flottant, pas des sliders) partagent la même entrée.
+    En location, l'apport et le taux n'ont pas d'effet → mis à None.
+    """
+    goal = "Buy" if str(goal).strip() == "Buy" else "Rent"
+    if goal == "Buy":
+        down_payment_pct = _snap(down_payment_pct, DOWN_PAYMENT_STEP)
+        mortgage_rate = _snap(mortgage_rate, RATE_STEP)
+    else:
+        down_payment_pct = None
+        mortgage_rate = None
+    return (
+        round(float(salary)),
+        goal,
+        int(horizon),
+        _snap(inflation_rate, INFLATION_STEP),
+        down_payment_pct,
+        mortgage_rate,
+    )
+
+
+def estimate_nbytes(value) -> int:
+    """Taille approximative en mémoire d'un résultat mis en cache."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class ScenarioCache:
+    """
+    Cache LRU borné en octets, partagé entre sessions (thread-safe).
+    Compte les hits / misses / évictions pour le suivi.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self._entries = OrderedDict()  # clé → (valeur, taille)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = estimate_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return  # plus gros que tout le budget : on ne le garde pas
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Retourne la valeur en cache, ou la calcule (hors verrou) et la stocke."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        annotate(cache="miss" if value is sentinel else "hit")
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+@st.cache_resource
+def get_scenario_cache():
+    """Cache de scénarios unique par processus (budget : SCENARIO_CACHE_MB, 64 Mo par défaut)."""
+    max_mb = float(os.environ.get("SCENARIO_CACHE_MB", DEFAULT_MAX_MB))
+    return ScenarioCache(max_bytes=max_mb * 1024 * 1024)
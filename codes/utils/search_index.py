@@ -0,0 +1,151 @@
+# utils/search_index.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import get_data_version, load_affordability_data
+from utils.tracing import cache_miss, traced
+
+NAME_FIELDS = ["Metro", "StateName"]
+NGRAM = 3
+
+
+def _ngrams(text, n=NGRAM):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class _NameField:
+    """
+    Index d'une colonne texte : noms uniques (en minuscules), n-grammes
+    → noms, et lignes de chaque nom au format CSR (offsets + row ids).
+    """
+
+    def __init__(self, values):
+        codes, names = pd.factorize(values, use_na_sentinel=True)
+        self.names = [str(name) for name in names]
+        self.lowered = [name.lower() for name in self.names]
+
+        valid = codes >= 0
+        order = np.flatnonzero(valid)[np.argsort(codes[valid], kind="stable")]
+        counts = np.bincount(codes[valid], minlength=len(self.names))
+        self.rows = order
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.counts = counts
+
+        self.postings = {}
+        for name_id, name in enumerate(self.lowered):
+            for gram in _ngrams(name):
+                self.postings.setdefault(gram, []).append(name_id)
+
+    def match(self, query):
+        """Ids des noms contenant query (sous-chaîne, insensible à la casse)."""
+        query = query.lower()
+        if len(query) < NGRAM:
+            candidates = range(len(self.lowered))
+        else:
+            candidates = None
+            for gram in _ngrams(query):
+                ids = self.postings.get(gram)
+                if ids is None:
+                    return []
+                candidates = set(ids) if candidates is None else candidates & set(ids)
+                if not candidates:
+                    return []
+        return [i for i in candidates if query in self.lowered[i]]
+
+    def rows_for(self, name_ids):
+        if not name_ids:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([
+            self.rows[self.offsets[i]:self.offsets[i + 1]] for i in name_ids
+        ])
+
+
+class SearchIndex:
+    """
+    Index de la Smart Search, construit une fois par version des données :
+    n-grammes pour Metro / StateName (sous-chaînes), tableau trié pour les ZIP
+    (préfixes). Le coût d'une requête dépend du nombre de résultats.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.fields = {field: _NameField(df[field]) for field in NAME_FIELDS}
+
+        zips = df['ZIP'].astype(str).to_numpy()
+        self.zip_order = np.argsort(zips, kind="stable")
+        self.sorted_zips = zips[self.zip_order]
+
+    def _zip_rows(self, query):
+        if not query.isdigit():
+            return np.empty(0, dtype=np.int64)
+        lo = np.searchsorted(self.sorted_zips, query, side="left")
+        hi = np.searchsorted(self.sorted_zips, query + "~", side="left")  # "~" > chiffres
+        return self.zip_order[lo:hi]
+
+    def search(self, query) -> np.ndarray:
+        """Row ids (triés) des lignes dont Metro/StateName contient query ou dont le ZIP commence par query."""
+        query = query.strip()
+        if not query:
+            return np.arange(self.n_rows)
+        parts = [self._zip_rows(query)]
+        for field in self.fields.values():
+            parts.append(field.rows_for(field.match(query)))
+        return np.unique(np.concatenate(parts))
+
+    def suggest(self, query, limit=8) -> list:
+        """
+        Suggestions classées : (libellé, nombre de ZIP). Les noms qui commencent
+        par la requête passent d'abord, puis ceux qui ont le plus de ZIP.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        lowered = query.lower()
+        ranked = []
+        for field in self.fields.values():
+            for name_id in field.match(query):
+                name = field.lowered[name_id]
+                starts = name.startswith(lowered)
+                word_start = starts or f" {lowered}" in name
+                ranked.append((not starts, not word_start, -int(field.counts[name_id]), field.names[name_id]))
+        zip_count = len(self._zip_rows(query))
+        if zip_count:
+            ranked.append((False, False, -zip_count, f"ZIP {query}…"))
+        ranked.sort()
+        return [(label, -neg_count) for _, _, neg_count, label in ranked[:limit]]
+
+
+def scan_matches(df, query) -> np.ndarray:
+    """
+    Masque des lignes de df qui répondent à query, par simple parcours (même
+    règle que SearchIndex.search) : pour un tableau sans index prébâti.
+    Sous-chaîne testée sur les noms uniques de Metro / StateName, puis isin.
+    """
+    query = query.strip()
+    mask = np.zeros(len(df), dtype=bool)
+    if not query:
+        return ~mask
+    for field in NAME_FIELDS:
+        names = pd.Series(df[field].dropna().unique()).astype(str)
+        matched = names[names.str.contains(query, case=False, regex=False)]
+        mask |= df[field].isin(matched).to_numpy()
+    if query.isdigit():
+        mask |= df['ZIP'].astype(str).str.startswith(query).to_numpy()
+    return mask
+
+
+def build_search_index(df) -> SearchIndex:
+    return SearchIndex(df)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+@cache_miss
+def load_search_index(data_version) -> SearchIndex:
+    """Index du jeu de données complet, construit une fois par version des données."""
+    return build_search_index(load_affordability_data())
+
+
+@traced(cached=True)
+def get_search_index() -> SearchIndex:
+    return load_search_index(get_data_version())
@@ -0,0 +1,147 @@
+# utils/timeseries_store.py
+"""
+Historique Zillow complet (ZHVI / ZORI) en matrice dense float32 ZIP × mois,
+stockée en .npy et ouverte en mémoire mappée, avec un index ZIP → ligne.
+Les requêtes (CAGR glissant, variation sur un an, volatilité) sont vectorisées
+sur tous les ZIP à la fois.
+
+Fichiers d'un store (dossier data_cleaned/timeseries/<kind>/) :
+    values.npy  float32 (n_zips, n_months)
+    zips.npy    ZIP sur 5 caractères, ordre des lignes
+    months.npy  datetime64[M], ordre des colonnes
+"""
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+STORE_KINDS = {"zhvi": "zip_zhvi", "zori": "zip_zori"}  # store → source Zillow (utils.etl)
+CHUNK_ROWS = 5_000
+
+
+# --- construction (ETL) ---
+def _count_rows(path, chunk_rows=CHUNK_ROWS):
+    """
+    Nombre de lignes de données, compté par le lecteur pandas de la conversion
+    (une seule colonne lue) : champs entre guillemets contenant un retour à la
+    ligne et dernière ligne sans retour final comptés comme à la lecture.
+    """
+    reader = pd.read_csv(path, usecols=["RegionName"], dtype={"RegionName": str}, chunksize=chunk_rows)
+    return sum(len(chunk) for chunk in reader)
+
+
+def build_store(csv_path, store_dir, chunk_rows=CHUNK_ROWS):
+    """
+    Convertit un fichier Zillow large (une colonne par mois) en store mappable,
+    bloc de lignes par bloc de lignes. Le dossier est remplacé atomiquement.
+    Retourne le nombre de ZIP.
+    """
+    csv_path, store_dir = Path(csv_path), Path(store_dir)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    months = [col for col in header if col.startswith(('19', '20'))]
+    n_rows = _count_rows(csv_path, chunk_rows)
+
+    tmp_dir = store_dir.with_name(f".{store_dir.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    values = np.lib.format.open_memmap(
+        tmp_dir / "values.npy", mode="w+", dtype=np.float32, shape=(n_rows, len(months))
+    )
+    zips = np.empty(n_rows, dtype="<U5")
+    dtypes = {"RegionName": str, **{month: np.float32 for month in months}}
+    reader = pd.read_csv(csv_path, usecols=["RegionName"] + months, dtype=dtypes, chunksize=chunk_rows)
+    start = 0
+    for chunk in reader:
+        stop = start + len(chunk)
+        zips[start:stop] = chunk["RegionName"].str.zfill(5).to_numpy()
+        values[start:stop] = chunk[months].to_numpy(dtype=np.float32)
+        start = stop
+    values.flush()
+    del values
+
+    np.save(tmp_dir / "zips.npy", zips[:start])
+    np.save(tmp_dir / "months.npy", pd.to_datetime(months).to_numpy().astype("datetime64[M]"))
+
+    old_dir = store_dir.with_name(f".{store_dir.name}.{os.getpid()}.old")
+    if store_dir.exists():
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return start
+
+
+# --- lecture / requêtes ---
+class TimeSeriesStore:
+    """Matrice ZIP × mois en lecture seule (mémoire mappée) + index ZIP → ligne."""
+
+    def __init__(self, store_dir):
+        store_dir = Path(store_dir)
+        self.values = np.load(store_dir / "values.npy", mmap_mode="r")
+        self.zips = np.load(store_dir / "zips.npy")
+        self.months = np.load(store_dir / "months.npy")
+        self._zip_order = np.argsort(self.zips, kind="stable")
+        self._sorted_zips = self.zips[self._zip_order]
+
+    @property
+    def n_months(self):
+        return self.values.shape[1]
+
+    def rows_for(self, zips):
+        """Ligne de chaque ZIP demandé (-1 si absent du store)."""
+        zips = np.asarray(zips, dtype="<U5")
+        pos = np.searchsorted(self._sorted_zips, zips)
+        pos = np.minimum(pos, len(self._sorted_zips) - 1)
+        found = self._sorted_zips[pos] == zips
+        return np.where(found, self._zip_order[pos], -1)
+
+    def _column(self, months_back):
+        """Colonne située months_back mois avant le dernier mois (None si hors historique)."""
+        col = self.n_months - 1 - months_back
+        return col if col >= 0 else None
+
+    def trailing_cagr(self, years=5):
+        """Croissance annuelle moyenne sur les `years` dernières années, pour chaque ZIP."""
+        start = self._column(int(round(12 * years)))
+        if start is None:
+            return np.full(len(self.zips), np.nan)
+        end_values = self.values[:, -1].astype(np.float64)
+        start_values = self.values[:, start].astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = end_values / start_values
+            return np.where(ratio > 0, ratio ** (1 / years) - 1, np.nan)
+
+    def yoy(self):
+        """Variation sur un an (dernier mois vs même mois un an plus tôt)."""
+        return self.trailing_cagr(1)
+
+    def volatility(self, months=36):
+        """Écart-type annualisé des rendements mensuels (log) sur la fenêtre glissante."""
+        months = min(int(months), self.n_months - 1)
+        if months < 2:
+            return np.full(len(self.zips), np.nan)
+        window = np.asarray(self.values[:, -(months + 1):], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.diff(np.log(window), axis=1)
+        returns[~np.isfinite(returns)] = np.nan
+        valid = np.sum(~np.isnan(returns), axis=1)
+        std = np.nanstd(np.where(valid[:, None] >= 2, returns, 0.0), axis=1, ddof=1)
+        return np.where(valid >= 2, std * np.sqrt(12), np.nan)
+
+    def trend_metrics(self, years=5, volatility_months=36) -> pd.DataFrame:
+        """Indicateurs historiques de tous les ZIP, indexés par ZIP."""
+        return pd.DataFrame({
+            f"CAGR_{years}y": self.trailing_cagr(years),
+            "YoY": self.yoy(),
+            "Volatility": self.volatility(volatility_months),
+        }, index=pd.Index(self.zips, name="ZIP"))
+
+
+def open_store(store_dir):
+    """Ouvre un store s'il existe (None sinon : historique non fourni avec les données)."""
+    store_dir = Path(store_dir)
+    if not (store_dir / "values.npy").exists():
+        return None
+    return TimeSeriesStore(store_dir)
@@ -0,0 +1,275 @@
+# utils/tracing.py
+"""
+Traçage optionnel des temps d'exécution (spans imbriqués) par rendu de page.
+
+Activé par la variable d'environnement DASHBOARD_TRACE=1 (lue au démarrage) :
+- chaque rendu de page (span racine) et chaque appel instrumenté de utils
+  produit un span {nom, durée, parent, attributs} ;
+- les appels à un cache Streamlit / au cache de scénarios portent
+  l'attribut cache = "hit" / "miss" ;
+- st.plotly_chart / st.dataframe sont chronométrés (sérialisation + envoi).
+
+Sorties (dossier DASHBOARD_TRACE_DIR, "traces" par défaut) :
+    spans.jsonl   un span par ligne, ajouté à la fin de chaque rendu
+    metrics.prom  format texte Prometheus : p50 / p95 / p99 par span
+                  (fenêtre glissante), compteurs de hits / misses
+
+Désactivé, `traced` et `cache_miss` retournent la fonction telle quelle et
+`span` un contexte vide partagé : coût nul ou négligeable.
+
+Résumé d'un fichier existant (depuis codes/) :
+    python -m utils.tracing traces/spans.jsonl
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+
+TRACE_ENABLED = os.environ.get("DASHBOARD_TRACE", "").lower() in ("1", "true", "yes", "on")
+TRACE_DIR = Path(os.environ.get("DASHBOARD_TRACE_DIR", "traces"))
+SPANS_FILE = "spans.jsonl"
+METRICS_FILE = "metrics.prom"
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW = 1_000  # durées gardées par span pour les quantiles
+
+_NULL_SPAN = nullcontext()
+_local = threading.local()
+
+
+class Span:
+    """Intervalle chronométré ; ses enfants sont émis avec lui à la fin du span racine."""
+
+    __slots__ = ("name", "span_id", "parent", "trace_id", "attrs", "start", "duration", "children")
+
+    def __init__(self, name, parent, attrs):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.attrs = attrs
+        self.children = []
+        self.start = time.time()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record(self) -> dict:
+        return {
+            "trace": self.trace_id,
+            "span": self.span_id,
+            "parent": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration * 1000, 3),
+            "thread": threading.current_thread().name,
+            "attrs": self.attrs,
+        }
+
+
+class _SpanContext:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> Span:
+        stack = _stack()
+        parent = stack[-1] if stack else None
+        self.span = Span(self.name, parent, self.attrs)
+        self._t0 = time.perf_counter()
+        stack.append(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.duration = time.perf_counter() - self._t0
+        if exc_type is not None:
+            self.span.set(error=exc_type.__name__)
+        stack = _stack()
+        stack.pop()
+        if self.span.parent is not None:
+            self.span.parent.children.append(self.span)
+        else:
+            _collector.emit(self.span)
+        return False
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+# --- API ---
+def span(name, **attrs):
+    """Contexte chronométré : `with span("ranking", goal=goal) as s: ...`."""
+    if not TRACE_ENABLED:
+        return _NULL_SPAN
+    return _SpanContext(name, attrs)
+
+
+def current_span():
+    """Span en cours dans ce thread (None si traçage désactivé ou hors span)."""
+    if not TRACE_ENABLED:
+        return None
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def annotate(**attrs):
+    """Ajoute des attributs au span en cours (sans effet si traçage désactivé)."""
+    current = current_span()
+    if current is not None:
+        current.set(**attrs)
+
+
+def traced(name=None, cached=False):
+    """
+    Décorateur : un span par appel. cached=True pour un appel servi par un cache
+    Streamlit : attribut cache = "hit", passé à "miss" si le corps décoré par
+    cache_miss s'exécute.
+    """
+    def decorate(func):
+        if not TRACE_ENABLED:
+            return func
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            attrs = {"cache": "hit"} if cached else {}
+            with _SpanContext(label, attrs):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def cache_miss(func):
+    """
+    À placer juste sous @st.cache_data / @st.cache_resource : le corps ne
+    s'exécute qu'en cas de miss ; il est alors chronométré et le span appelant
+    (traced(cached=True)) marqué "miss".
+    """
+    if not TRACE_ENABLED:
+        return func
+    label = f"{func.__module__}.{func.__qualname__}:compute"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        caller = current_span()
+        if caller is not None and "cache" in caller.attrs:
+            caller.set(cache="miss")
+        with _SpanContext(label, {"compute": True}):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# --- collecte / sorties ---
+class _Collector:
+    """Agrège les spans terminés ; écrit JSONL + métriques Prometheus à chaque span racine."""
+
+    def __init__(self, trace_dir):
+        self.trace_dir = Path(trace_dir)
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: deque(maxlen=WINDOW))
+        self._totals = defaultdict(lambda: [0, 0.0])      # nom → [count, somme (s)]
+        self._cache = defaultdict(lambda: defaultdict(int))  # nom → {hit/miss: n}
+
+    def emit(self, root):
+        records = []
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            records.append(node.record())
+            pending.extend(node.children)
+        records.sort(key=lambda r: r["start"])
+
+        with self._lock:
+            for record in records:
+                name, seconds = record["name"], record["duration_ms"] / 1000
+                self._durations[name].append(seconds)
+                self._totals[name][0] += 1
+                self._totals[name][1] += seconds
+                if "cache" in record["attrs"]:
+                    self._cache[name][record["attrs"]["cache"]] += 1
+            try:
+                self.trace_dir.mkdir(parents=True, exist_ok=True)
+                with open(self.trace_dir / SPANS_FILE, "a") as f:
+                    f.writelines(json.dumps(record, default=str) + "\n" for record in records)
+                self._write_metrics()
+            except OSError:
+                pass  # disque en lecture seule : le traçage ne doit pas casser la page
+
+    def _write_metrics(self):
+        lines = [
+            "# HELP dashboard_span_duration_seconds Span duration (sliding window quantiles).",
+            "# TYPE dashboard_span_duration_seconds summary",
+        ]
+        for name in sorted(self._durations):
+            values = np.fromiter(self._durations[name], dtype=np.float64)
+            for q, value in zip(QUANTILES, np.quantile(values, QUANTILES)):
+                lines.append(f'dashboard_span_duration_seconds{{span="{name}",quantile="{q}"}} {value:.6f}')
+            count, total = self._totals[name]
+            lines.append(f'dashboard_span_duration_seconds_sum{{span="{name}"}} {total:.6f}')
+            lines.append(f'dashboard_span_duration_seconds_count{{span="{name}"}} {count}')
+        lines += [
+            "# HELP dashboard_cache_requests_total Cached calls by result.",
+            "# TYPE dashboard_cache_requests_total counter",
+        ]
+        for name in sorted(self._cache):
+            for result, count in sorted(self._cache[name].items()):
+                lines.append(f'dashboard_cache_requests_total{{span="{name}",result="{result}"}} {count}')
+
+        path = self.trace_dir / METRICS_FILE
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+
+_collector = _Collector(TRACE_DIR)
+
+
+def _instrument_streamlit():
+    """Chronomètre la sérialisation des figures et tableaux (uniquement si traçage actif)."""
+    import streamlit as st
+
+    for attr in ("plotly_chart", "dataframe"):
+        original = getattr(st, attr)
+        if getattr(original, "_traced", False):
+            continue
+        wrapped = traced(f"st.{attr}")(original)
+        wrapped._traced = True
+        setattr(st, attr, wrapped)
+
+
+if TRACE_ENABLED:
+    _instrument_streamlit()
+
+
+# --- résumé hors ligne ---
+def summarize_spans(path):
+    """p50 / p95 / p99 (ms), nombre d'appels et taux de hits par nom de span, depuis un JSONL."""
+    import pandas as pd
+
+    records = pd.read_json(path, lines=True)
+    if records.empty:
+        return pd.DataFrame()
+    cache = records["attrs"].map(lambda attrs: attrs.get("cache"))
+    grouped = records.assign(hit=cache.eq("hit"), cached=cache.notna()).groupby("name")
+    summary = grouped["duration_ms"].quantile(list(QUANTILES)).unstack()
+    summary.columns = [f"p{int(q * 100)}_ms" for q in QUANTILES]
+    summary["calls"] = grouped.size()
+    summary["hit_rate"] = grouped["hit"].sum() / grouped["cached"].sum().replace(0, np.nan)
+    return summary.sort_values("p95_ms", ascending=False)
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else TRACE_DIR / SPANS_FILE
+    print(summarize_spans(target).round(2).to_string())
@@ -0,0 +1,69 @@
+# utils/warmup.py
+"""
+Préchargement des données en arrière-plan : lancé après le rendu de la page
+d'accueil (une fois par processus, de nouveau après un échec), il remplit les
+caches (jeu de données, table ZIP → ville, table de base) pour que le premier
+affichage du Dashboard ou des prévisions n'attende plus le téléchargement /
+la lecture du CSV.
+La préparation de la source (téléchargement, extraction de l'archive) n'est
+pas un cache Streamlit : elle est sérialisée par le verrou de data_source.
+Une page qui demande les données pendant le préchargement attend la fin de
+la préparation en cours puis réutilise le dossier extrait, sans télécharger
+ni extraire une seconde fois. Les caches de données proprement dits
+(st.cache_data / st.cache_resource) sont ensuite partagés par clé.
+"""
+import threading
+
+import streamlit as st
+
+from utils.data_loader import load_affordability_data
+from utils.prediction_engine import get_base_version, load_base_frame
+from utils.tracing import span
+from utils.zip_enrichment import load_zip_to_city
+
+
+def _warm_caches():
+    with span("warmup"):
+        load_affordability_data()
+        load_zip_to_city()
+        load_base_frame(get_base_version())
+
+
+class Warmup:
+    """Thread de préchargement du processus et issue de sa dernière exécution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.thread = None
+        self.error = None  # exception du dernier préchargement (None : réussi ou en cours)
+
+    def _run(self):
+        try:
+            _warm_caches()
+        except Exception as exc:
+            # gardée pour relancer au prochain rendu de l'accueil ; l'erreur
+            # (téléchargement, CSV manquant) est affichée par la page qui charge les données
+            self.error = exc
+
+    def start(self) -> threading.Thread:
+        """Lance le préchargement, sauf s'il est en cours ou a déjà réussi."""
+        with self._lock:
+            if self.thread is None or (not self.thread.is_alive() and self.error is not None):
+                self.error = None
+                self.thread = threading.Thread(target=self._run, name="data-warmup", daemon=True)
+                self.thread.start()
+            return self.thread
+
+
+@st.cache_resource(show_spinner=False)
+def _process_warmup() -> Warmup:
+    return Warmup()
+
+
+def start_warmup() -> threading.Thread:
+    """
+    Démarre le thread de préchargement (une fois par processus). Un
+    préchargement en échec (données pas encore joignables…) est relancé par
+    le rendu suivant de la page d'accueil.
+    """
+    return _process_warmup().start()
@@ -3,18 +3,41 @@ import pandas as pd
 import streamlit as st
 from pathlib import Path
 
-@st.cache_data
+from utils.data_loader import freeze_frame, shared_view
+from utils.manifest import data_version
+from utils.tracing import cache_miss, traced
+
+USZIPS_PATH = Path(__file__).parent.parent / "uszips.csv"
+
+def get_zip_map_version():
+    """Version de uszips.csv (hash du contenu), pour les caches qui en dépendent."""
+    return data_version(USZIPS_PATH)
+
+@traced(cached=True)
 def load_zip_to_city():
-    csv_path = Path(__file__).parent.parent / "uszips.csv"
-    df = pd.read_csv(csv_path, usecols=['zip', 'city', 'state_id'], dtype={'zip': str})
+    """Table ZIP → ville / état : vue sans copie de la table partagée du processus."""
+    return shared_view(_load_zip_to_city(get_zip_map_version()))
+
+@st.cache_resource(max_entries=2)
+@cache_miss
+def _load_zip_to_city(zip_map_version):
+    csv_path = USZIPS_PATH
+    df = pd.read_csv(
+        csv_path,
+        usecols=['zip', 'city', 'state_id', 'lat', 'lng'],
+        dtype={'zip': str, 'lat': 'float64', 'lng': 'float64'}
+    )
     df['zip'] = df['zip'].str.zfill(5)
     
+    # Lat / Lng : centroïde du ZIP (index géographique, utils.geo_index)
     df = df.rename(columns={
         'zip': 'ZIP',
         'city': 'City',
-        'state_id': 'State'
+        'state_id': 'State',
+        'lat': 'Lat',
+        'lng': 'Lng'
     })
     
     df['City'] = df['City'].fillna("Unknown").str.title()
     
-    return df
\ No newline at end of file
+    return freeze_frame(df)
\ No newline at end of file